@@ -1,3 +1,54 @@
-from django.contrib import admin
+from .models import Estoque
+from .reconciliacao import divergencias, corrigir
+from suprimentos.models import Product, Armazem
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 
-# Register your models here.
+
+@admin.register(Estoque)
+class EstoqueAdmin(admin.ModelAdmin):
+    list_display = ('product', 'local', 'quantidade')
+    list_filter = ('local',)
+    search_fields = ('product__product_name', 'local__name')
+    list_select_related = ('product', 'local')
+    change_list_template = 'admin/estoque/estoque/change_list.html'
+
+    def get_urls(self):
+        return [
+            path(
+                'reconciliacao/',
+                self.admin_site.admin_view(self.reconciliacao_view),
+                name='estoque_estoque_reconciliacao',
+            ),
+        ] + super().get_urls()
+
+    def reconciliacao_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        itens = divergencias()
+
+        if request.method == 'POST':
+            if not self.has_change_permission(request):
+                raise PermissionDenied
+            corrigidos = corrigir(itens)
+            messages.success(request, f"{corrigidos} saldo(s) corrigido(s).")
+            return HttpResponseRedirect(reverse('admin:estoque_estoque_reconciliacao'))
+
+        produtos = dict(Product.objects.filter(pk__in={item['product_id'] for item in itens}).values_list('id', 'product_name'))
+        locais = dict(Armazem.objects.filter(pk__in={item['local_id'] for item in itens}).values_list('id', 'name'))
+        for item in itens:
+            item['produto'] = produtos.get(item['product_id'])
+            item['local'] = locais.get(item['local_id'])
+
+        context = {
+            'title': "Reconciliação de estoque",
+            'divergencias': itens,
+            'pode_corrigir': self.has_change_permission(request),
+            'opts': self.opts,
+            **self.admin_site.each_context(request),
+        }
+        return TemplateResponse(request, 'admin/estoque/reconciliacao.html', context)
@@ -0,0 +1,63 @@
+from .models import Estoque, ParametroEstoque, AlertaEstoque
+
+# Alertas de estoque mínimo mantidos de forma incremental: cada movimentação reavalia só
+# os pares (produto, local) que tocou, então a lista de alertas está sempre atual sem
+# varrer o Estoque inteiro.
+
+def _por_local(pares):
+    agrupados = {}
+    for produto_id, local_id in pares:
+        agrupados.setdefault(local_id, []).append(produto_id)
+    return agrupados
+
+def _filtrar_pares(queryset, pares):
+    # Lê todos os pares com uma consulta por local (product_id IN ...)
+    linhas = []
+    for local_id, produtos in _por_local(pares).items():
+        linhas.extend(queryset.filter(local_id=local_id, product_id__in=produtos))
+    return linhas
+
+def reavaliar(saldos):
+    # saldos: {(produto_id, local_id): quantidade atual}
+    if not saldos:
+        return
+
+    parametros = {
+        (parametro.product_id, parametro.local_id): parametro
+        for parametro in _filtrar_pares(ParametroEstoque.objects.filter(minimo__isnull=False).only(
+            'product_id', 'local_id', 'minimo', 'maximo'), saldos)
+    }
+    abaixo = {
+        par: parametro for par, parametro in parametros.items()
+        if saldos[par] < parametro.minimo
+    }
+
+    existentes = {
+        (alerta.product_id, alerta.local_id)
+        for alerta in _filtrar_pares(AlertaEstoque.objects.only('product_id', 'local_id'), saldos)
+    }
+    normalizados = existentes - abaixo.keys()
+    for local_id, produtos in _por_local(normalizados).items():
+        AlertaEstoque.objects.filter(local_id=local_id, product_id__in=produtos).delete()
+
+    if abaixo:
+        # Mantém `desde` dos alertas que já existiam; só atualiza saldo e parâmetros
+        AlertaEstoque.objects.bulk_create([
+            AlertaEstoque(
+                product_id=produto_id,
+                local_id=local_id,
+                quantidade=saldos[(produto_id, local_id)],
+                minimo=parametro.minimo,
+                maximo=parametro.maximo,
+            )
+            for (produto_id, local_id), parametro in abaixo.items()
+        ], update_conflicts=True, unique_fields=['product', 'local'], update_fields=['quantidade', 'minimo', 'maximo'])
+
+def reavaliar_pares(pares):
+    # Para alterações feitas fora dos serviços (parâmetros, admin, reconciliação)
+    pares = set(pares)
+    saldos = dict.fromkeys(pares, 0)
+    for estoque in _filtrar_pares(Estoque.objects.only('product_id', 'local_id', 'quantidade'), pares):
+        if (estoque.product_id, estoque.local_id) in saldos:
+            saldos[(estoque.product_id, estoque.local_id)] = estoque.quantidade
+    reavaliar(saldos)
@@ -0,0 +1,36 @@
+from suprimentos.models import Product
+from django.core.cache import cache
+import gzip
+import json
+
+# Catálogo de produtos para clientes que guardam a lista localmente: um JSON em colunas
+# (uma lista por campo, na mesma ordem de id), já comprimido com gzip e guardado no
+# cache sob a versão VERSAO_PRODUTOS. O conteúdo de uma versão nunca muda.
+
+COLUNAS = (
+    ('id', 'id'),
+    ('nome', 'product_name'),
+    ('unidade', 'unidade_medida'),
+    ('categoria', 'categoria'),
+    ('status', 'status'),
+)
+
+# Versões antigas saem do cache sozinhas; a atual é regerada se expirar
+CACHE_CATALOGO = 24 * 60 * 60
+
+def gerar(versao):
+    dados = {'versao': versao, **{nome: [] for nome, _ in COLUNAS}}
+    linhas = Product.objects.order_by('id').values_list(*[campo for _, campo in COLUNAS])
+    for linha in linhas.iterator(chunk_size=2000):
+        for (nome, _), valor in zip(COLUNAS, linha):
+            dados[nome].append(valor)
+    dados['status'] = [int(ativo) for ativo in dados['status']]
+    return gzip.compress(json.dumps(dados, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+def catalogo_comprimido(versao):
+    chave = f'catalogo_produtos:{versao}'
+    conteudo = cache.get(chave)
+    if conteudo is None:
+        conteudo = gerar(versao)
+        cache.set(chave, conteudo, CACHE_CATALOGO)
+    return conteudo
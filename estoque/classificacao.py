@@ -0,0 +1,100 @@
+from .models import ClassificacaoProduto, SaidaEstoque
+from .historico import _inicio_do_dia
+from .previsao import semanas_fechadas
+from .versao import incrementar_versao
+from suprimentos.models import Product
+from django.db.models import DateField, Sum
+from django.db.models.functions import TruncWeek
+from django.db import transaction
+from django.utils import timezone
+import numpy as np
+
+# Classificação ABC/XYZ do catálogo inteiro. As saídas vêm somadas por (produto, semana)
+# numa única consulta; totais, coeficiente de variação e classes saem de uma matriz
+# produtos x semanas no NumPy. Só as linhas que mudaram são gravadas.
+
+SEMANAS_PADRAO = 52
+# Participação acumulada no volume de saídas até onde vão as classes A e B
+LIMITE_A = 0.80
+LIMITE_B = 0.95
+# Coeficiente de variação semanal até onde vão as classes X e Y
+LIMITE_X = 0.5
+LIMITE_Y = 1.0
+TAMANHO_LOTE = 500
+
+def classificar(serie):
+    # serie: matriz produtos x semanas. Devolve (total, coeficiente de variação, abc, xyz).
+    total = serie.sum(axis=1)
+    media = serie.mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coeficiente = np.where(media > 0, serie.std(axis=1) / media, np.nan)
+
+    # ABC: ordena por volume e usa a participação acumulada *antes* de cada produto, para
+    # que o item que cruza os 80% ainda seja A. Produtos sem saídas ficam em C.
+    ordem = np.argsort(-total, kind='stable')
+    geral = total.sum()
+    anterior = np.empty_like(total, dtype=np.float64)
+    anterior[ordem] = (np.cumsum(total[ordem]) - total[ordem]) / geral if geral else 1.0
+    abc = np.select([(total > 0) & (anterior < LIMITE_A), (total > 0) & (anterior < LIMITE_B)], ['A', 'B'], 'C')
+
+    # XYZ: sem saídas no período não há como medir a variação, então fica em Z
+    xyz = np.select([coeficiente <= LIMITE_X, coeficiente <= LIMITE_Y], ['X', 'Y'], 'Z')
+    return total, coeficiente, abc, xyz
+
+@transaction.atomic
+def reclassificar(semanas=SEMANAS_PADRAO):
+    inicio, fim = semanas_fechadas(semanas)
+    produtos = np.array(Product.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+
+    linhas = np.array(list(
+        SaidaEstoque.objects
+        .filter(data_saida__gte=_inicio_do_dia(inicio), data_saida__lt=_inicio_do_dia(fim))
+        .annotate(semana=TruncWeek('data_saida', output_field=DateField()))
+        .values_list('product_id', 'semana')
+        .annotate(total=Sum('quantidade'))
+        .order_by()
+        .iterator(chunk_size=TAMANHO_LOTE * 10)
+    ), dtype=object).reshape(-1, 3)
+
+    serie = np.zeros((len(produtos), semanas), dtype=np.float64)
+    if len(linhas):
+        indice = np.searchsorted(produtos, linhas[:, 0].astype(np.int64))
+        semana = (linhas[:, 1].astype('datetime64[D]') - np.datetime64(inicio, 'D')).astype(np.int64) // 7
+        # Produtos excluídos entre as duas consultas não entram
+        validos = (indice < len(produtos)) & (produtos[np.minimum(indice, len(produtos) - 1)] == linhas[:, 0].astype(np.int64))
+        serie[indice[validos], semana[validos]] = linhas[validos, 2].astype(np.float64)
+
+    total, coeficiente, abc, xyz = classificar(serie)
+
+    existentes = {
+        classificacao.product_id: classificacao
+        for classificacao in ClassificacaoProduto.objects.all()
+    }
+    calculado_em = timezone.now()
+    novas, alteradas, classes_mudaram = [], [], False
+    for i, produto_id in enumerate(produtos.tolist()):
+        valores = {
+            'classe_abc': str(abc[i]),
+            'classe_xyz': str(xyz[i]),
+            'total': int(total[i]),
+            'coeficiente_variacao': None if np.isnan(coeficiente[i]) else round(float(coeficiente[i]), 2),
+        }
+        atual = existentes.get(produto_id)
+        if atual is None:
+            novas.append(ClassificacaoProduto(product_id=produto_id, calculado_em=calculado_em, **valores))
+            classes_mudaram = True
+        elif any(getattr(atual, campo) != valor for campo, valor in valores.items()):
+            classes_mudaram |= (atual.classe_abc, atual.classe_xyz) != (valores['classe_abc'], valores['classe_xyz'])
+            for campo, valor in valores.items():
+                setattr(atual, campo, valor)
+            atual.calculado_em = calculado_em
+            alteradas.append(atual)
+
+    ClassificacaoProduto.objects.bulk_create(novas, batch_size=TAMANHO_LOTE)
+    ClassificacaoProduto.objects.bulk_update(
+        alteradas, ['classe_abc', 'classe_xyz', 'total', 'coeficiente_variacao', 'calculado_em'], batch_size=TAMANHO_LOTE,
+    )
+    if classes_mudaram:
+        # Exportações filtradas por classe geradas antes desta rodada deixam de valer
+        incrementar_versao()
+    return len(novas), len(alteradas)
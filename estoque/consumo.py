@@ -0,0 +1,101 @@
+from .models import ConsumoMensal, SaidaEstoque
+from .historico import _inicio_do_dia
+from django.db.models import Case, Count, DateField, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncMonth
+from django.db import transaction
+from django.utils import timezone
+
+# Consumo por (centro de custo, produto, mês), somado pelas saídas à medida que são
+# registradas. Os relatórios leem só esta tabela; `reconstruir` refaz a partir de
+# SaidaEstoque (carga inicial ou depois de edições feitas fora dos serviços).
+
+TAMANHO_LOTE = 500
+
+def mes_de(data):
+    # Primeiro dia do mês no fuso local (o mesmo corte de dia do histórico)
+    return timezone.localtime(data).date().replace(day=1)
+
+def acumular(saidas):
+    # Chamado na transação de registrar_saida. Saídas sem centro de custo não entram.
+    deltas = {}
+    for saida in saidas:
+        if saida.centro_custo_id is None:
+            continue
+        chave = (saida.centro_custo_id, saida.product_id, mes_de(saida.data_saida))
+        quantidade, linhas = deltas.get(chave, (0, 0))
+        deltas[chave] = (quantidade + saida.quantidade, linhas + 1)
+    if not deltas:
+        return
+
+    ConsumoMensal.objects.bulk_create([
+        ConsumoMensal(centro_custo_id=centro, product_id=produto, mes=mes)
+        for centro, produto, mes in deltas
+    ], batch_size=TAMANHO_LOTE, ignore_conflicts=True)
+
+    # Um documento de saída tem um único centro de custo e, quase sempre, um único mês
+    for centro, mes in sorted({(centro, mes) for centro, _, mes in deltas}):
+        ids = dict(
+            ConsumoMensal.objects.filter(
+                centro_custo_id=centro, mes=mes,
+                product_id__in=[produto for c, produto, m in deltas if (c, m) == (centro, mes)],
+            ).values_list('product_id', 'id')
+        )
+        lote = [(ids[produto], deltas[(centro, produto, mes)]) for produto in sorted(ids)]
+        ConsumoMensal.objects.filter(pk__in=[pk for pk, _ in lote]).update(
+            quantidade=F('quantidade') + Case(
+                *[When(pk=pk, then=Value(quantidade)) for pk, (quantidade, _) in lote],
+                output_field=IntegerField(),
+            ),
+            linhas=F('linhas') + Case(
+                *[When(pk=pk, then=Value(linhas)) for pk, (_, linhas) in lote],
+                output_field=IntegerField(),
+            ),
+        )
+
+@transaction.atomic
+def reconstruir(desde=None):
+    # Recalcula os meses a partir de `desde` (primeiro dia do mês; None = tudo)
+    consumos = ConsumoMensal.objects.all()
+    saidas = SaidaEstoque.objects.filter(centro_custo__isnull=False)
+    if desde is not None:
+        consumos = consumos.filter(mes__gte=desde)
+        saidas = saidas.filter(data_saida__gte=_inicio_do_dia(desde))
+    consumos.delete()
+
+    agregado = (
+        saidas.annotate(mes_saida=TruncMonth('data_saida', output_field=DateField()))
+        .values('centro_custo_id', 'product_id', 'mes_saida')
+        .annotate(total_quantidade=Sum('quantidade'), total_linhas=Count('id'))
+        .order_by()
+    )
+    novos = [
+        ConsumoMensal(
+            centro_custo_id=linha['centro_custo_id'],
+            product_id=linha['product_id'],
+            mes=linha['mes_saida'],
+            quantidade=linha['total_quantidade'],
+            linhas=linha['total_linhas'],
+        )
+        for linha in agregado.iterator(chunk_size=TAMANHO_LOTE)
+    ]
+    ConsumoMensal.objects.bulk_create(novos, batch_size=TAMANHO_LOTE)
+    return len(novos)
+
+def consultar(inicio, fim, centro_custo_id=None, agrupar='produto'):
+    # Consumo entre os meses `inicio` e `fim` (inclusive), por centro de custo e
+    # produto ou categoria, direto da tabela de consumo
+    consumos = ConsumoMensal.objects.filter(mes__gte=inicio, mes__lte=fim)
+    if centro_custo_id is not None:
+        consumos = consumos.filter(centro_custo_id=centro_custo_id)
+
+    campos = ['centro_custo_id', 'centro_custo__name']
+    if agrupar == 'categoria':
+        campos += ['product__categoria']
+    else:
+        campos += ['product_id', 'product__product_name', 'product__unidade_medida']
+
+    return list(
+        consumos.values(*campos)
+        .annotate(total_quantidade=Sum('quantidade'), total_linhas=Sum('linhas'))
+        .order_by('centro_custo__name', '-total_quantidade')
+    )
@@ -0,0 +1,228 @@
+from .models import Estoque, ExportacaoEstoque
+from .relatorios import RelatorioPDF
+from .versao import versao_atual
+from suprimentos.models import Product, Armazem
+from suprimentos.busca import filtro_nome
+from django.core.files import File
+from django.db.models import Q
+from django.db import transaction
+from django.utils import timezone
+from django.conf import settings
+from openpyxl import Workbook
+from datetime import timedelta
+import hashlib
+import tempfile
+import json
+
+# Linhas lidas do banco por vez nas exportações
+EXPORTACAO_CHUNK = 2000
+# O progresso do job é gravado a cada tantas linhas
+INTERVALO_PROGRESSO = 1000
+# Job em PROCESSANDO há mais tempo que isso é considerado abandonado (worker morto no
+# meio da geração) e volta para a fila, até MAXIMO_TENTATIVAS; depois disso vira erro
+TEMPO_LIMITE_PROCESSAMENTO = timedelta(hours=1)
+MAXIMO_TENTATIVAS = 2
+FILTROS_ESTOQUE = ('search', 'local', 'unidade', 'categoria', 'quantidade', 'abc', 'xyz')
+
+def filtrar_estoque(filtros):
+    # Filtros da lista de estoque (request.GET ou o dict salvo no job de exportação)
+    estoque = Estoque.objects.select_related('product', 'local')
+
+    search = filtros.get('search', '')
+    local = filtros.get('local', '')
+    unidade = filtros.get('unidade', '')
+    categoria = filtros.get('categoria', '')
+    quantidade = filtros.get('quantidade', '')
+    abc = filtros.get('abc', '')
+    xyz = filtros.get('xyz', '')
+
+    if search:
+        # Subconsultas para que o Postgres use o índice de trigramas do nome do produto
+        estoque = estoque.filter(
+            Q(product__in=Product.objects.filter(filtro_nome('product_name', search)).values('id')) |
+            Q(local__in=Armazem.objects.filter(filtro_nome('name', search)).values('id'))
+        )
+    if local.isdigit():
+        estoque = estoque.filter(local_id=local)
+    if unidade:
+        estoque = estoque.filter(product__unidade_medida=unidade)
+    if categoria:
+        estoque = estoque.filter(product__categoria=categoria)
+    if quantidade.isdigit():
+        estoque = estoque.filter(quantidade=quantidade)
+    if abc:
+        estoque = estoque.filter(product__classificacao__classe_abc=abc)
+    if xyz:
+        estoque = estoque.filter(product__classificacao__classe_xyz=xyz)
+
+    return estoque
+
+def chave_filtros(filtros):
+    # Mesma chave para filtros equivalentes (ordem, espaços, maiúsculas na busca, campos vazios)
+    normalizados = {}
+    for campo in FILTROS_ESTOQUE:
+        valor = (filtros.get(campo) or '').strip()
+        if campo == 'search':
+            valor = valor.casefold()
+        if valor:
+            normalizados[campo] = valor
+    return hashlib.sha1(json.dumps(normalizados, sort_keys=True).encode()).hexdigest()
+
+def exportacao_em_cache(formato, chave, versao):
+    # Arquivo já gerado com os mesmos filtros (chave) e a versão informada do estoque, se houver
+    return ExportacaoEstoque.objects.filter(
+        formato=formato,
+        chave=chave,
+        versao=versao,
+        status='CONCLUIDA',
+        expira_em__gt=timezone.now(),
+    ).order_by('-id').first()
+
+def exportacao_em_andamento(usuario, formato, chave, versao):
+    # Job do mesmo usuário ainda na fila ou sendo gerado para os mesmos filtros e versão
+    return ExportacaoEstoque.objects.filter(
+        usuario=usuario,
+        formato=formato,
+        chave=chave,
+        versao=versao,
+        status__in=['PENDENTE', 'PROCESSANDO'],
+    ).order_by('id').first()
+
+def linhas_estoque(filtros):
+    return filtrar_estoque(filtros).order_by('id').values_list(
+        'product__product_name', 'quantidade', 'product__unidade_medida',
+        'product__categoria', 'product__status', 'local__name'
+    )
+
+def gerar_excel(linhas, destino):
+    # Modo write_only: cada linha vai para um arquivo temporário assim que chega,
+    # então a memória fica constante independentemente do tamanho da exportação
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet("Estoque")
+    aba.append(["Nome do Produto", "Quantidade", "Unidade de Medida", "Categoria", "Status", "Local"])
+
+    for nome, quantidade, unidade, categoria, status, local in linhas:
+        aba.append([
+            nome,
+            quantidade,
+            unidade,
+            "Uso único" if categoria == "unico" else "Reutilizável",
+            "Ativo" if status else "Inativo",
+            local
+        ])
+
+    planilha.save(destino)
+
+def gerar_pdf(linhas, destino):
+    relatorio = RelatorioPDF("Relatório de Estoque", [
+        ("Produto", 30, 20),
+        ("Qtd", 180, 10),
+        ("Unidade", 230, 12),
+        ("Categoria", 300, 12),
+        ("Status", 370, 10),
+        ("Local", 450, 20),
+    ])
+    relatorio.gerar((
+        (nome, quantidade, unidade, categoria, "Ativo" if status else "Inativo", local)
+        for nome, quantidade, unidade, categoria, status, local in linhas
+    ), destino)
+
+# formato: (gerador, extensão)
+GERADORES = {
+    'EXCEL': (gerar_excel, 'xlsx'),
+    'PDF': (gerar_pdf, 'pdf'),
+}
+
+def _acompanhar(exportacao, linhas):
+    # Repassa as linhas ao gerador gravando o progresso de tempos em tempos
+    processadas = 0
+    for linha in linhas:
+        yield linha
+        processadas += 1
+        if processadas % INTERVALO_PROGRESSO == 0:
+            ExportacaoEstoque.objects.filter(pk=exportacao.pk).update(processadas=processadas)
+
+def _expiracao(momento):
+    return momento + timedelta(hours=settings.EXPORTACAO_RETENCAO_HORAS)
+
+def proxima_pendente():
+    # Reserva o job pendente mais antigo (ou um abandonado em PROCESSANDO); skip_locked
+    # deixa vários workers rodarem juntos
+    agora = timezone.now()
+    abandonado = Q(status='PROCESSANDO', iniciado_em__lt=agora - TEMPO_LIMITE_PROCESSAMENTO)
+    with transaction.atomic():
+        # Abandonados que já esgotaram as tentativas saem da caixa como erro e expiram
+        ExportacaoEstoque.objects.filter(abandonado, tentativas__gte=MAXIMO_TENTATIVAS).update(
+            status='ERRO',
+            erro="A geração foi interrompida. Solicite a exportação novamente.",
+            expira_em=_expiracao(agora),
+        )
+        exportacao = (
+            ExportacaoEstoque.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='PENDENTE') | abandonado).order_by('id').first()
+        )
+        if exportacao is not None:
+            exportacao.status = 'PROCESSANDO'
+            exportacao.iniciado_em = agora
+            exportacao.tentativas += 1
+            exportacao.processadas = 0
+            exportacao.save(update_fields=['status', 'iniciado_em', 'tentativas', 'processadas'])
+    return exportacao
+
+def processar(exportacao):
+    gerador, extensao = GERADORES[exportacao.formato]
+    # A chave e a versão vêm da solicitação; a versão é relida antes dos dados porque o
+    # estoque pode ter mudado na fila. Se mudar durante a geração, a versão gravada fica
+    # menor que a atual e o arquivo não é reaproveitado.
+    exportacao.chave = exportacao.chave or chave_filtros(exportacao.filtros)
+    exportacao.versao = versao_atual()
+
+    # Outro job (um clique repetido, outro usuário) já gerou o mesmo arquivo nesta versão
+    pronta = exportacao_em_cache(exportacao.formato, exportacao.chave, exportacao.versao)
+    if pronta is not None:
+        exportacao.arquivo = pronta.arquivo.name
+        exportacao.status = 'CONCLUIDA'
+        exportacao.total = exportacao.processadas = pronta.total
+        exportacao.concluido_em = timezone.now()
+        exportacao.expira_em = pronta.expira_em
+        exportacao.save(update_fields=['chave', 'versao', 'arquivo', 'status', 'total', 'processadas', 'concluido_em', 'expira_em'])
+        return exportacao
+
+    linhas = linhas_estoque(exportacao.filtros)
+    exportacao.total = linhas.count()
+    exportacao.save(update_fields=['versao', 'chave', 'total'])
+
+    try:
+        with tempfile.TemporaryFile() as arquivo:
+            gerador(_acompanhar(exportacao, linhas.iterator(chunk_size=EXPORTACAO_CHUNK)), arquivo)
+            arquivo.seek(0)
+            nome = f"estoque_{timezone.localdate().strftime('%d-%m-%Y')}.{extensao}"
+            exportacao.arquivo.save(nome, File(arquivo), save=False)
+    except Exception as e:
+        exportacao.status = 'ERRO'
+        exportacao.erro = str(e)
+        exportacao.expira_em = _expiracao(timezone.now())
+        exportacao.save(update_fields=['status', 'erro', 'expira_em'])
+        raise
+
+    exportacao.status = 'CONCLUIDA'
+    exportacao.processadas = exportacao.total
+    exportacao.concluido_em = timezone.now()
+    exportacao.expira_em = _expiracao(exportacao.concluido_em)
+    exportacao.save(update_fields=['status', 'processadas', 'arquivo', 'concluido_em', 'expira_em'])
+    return exportacao
+
+def remover_expiradas():
+    # Apaga os arquivos vencidos e os respectivos jobs. Jobs atendidos pelo cache apontam
+    # para o arquivo de outro job: ele só é apagado quando nenhum job vigente o usa.
+    removidas = 0
+    agora = timezone.now()
+    for exportacao in ExportacaoEstoque.objects.filter(expira_em__lt=agora).iterator():
+        if exportacao.arquivo and not (
+            ExportacaoEstoque.objects.filter(arquivo=exportacao.arquivo.name)
+            .exclude(pk=exportacao.pk).exclude(expira_em__lt=agora).exists()
+        ):
+            exportacao.arquivo.delete(save=False)
+        exportacao.delete()
+        removidas += 1
+    return removidas
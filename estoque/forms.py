@@ -1,12 +1,15 @@
 from .models import EntradaEstoque, SaidaEstoque, TransferenciaEstoque 
-from suprimentos.models import Product, Funcionario, CentroCusto
+from suprimentos.models import Product, Funcionario, CentroCusto, Armazem
 from django import forms
 
 class EntradaEstoqueForm(forms.Form):
-    local = forms.CharField(label="Local", max_length=100)
+    local = forms.ModelChoiceField(queryset=Armazem.objects.filter(status=True), label="Local")
+    # Escolhidos pelo typeahead (/sugestoes/): o widget escondido evita que
+    # renderizar o formulário percorra a tabela inteira para montar as <option>
     produto = forms.ModelChoiceField(
         queryset=Product.objects.filter(status=1), 
-        label="Produto"
+        label="Produto",
+        widget=forms.HiddenInput
     )
     quantidade = forms.IntegerField(label="Quantidade", min_value=1)
 
@@ -32,9 +35,9 @@ class EntradaEstoqueForm(forms.Form):
             self.add_error('funcionario', 'Não deve ser preenchido em caso de compra.')
 
 class SaidaEstoqueForm(forms.Form):
-    local = forms.CharField(label="Local", max_length=255)
-    responsavel = forms.ModelChoiceField(queryset=Funcionario.objects.filter(status=True), label="Responsável")
-    centro_custo = forms.ModelChoiceField(queryset=CentroCusto.objects.all(), label="Centro de Custo")
+    local = forms.ModelChoiceField(queryset=Armazem.objects.all(), label="Local")
+    responsavel = forms.ModelChoiceField(queryset=Funcionario.objects.filter(status=True), label="Responsável", widget=forms.HiddenInput)
+    centro_custo = forms.ModelChoiceField(queryset=CentroCusto.objects.filter(status=True), label="Centro de Custo", widget=forms.HiddenInput)
     observacao = forms.CharField(widget=forms.Textarea, required=False, label="Observação")
 
     def clean_quantidade(self):
@@ -55,3 +58,12 @@ class TransferenciaEstoqueForm(forms.ModelForm):
             }),
         }
 
+
+class ImportacaoEntradaForm(forms.Form):
+    arquivo = forms.FileField(label="Arquivo (.csv ou .xlsx)")
+
+    def clean_arquivo(self):
+        arquivo = self.cleaned_data['arquivo']
+        if not arquivo.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError("Envie um arquivo .csv ou .xlsx.")
+        return arquivo
@@ -0,0 +1,153 @@
+from .models import EntradaEstoque, SaidaEstoque, TransferenciaEstoque, SnapshotEstoque
+from django.db.models import Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+
+# Consolidação inicial é feita em janelas para não carregar o histórico inteiro de uma vez
+JANELA_CONSOLIDACAO = 31
+TAMANHO_LOTE = 1000
+
+def _inicio_do_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+def _filtrar_periodo(queryset, campo, desde, ate):
+    # Usa limites de datetime (e não __date) para aproveitar o índice da coluna
+    if desde is not None:
+        queryset = queryset.filter(**{f'{campo}__gte': _inicio_do_dia(desde)})
+    if ate is not None:
+        queryset = queryset.filter(**{f'{campo}__lt': _inicio_do_dia(ate + timedelta(days=1))})
+    return queryset
+
+def deltas_movimentos(desde=None, ate=None, product_id=None, local_id=None, por_dia=False, produtos=None):
+    # Soma as movimentações do período agrupadas no banco.
+    # Retorna {(produto_id, local_id): delta} ou {(produto_id, local_id, dia): delta} se por_dia.
+    fontes = [
+        # (queryset, campo de data, campo do produto, campo do local, sinal)
+        (EntradaEstoque.objects.all(), 'data_entrada', 'product_id', 'local_id', 1),
+        (SaidaEstoque.objects.all(), 'data_saida', 'product_id', 'local_id', -1),
+        (TransferenciaEstoque.objects.all(), 'data_transferencia', 'produto_id', 'local_saida_id', -1),
+        (TransferenciaEstoque.objects.all(), 'data_transferencia', 'produto_id', 'local_entrada_id', 1),
+    ]
+
+    deltas = {}
+    for queryset, campo_data, campo_produto, campo_local, sinal in fontes:
+        queryset = _filtrar_periodo(queryset, campo_data, desde, ate)
+        if product_id is not None:
+            queryset = queryset.filter(**{campo_produto: product_id})
+        if produtos is not None:
+            queryset = queryset.filter(**{f'{campo_produto}__in': produtos})
+        if local_id is not None:
+            queryset = queryset.filter(**{campo_local: local_id})
+
+        agrupamento = [campo_produto, campo_local]
+        if por_dia:
+            queryset = queryset.annotate(dia=TruncDate(campo_data))
+            agrupamento.append('dia')
+
+        linhas = queryset.order_by().values_list(*agrupamento).annotate(total=Sum('quantidade'))
+        for *chave, total in linhas.iterator():
+            chave = tuple(chave)
+            deltas[chave] = deltas.get(chave, 0) + sinal * total
+
+    return {chave: delta for chave, delta in deltas.items() if delta}
+
+def ultimo_dia_consolidado():
+    return SnapshotEstoque.objects.aggregate(ultimo=Max('data'))['ultimo']
+
+def _snapshots_vigentes(dia, product_id=None, local_id=None):
+    # Para cada (produto, local), a linha de snapshot mais recente até o dia
+    queryset = SnapshotEstoque.objects.filter(data__lte=dia)
+    if product_id is not None:
+        queryset = queryset.filter(product_id=product_id)
+    if local_id is not None:
+        queryset = queryset.filter(local_id=local_id)
+
+    mais_recente = SnapshotEstoque.objects.filter(
+        product_id=OuterRef('product_id'), local_id=OuterRef('local_id'), data__lte=dia
+    ).order_by('-data').values('data')[:1]
+    return queryset.filter(data=Subquery(mais_recente))
+
+def saldo_em(dia, product_id=None, local_id=None):
+    # Saldo ao final do dia: snapshot mais próximo + movimentações posteriores a ele
+    ultimo = ultimo_dia_consolidado()
+    base = min(dia, ultimo) if ultimo else None
+
+    saldos = {}
+    if base is not None:
+        for produto, loc, quantidade in _snapshots_vigentes(base, product_id, local_id).values_list('product_id', 'local_id', 'quantidade'):
+            saldos[(produto, loc)] = quantidade
+
+    if base is None or base < dia:
+        desde = base + timedelta(days=1) if base is not None else None
+        for chave, delta in deltas_movimentos(desde, dia, product_id, local_id).items():
+            saldos[chave] = saldos.get(chave, 0) + delta
+
+    return {chave: quantidade for chave, quantidade in saldos.items() if quantidade}
+
+def serie_diaria(inicio, fim, product_id=None, local_id=None):
+    # Saldo de abertura via saldo_em e depois apenas as variações do período
+    saldos = saldo_em(inicio - timedelta(days=1), product_id, local_id)
+
+    variacoes = {}
+    for (produto, loc, dia), delta in deltas_movimentos(inicio, fim, product_id, local_id, por_dia=True).items():
+        variacoes.setdefault(dia, {})
+        variacoes[dia][loc] = variacoes[dia].get(loc, 0) + delta
+
+    por_local = {}
+    for (produto, loc), quantidade in saldos.items():
+        por_local[loc] = por_local.get(loc, 0) + quantidade
+
+    datas = []
+    series = {}
+    dia = inicio
+    while dia <= fim:
+        for loc, delta in variacoes.get(dia, {}).items():
+            por_local[loc] = por_local.get(loc, 0) + delta
+        for loc, quantidade in por_local.items():
+            # Locais que aparecem no meio do período começam zerados
+            series.setdefault(loc, [0] * len(datas)).append(quantidade)
+        datas.append(dia)
+        dia += timedelta(days=1)
+
+    return {'datas': datas, 'series': series}
+
+def _primeiro_dia_movimentado():
+    datas = [
+        EntradaEstoque.objects.aggregate(d=Min('data_entrada'))['d'],
+        SaidaEstoque.objects.aggregate(d=Min('data_saida'))['d'],
+        TransferenciaEstoque.objects.aggregate(d=Min('data_transferencia'))['d'],
+    ]
+    datas = [timezone.localtime(d).date() for d in datas if d is not None]
+    return min(datas) if datas else None
+
+def consolidar(ate=None):
+    # Gera os snapshots dos dias ainda não consolidados até `ate` (padrão: ontem),
+    # partindo do último snapshot e somando apenas as movimentações de cada dia.
+    ate = ate or timezone.localdate() - timedelta(days=1)
+    ultimo = ultimo_dia_consolidado()
+    desde = ultimo + timedelta(days=1) if ultimo else _primeiro_dia_movimentado()
+    if desde is None or desde > ate:
+        return 0
+
+    saldos = {}
+    if ultimo is not None:
+        for produto, loc, quantidade in _snapshots_vigentes(ultimo).values_list('product_id', 'local_id', 'quantidade').iterator():
+            saldos[(produto, loc)] = quantidade
+
+    criados = 0
+    while desde <= ate:
+        fim_janela = min(desde + timedelta(days=JANELA_CONSOLIDACAO - 1), ate)
+        deltas = deltas_movimentos(desde, fim_janela, por_dia=True)
+
+        novos = []
+        for (produto, loc, dia), delta in sorted(deltas.items(), key=lambda item: item[0][2]):
+            chave = (produto, loc)
+            saldos[chave] = saldos.get(chave, 0) + delta
+            novos.append(SnapshotEstoque(product_id=produto, local_id=loc, data=dia, quantidade=saldos[chave]))
+
+        SnapshotEstoque.objects.bulk_create(novos, batch_size=TAMANHO_LOTE)
+        criados += len(novos)
+        desde = fim_janela + timedelta(days=1)
+
+    return criados
@@ -0,0 +1,206 @@
+from suprimentos.models import Product, Armazem, Funcionario
+from .services import MovimentacaoError, registrar_entradas
+from openpyxl import load_workbook
+from django.db.models import Q
+from django.db.models.functions import Lower
+import unicodedata
+import csv
+import io
+
+COLUNAS_OBRIGATORIAS = ('produto', 'quantidade', 'local', 'tipo_entrada')
+
+# Linhas de dados aceitas por arquivo; as entradas são gravadas numa única transação
+MAXIMO_LINHAS = 10000
+# Linhas validadas por vez: produtos e funcionários do lote são resolvidos em uma consulta cada
+TAMANHO_LOTE = 500
+
+TIPOS_ENTRADA = {
+    'compra': 'COMPRA',
+    'devolucao': 'DEVOLUCAO',
+}
+
+class ImportacaoError(Exception):
+    pass
+
+def _normalizar(texto):
+    # "Devolução " -> "devolucao"
+    texto = unicodedata.normalize('NFKD', str(texto).strip().lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+def _ler_csv(arquivo):
+    texto = io.TextIOWrapper(getattr(arquivo, 'file', arquivo), encoding='utf-8-sig', newline='')
+    amostra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=';,\t')
+    except csv.Error:
+        dialeto = csv.excel
+    yield from csv.reader(texto, dialeto)
+
+def _ler_xlsx(arquivo):
+    # read_only percorre a planilha em streaming, sem montar todas as células em memória
+    planilha = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        yield from planilha.active.iter_rows(values_only=True)
+    finally:
+        planilha.close()
+
+def ler_linhas(arquivo):
+    # Devolve (numero_linha, {coluna: valor}) para cada linha de dados do arquivo
+    nome = (arquivo.name or '').lower()
+    if nome.endswith('.csv'):
+        linhas = _ler_csv(arquivo)
+    elif nome.endswith('.xlsx'):
+        linhas = _ler_xlsx(arquivo)
+    else:
+        raise ImportacaoError("Formato não suportado. Envie um arquivo .csv ou .xlsx.")
+
+    cabecalho = None
+    for numero, linha in enumerate(linhas, start=1):
+        valores = [_texto(valor) for valor in linha]
+        if not any(valores):
+            continue
+
+        if cabecalho is None:
+            cabecalho = [_normalizar(valor).replace(' ', '_') for valor in valores]
+            faltando = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in cabecalho]
+            if faltando:
+                raise ImportacaoError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}.")
+            continue
+
+        yield numero, dict(zip(cabecalho, valores))
+
+    if cabecalho is None:
+        raise ImportacaoError("O arquivo está vazio.")
+
+def _indexar_produtos(referencias):
+    # Resolve ids e nomes de produtos com no máximo duas consultas
+    ids = {int(ref) for ref in referencias if ref.isdigit()}
+    nomes = {ref.lower() for ref in referencias if ref and not ref.isdigit()}
+
+    por_id = Product.objects.in_bulk(ids)
+    por_nome = {}
+    if nomes:
+        for produto in Product.objects.annotate(nome=Lower('product_name')).filter(nome__in=nomes):
+            por_nome.setdefault(produto.nome, []).append(produto)
+    return por_id, por_nome
+
+def _indexar_funcionarios(referencias):
+    # Matrícula ou nome completo -> nome completo, só de funcionários ativos
+    funcionarios = {}
+    if not referencias:
+        return funcionarios
+    for matricula, nome in Funcionario.objects.filter(
+        Q(id_funcionario__in=referencias) | Q(nome_completo__in=referencias),
+        status=True
+    ).values_list('id_funcionario', 'nome_completo'):
+        funcionarios[matricula] = nome
+        funcionarios[nome] = nome
+    return funcionarios
+
+def _validar_lote(lote, armazens):
+    # Valida até TAMANHO_LOTE linhas brutas; produtos e funcionários são resolvidos por lote
+    produtos_por_id, produtos_por_nome = _indexar_produtos({linha.get('produto', '') for _, linha in lote})
+    funcionarios = _indexar_funcionarios({linha.get('funcionario', '') for _, linha in lote} - {''})
+
+    validas = []
+    erros = []
+    for numero, linha in lote:
+        mensagens = []
+
+        referencia = linha.get('produto', '')
+        produto = None
+        if not referencia:
+            mensagens.append("Produto não informado.")
+        elif referencia.isdigit():
+            produto = produtos_por_id.get(int(referencia))
+            if produto is None:
+                mensagens.append(f"Produto com ID {referencia} não encontrado.")
+        else:
+            encontrados = produtos_por_nome.get(referencia.lower(), [])
+            if len(encontrados) == 1:
+                produto = encontrados[0]
+            elif encontrados:
+                mensagens.append(f"Mais de um produto com o nome \"{referencia}\"; informe o ID.")
+            else:
+                mensagens.append(f"Produto \"{referencia}\" não encontrado.")
+        if produto is not None and not produto.status:
+            mensagens.append(f"Produto \"{produto.product_name}\" está inativo.")
+
+        try:
+            valor = float(linha.get('quantidade', '').replace(',', '.'))
+        except ValueError:
+            valor = 0
+        quantidade = int(valor) if valor > 0 and valor.is_integer() else None
+        if quantidade is None:
+            mensagens.append(f"Quantidade inválida: \"{linha.get('quantidade', '')}\".")
+
+        local_id = armazens.get(_normalizar(linha.get('local', '')))
+        if local_id is None:
+            mensagens.append(f"Local \"{linha.get('local', '')}\" não é um armazém ativo.")
+
+        tipo_entrada = TIPOS_ENTRADA.get(_normalizar(linha.get('tipo_entrada', '')))
+        if tipo_entrada is None:
+            mensagens.append(f"Tipo de entrada inválido: \"{linha.get('tipo_entrada', '')}\".")
+
+        funcionario = None
+        if tipo_entrada == 'DEVOLUCAO':
+            funcionario = funcionarios.get(linha.get('funcionario', ''))
+            if funcionario is None:
+                mensagens.append("Devolução exige um funcionário ativo (matrícula ou nome completo).")
+
+        if mensagens:
+            erros.append({'linha': numero, 'mensagens': mensagens})
+        else:
+            validas.append((produto.id, local_id, quantidade, tipo_entrada, funcionario))
+    return validas, erros
+
+def validar_arquivo(arquivo):
+    # Lê e valida o arquivo em lotes, à medida que as linhas chegam: só os itens já
+    # normalizados e os erros ficam em memória. Retorna (linhas_validas, erros); nada é gravado aqui.
+    armazens = {
+        _normalizar(nome): armazem_id
+        for armazem_id, nome in Armazem.objects.filter(status=True).values_list('id', 'name')
+    }
+
+    validas = []
+    erros = []
+    lote = []
+    total = 0
+    for numero, linha in ler_linhas(arquivo):
+        total += 1
+        if total > MAXIMO_LINHAS:
+            raise ImportacaoError(f"O arquivo tem mais de {MAXIMO_LINHAS} linhas de dados; divida-o em arquivos menores.")
+        lote.append((numero, linha))
+        if len(lote) == TAMANHO_LOTE:
+            validas_lote, erros_lote = _validar_lote(lote, armazens)
+            validas += validas_lote
+            erros += erros_lote
+            lote = []
+    if lote:
+        validas_lote, erros_lote = _validar_lote(lote, armazens)
+        validas += validas_lote
+        erros += erros_lote
+
+    if not total:
+        raise ImportacaoError("O arquivo não possui linhas de dados.")
+    return validas, erros
+
+def importar_entradas(arquivo, usuario):
+    # Tudo ou nada: se alguma linha tiver erro, nada é gravado
+    validas, erros = validar_arquivo(arquivo)
+    if erros:
+        return 0, erros
+
+    try:
+        registrar_entradas(usuario, validas)
+    except MovimentacaoError as e:
+        return 0, [{'linha': None, 'mensagens': [str(e)]}]
+    return len(validas), []
@@ -0,0 +1,141 @@
+from .models import EntradaEstoque, SaidaEstoque, TransferenciaEstoque
+from .historico import _inicio_do_dia, saldo_em
+from .relatorios import RelatorioPDF
+from suprimentos.models import Armazem
+from django.db.models import DateTimeField, Value
+from django.db import connection
+from django.utils import timezone
+from openpyxl import Workbook
+from datetime import timedelta
+
+TIPOS = {
+    'ENTRADA': 'Entrada',
+    'SAIDA': 'Saída',
+    'TRANSFERENCIA_SAIDA': 'Transferência (saída)',
+    'TRANSFERENCIA_ENTRADA': 'Transferência (entrada)',
+}
+
+# Sem `desde`, o kardex mostra só os últimos dias (com o saldo de abertura do dia
+# anterior): o histórico inteiro de um item antigo e de giro alto não cabe numa resposta
+JANELA_PADRAO_DIAS = 90
+
+# (tabela, coluna do produto, coluna do local, coluna de data, tipo, sinal)
+RAMOS = (
+    (EntradaEstoque, 'product_id', 'local_id', 'data_entrada', 'ENTRADA', 1),
+    (SaidaEstoque, 'product_id', 'local_id', 'data_saida', 'SAIDA', -1),
+    (TransferenciaEstoque, 'produto_id', 'local_saida_id', 'data_transferencia', 'TRANSFERENCIA_SAIDA', -1),
+    (TransferenciaEstoque, 'produto_id', 'local_entrada_id', 'data_transferencia', 'TRANSFERENCIA_ENTRADA', 1),
+)
+
+def _sql_movimentos(product_id, inicio, fim, local_id):
+    qn = connection.ops.quote_name
+    partes = []
+    parametros = []
+    for modelo, coluna_produto, coluna_local, coluna_data, tipo, sinal in RAMOS:
+        condicoes = [f"{qn(coluna_produto)} = %s"]
+        parametros_ramo = [product_id]
+        if inicio is not None:
+            condicoes.append(f"{qn(coluna_data)} >= %s")
+            parametros_ramo.append(connection.ops.adapt_datetimefield_value(inicio))
+        if fim is not None:
+            condicoes.append(f"{qn(coluna_data)} < %s")
+            parametros_ramo.append(connection.ops.adapt_datetimefield_value(fim))
+        if local_id is not None:
+            condicoes.append(f"{qn(coluna_local)} = %s")
+            parametros_ramo.append(local_id)
+
+        partes.append(
+            f"SELECT {qn(coluna_local)} AS local_id, {qn(coluna_data)} AS ts, '{tipo}' AS tipo, "
+            f"id AS mov_id, {'' if sinal > 0 else '-'}quantidade AS quantidade "
+            f"FROM {qn(modelo._meta.db_table)} WHERE {' AND '.join(condicoes)}"
+        )
+        parametros.extend(parametros_ramo)
+
+    return " UNION ALL ".join(partes), parametros
+
+def periodo(desde=None, ate=None):
+    # (desde, ate) efetivos: sem `desde`, os JANELA_PADRAO_DIAS dias até `ate` (ou hoje)
+    if desde is None:
+        desde = (ate or timezone.localdate()) - timedelta(days=JANELA_PADRAO_DIAS - 1)
+    return desde, ate
+
+def kardex(product_id, desde=None, ate=None, local_id=None):
+    # Razão do produto por local. O saldo acumulado vem da window function do banco;
+    # com `desde`, parte do saldo de abertura (snapshots) em vez do início do histórico.
+    inicio = _inicio_do_dia(desde) if desde is not None else None
+    fim = _inicio_do_dia(ate + timedelta(days=1)) if ate is not None else None
+    movimentos, parametros = _sql_movimentos(product_id, inicio, fim, local_id)
+
+    sql = (
+        "SELECT local_id, ts, tipo, mov_id, quantidade, "
+        "SUM(quantidade) OVER (PARTITION BY local_id ORDER BY ts, tipo, mov_id ROWS UNBOUNDED PRECEDING) AS acumulado "
+        f"FROM ({movimentos}) movimentos "
+        "ORDER BY local_id, ts, tipo, mov_id"
+    )
+
+    abertura = {}
+    if desde is not None:
+        for (_, loc), quantidade in saldo_em(desde - timedelta(days=1), product_id, local_id).items():
+            abertura[loc] = quantidade
+
+    # SQL cru não passa pelos conversores do ORM (no SQLite a data volta como texto)
+    expressao_data = Value(None, output_field=DateTimeField())
+    conversores = connection.ops.get_db_converters(expressao_data)
+
+    por_local = {loc: [] for loc in abertura}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        for loc, ts, tipo, mov_id, quantidade, acumulado in cursor.fetchall():
+            for conversor in conversores:
+                ts = conversor(ts, expressao_data, connection)
+            por_local.setdefault(loc, []).append({
+                'data': ts,
+                'tipo': tipo,
+                'tipo_display': TIPOS[tipo],
+                'mov_id': mov_id,
+                'quantidade': quantidade,
+                'saldo': abertura.get(loc, 0) + acumulado,
+            })
+
+    nomes = dict(Armazem.objects.filter(pk__in=por_local.keys()).values_list('id', 'name'))
+    resultado = []
+    for loc, linhas in por_local.items():
+        saldo_inicial = abertura.get(loc, 0)
+        resultado.append({
+            'local_id': loc,
+            'local': nomes.get(loc),
+            'saldo_inicial': saldo_inicial,
+            'movimentos': linhas,
+            'saldo_final': linhas[-1]['saldo'] if linhas else saldo_inicial,
+        })
+    return sorted(resultado, key=lambda item: item['local'] or '')
+
+def linhas_exportacao(resultado):
+    # (local, data, tipo, quantidade, saldo) com uma linha de saldo inicial por local
+    for local in resultado:
+        yield (local['local'], '', 'Saldo inicial', '', local['saldo_inicial'])
+        for movimento in local['movimentos']:
+            yield (
+                local['local'],
+                timezone.localtime(movimento['data']).strftime('%d/%m/%Y %H:%M'),
+                movimento['tipo_display'],
+                movimento['quantidade'],
+                movimento['saldo'],
+            )
+
+def gerar_excel(resultado, destino):
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet("Kardex")
+    aba.append(["Local", "Data", "Tipo", "Quantidade", "Saldo"])
+    for linha in linhas_exportacao(resultado):
+        aba.append(list(linha))
+    planilha.save(destino)
+
+def gerar_pdf(resultado, produto, destino):
+    RelatorioPDF(f"Kardex: {produto.product_name[:30]}", [
+        ("Local", 30, 25),
+        ("Data", 190, 16),
+        ("Tipo", 280, 24),
+        ("Quantidade", 420, 10),
+        ("Saldo", 490, 10),
+    ]).gerar(linhas_exportacao(resultado), destino)
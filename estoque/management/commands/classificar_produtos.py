@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from estoque.classificacao import reclassificar, SEMANAS_PADRAO
+
+class Command(BaseCommand):
+    help = "Recalcula a classificação ABC/XYZ dos produtos a partir das saídas (agendar para rodar todas as noites)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semanas', type=int, default=SEMANAS_PADRAO, help=f"Semanas de histórico usadas (padrão: {SEMANAS_PADRAO}).")
+
+    def handle(self, *args, **options):
+        if options['semanas'] < 2:
+            raise CommandError("Informe ao menos duas semanas de histórico.")
+
+        novas, alteradas = reclassificar(options['semanas'])
+        self.stdout.write(self.style.SUCCESS(f"{novas} produto(s) classificado(s) pela primeira vez, {alteradas} atualizado(s)."))
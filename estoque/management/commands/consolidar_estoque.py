@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from estoque.historico import consolidar
+from datetime import date
+
+class Command(BaseCommand):
+    help = "Gera os snapshots diários de estoque ainda não consolidados (executar todas as noites)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ate', help="Último dia a consolidar (AAAA-MM-DD). Padrão: ontem.")
+
+    def handle(self, *args, **options):
+        ate = None
+        if options['ate']:
+            try:
+                ate = date.fromisoformat(options['ate'])
+            except ValueError:
+                raise CommandError("Data inválida. Use o formato AAAA-MM-DD.")
+
+        criados = consolidar(ate)
+        self.stdout.write(self.style.SUCCESS(f"{criados} linha(s) de snapshot gerada(s)."))
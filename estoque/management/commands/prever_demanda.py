@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from estoque.previsao import prever, SEMANAS_PADRAO, ALFA_PADRAO
+import time
+
+class Command(BaseCommand):
+    help = "Recalcula a previsão de demanda e os dias de cobertura de cada produto/local a partir das saídas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semanas', type=int, default=SEMANAS_PADRAO, help=f"Semanas de histórico usadas (padrão: {SEMANAS_PADRAO}).")
+        parser.add_argument('--alfa', type=float, default=ALFA_PADRAO, help=f"Fator da suavização exponencial, entre 0 e 1 (padrão: {ALFA_PADRAO}).")
+
+    def handle(self, *args, **options):
+        if options['semanas'] < 1:
+            raise CommandError("Informe ao menos uma semana de histórico.")
+        if not 0 < options['alfa'] <= 1:
+            raise CommandError("O fator de suavização deve estar entre 0 (exclusive) e 1.")
+
+        inicio = time.monotonic()
+        pares = prever(options['semanas'], options['alfa'])
+        self.stdout.write(self.style.SUCCESS(f"Previsão calculada para {pares} produto(s)/local(is) em {time.monotonic() - inicio:.1f}s."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from estoque.exportacao import proxima_pendente, processar, remover_expiradas
+import time
+
+class Command(BaseCommand):
+    help = "Worker das exportações de estoque: processa os jobs pendentes e remove os arquivos expirados."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=5, help="Segundos de espera quando não há jobs.")
+        parser.add_argument('--uma-vez', action='store_true', help="Processa os jobs pendentes e encerra.")
+
+    def handle(self, *args, **options):
+        while True:
+            removidas = remover_expiradas()
+            if removidas:
+                self.stdout.write(f"{removidas} exportação(ões) expirada(s) removida(s).")
+
+            exportacao = proxima_pendente()
+            while exportacao is not None:
+                try:
+                    processar(exportacao)
+                    self.stdout.write(self.style.SUCCESS(f"Exportação {exportacao.pk} concluída ({exportacao.total} linhas)."))
+                except Exception as e:
+                    self.stderr.write(f"Exportação {exportacao.pk} falhou: {e}")
+                exportacao = proxima_pendente()
+
+            if options['uma_vez']:
+                return
+            time.sleep(options['intervalo'])
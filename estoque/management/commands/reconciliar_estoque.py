@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from estoque.reconciliacao import divergencias, corrigir
+from suprimentos.models import Product, Armazem
+
+class Command(BaseCommand):
+    help = "Recalcula o saldo de cada produto/local a partir das movimentações e lista as divergências com o Estoque."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corrigir', action='store_true', help="Ajusta o Estoque para o saldo calculado.")
+        parser.add_argument('--limite', type=int, default=100, help="Máximo de divergências listadas (0 = todas).")
+
+    def handle(self, *args, **options):
+        itens = divergencias()
+        if not itens:
+            self.stdout.write(self.style.SUCCESS("Nenhuma divergência encontrada."))
+            return
+
+        exibidos = itens[:options['limite']] if options['limite'] else itens
+        produtos = dict(Product.objects.filter(pk__in={item['product_id'] for item in exibidos}).values_list('id', 'product_name'))
+        locais = dict(Armazem.objects.filter(pk__in={item['local_id'] for item in exibidos}).values_list('id', 'name'))
+        for item in exibidos:
+            self.stdout.write(
+                f"{produtos.get(item['product_id'], item['product_id'])} @ {locais.get(item['local_id'], item['local_id'])}: "
+                f"registrado {item['registrado']}, esperado {item['esperado']} ({item['diferenca']:+d})"
+            )
+        if len(exibidos) < len(itens):
+            self.stdout.write(f"... e mais {len(itens) - len(exibidos)} divergência(s).")
+
+        self.stdout.write(self.style.WARNING(f"{len(itens)} divergência(s) encontrada(s)."))
+        if options['corrigir']:
+            corrigidos = corrigir(itens)
+            self.stdout.write(self.style.SUCCESS(f"{corrigidos} saldo(s) corrigido(s)."))
+            if corrigidos < len(itens):
+                self.stdout.write(self.style.WARNING(
+                    f"{len(itens) - corrigidos} não foram alterados (saldo esperado negativo ou já acertado por uma movimentação)."
+                ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from estoque.consumo import reconstruir
+from datetime import date
+
+class Command(BaseCommand):
+    help = "Recalcula o consumo mensal por centro de custo a partir das saídas (carga inicial ou correção)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Primeiro mês a recalcular (AAAA-MM). Padrão: todo o histórico.")
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            try:
+                desde = date.fromisoformat(f"{options['desde']}-01")
+            except ValueError:
+                raise CommandError("Mês inválido. Use o formato AAAA-MM.")
+
+        criados = reconstruir(desde)
+        self.stdout.write(self.style.SUCCESS(f"{criados} linha(s) de consumo gerada(s)."))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 18:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0011_entradaestoque_funcionario_and_more'),
+        ('suprimentos', '0021_alter_request_created_by'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('local', models.CharField(max_length=255)),
+                ('data', models.DateField()),
+                ('quantidade', models.IntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='suprimentos.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['data'], name='snapshot_data_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'local', 'data'), name='snapshot_unico_produto_local_data')],
+            },
+        ),
+    ]
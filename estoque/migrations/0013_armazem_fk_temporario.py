@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-18 19:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0012_snapshotestoque'),
+        ('suprimentos', '0021_alter_request_created_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estoque',
+            name='armazem',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='suprimentos.armazem'),
+        ),
+        migrations.AddField(
+            model_name='entradaestoque',
+            name='armazem',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='suprimentos.armazem'),
+        ),
+        migrations.AddField(
+            model_name='saidaestoque',
+            name='armazem',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='suprimentos.armazem'),
+        ),
+        migrations.AddField(
+            model_name='transferenciaestoque',
+            name='armazem_saida',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='suprimentos.armazem'),
+        ),
+        migrations.AddField(
+            model_name='transferenciaestoque',
+            name='armazem_entrada',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='suprimentos.armazem'),
+        ),
+    ]
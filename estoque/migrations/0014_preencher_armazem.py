@@ -0,0 +1,79 @@
+# Generated by Django 5.2 on 2026-10-18 19:20
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def _chave(nome):
+    return ' '.join(nome.split()).casefold()
+
+
+def preencher_armazem(apps, schema_editor):
+    Armazem = apps.get_model('suprimentos', 'Armazem')
+    Estoque = apps.get_model('estoque', 'Estoque')
+    EntradaEstoque = apps.get_model('estoque', 'EntradaEstoque')
+    SaidaEstoque = apps.get_model('estoque', 'SaidaEstoque')
+    TransferenciaEstoque = apps.get_model('estoque', 'TransferenciaEstoque')
+    SnapshotEstoque = apps.get_model('estoque', 'SnapshotEstoque')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    # (modelo, campo texto antigo, campo FK novo)
+    colunas = [
+        (Estoque, 'local', 'armazem'),
+        (EntradaEstoque, 'local', 'armazem'),
+        (SaidaEstoque, 'local', 'armazem'),
+        (TransferenciaEstoque, 'local_saida', 'armazem_saida'),
+        (TransferenciaEstoque, 'local_entrada', 'armazem_entrada'),
+    ]
+
+    nomes = set()
+    for modelo, texto, _ in colunas:
+        nomes.update(modelo.objects.values_list(texto, flat=True).distinct())
+
+    # Casa cada texto com um armazém cadastrado (ignorando caixa e espaços extras)
+    armazens = {}
+    for armazem_id, nome in Armazem.objects.order_by('id').values_list('id', 'name'):
+        armazens.setdefault(_chave(nome), armazem_id)
+
+    faltando = sorted({' '.join(nome.split()) for nome in nomes if _chave(nome) not in armazens})
+    if faltando:
+        usuario = User.objects.order_by('id').first()
+        if usuario is None:
+            raise RuntimeError("Nenhum usuário cadastrado para registrar os armazéns: " + ', '.join(faltando))
+        for nome in faltando:
+            # Locais que só existiam como texto livre entram inativos para revisão
+            armazem = Armazem.objects.create(name=nome, status=False, usuario_registrante=usuario)
+            armazens[_chave(nome)] = armazem.id
+
+    for modelo, texto, fk in colunas:
+        for nome in modelo.objects.values_list(texto, flat=True).distinct():
+            modelo.objects.filter(**{texto: nome}).update(**{f'{fk}_id': armazens[_chave(nome)]})
+
+    # Funde saldos duplicados de (produto, armazém) na linha de menor id
+    duplicados = (
+        Estoque.objects.values('product_id', 'armazem_id')
+        .annotate(linhas=Count('id'), total=Sum('quantidade'), manter=Min('id'))
+        .filter(linhas__gt=1)
+    )
+    for grupo in duplicados:
+        Estoque.objects.filter(pk=grupo['manter']).update(quantidade=grupo['total'])
+        Estoque.objects.filter(
+            product_id=grupo['product_id'], armazem_id=grupo['armazem_id']
+        ).exclude(pk=grupo['manter']).delete()
+
+    # Snapshots são derivados das movimentações: são descartados e regerados
+    # pelo comando consolidar_estoque já com os armazéns unificados.
+    SnapshotEstoque.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0013_armazem_fk_temporario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_armazem),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.2 on 2026-10-18 19:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0014_preencher_armazem'),
+        ('suprimentos', '0021_alter_request_created_by'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='snapshotestoque',
+            name='snapshot_unico_produto_local_data',
+        ),
+        migrations.RemoveField(
+            model_name='estoque',
+            name='local',
+        ),
+        migrations.RemoveField(
+            model_name='entradaestoque',
+            name='local',
+        ),
+        migrations.RemoveField(
+            model_name='saidaestoque',
+            name='local',
+        ),
+        migrations.RemoveField(
+            model_name='transferenciaestoque',
+            name='local_saida',
+        ),
+        migrations.RemoveField(
+            model_name='transferenciaestoque',
+            name='local_entrada',
+        ),
+        migrations.RemoveField(
+            model_name='snapshotestoque',
+            name='local',
+        ),
+        migrations.RenameField(
+            model_name='estoque',
+            old_name='armazem',
+            new_name='local',
+        ),
+        migrations.RenameField(
+            model_name='entradaestoque',
+            old_name='armazem',
+            new_name='local',
+        ),
+        migrations.RenameField(
+            model_name='saidaestoque',
+            old_name='armazem',
+            new_name='local',
+        ),
+        migrations.RenameField(
+            model_name='transferenciaestoque',
+            old_name='armazem_saida',
+            new_name='local_saida',
+        ),
+        migrations.RenameField(
+            model_name='transferenciaestoque',
+            old_name='armazem_entrada',
+            new_name='local_entrada',
+        ),
+        migrations.AlterField(
+            model_name='estoque',
+            name='local',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='suprimentos.armazem'),
+        ),
+        migrations.AlterField(
+            model_name='entradaestoque',
+            name='local',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='suprimentos.armazem'),
+        ),
+        migrations.AlterField(
+            model_name='saidaestoque',
+            name='local',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='suprimentos.armazem'),
+        ),
+        migrations.AlterField(
+            model_name='transferenciaestoque',
+            name='local_saida',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transferencias_saida', to='suprimentos.armazem'),
+        ),
+        migrations.AlterField(
+            model_name='transferenciaestoque',
+            name='local_entrada',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transferencias_entrada', to='suprimentos.armazem'),
+        ),
+        migrations.AddField(
+            model_name='snapshotestoque',
+            name='local',
+            field=models.ForeignKey(default=None, on_delete=django.db.models.deletion.CASCADE, to='suprimentos.armazem'),
+            preserve_default=False,
+        ),
+        migrations.AddConstraint(
+            model_name='estoque',
+            constraint=models.UniqueConstraint(fields=('product', 'local'), name='estoque_unico_produto_local'),
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotestoque',
+            constraint=models.UniqueConstraint(fields=('product', 'local', 'data'), name='snapshot_unico_produto_local_data'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0017_cache_exportacao'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entradaestoque',
+            index=models.Index(fields=['data_entrada', 'id'], name='entrada_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saidaestoque',
+            index=models.Index(fields=['data_saida', 'id'], name='saida_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transferenciaestoque',
+            index=models.Index(fields=['data_transferencia', 'id'], name='transferencia_data_idx'),
+        ),
+    ]
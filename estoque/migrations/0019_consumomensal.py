@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 23:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0018_indices_data_movimentacoes'),
+        ('suprimentos', '0023_indices_sugestoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('quantidade', models.PositiveBigIntegerField(default=0)),
+                ('linhas', models.PositiveIntegerField(default=0)),
+                ('centro_custo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='suprimentos.centrocusto')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='suprimentos.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['mes', 'centro_custo'], name='consumo_mes_idx')],
+                'constraints': [models.UniqueConstraint(fields=('centro_custo', 'product', 'mes'), name='consumo_unico_centro_produto_mes')],
+            },
+        ),
+    ]
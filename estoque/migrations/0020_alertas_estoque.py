@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-18 23:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0019_consumomensal'),
+        ('suprimentos', '0023_indices_sugestoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.IntegerField()),
+                ('minimo', models.PositiveIntegerField()),
+                ('maximo', models.PositiveIntegerField(blank=True, null=True)),
+                ('desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('local', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='suprimentos.armazem')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='suprimentos.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['local', 'product'], name='alerta_local_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'local'), name='alerta_unico_produto_local')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ParametroEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minimo', models.PositiveIntegerField(blank=True, null=True)),
+                ('maximo', models.PositiveIntegerField(blank=True, null=True)),
+                ('local', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='suprimentos.armazem')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='suprimentos.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'local'), name='parametro_unico_produto_local')],
+            },
+        ),
+    ]
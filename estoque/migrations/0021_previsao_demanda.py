@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 00:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0020_alertas_estoque'),
+        ('suprimentos', '0023_indices_sugestoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrevisaoDemanda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('media_4_semanas', models.FloatField()),
+                ('media_12_semanas', models.FloatField()),
+                ('previsao_semanal', models.FloatField()),
+                ('demanda_diaria', models.FloatField()),
+                ('saldo', models.IntegerField()),
+                ('dias_cobertura', models.FloatField(blank=True, null=True)),
+                ('calculado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('local', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='suprimentos.armazem')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='suprimentos.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['local', 'dias_cobertura'], name='previsao_cobertura_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'local'), name='previsao_unica_produto_local')],
+            },
+        ),
+    ]
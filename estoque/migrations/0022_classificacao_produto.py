@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 00:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0021_previsao_demanda'),
+        ('suprimentos', '0023_indices_sugestoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassificacaoProduto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('classe_abc', models.CharField(choices=[('A', 'A - maior volume'), ('B', 'B - volume intermediário'), ('C', 'C - menor volume')], max_length=1)),
+                ('classe_xyz', models.CharField(choices=[('X', 'X - demanda estável'), ('Y', 'Y - demanda variável'), ('Z', 'Z - demanda irregular')], max_length=1)),
+                ('total', models.PositiveBigIntegerField(default=0)),
+                ('coeficiente_variacao', models.FloatField(blank=True, null=True)),
+                ('calculado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='classificacao', to='suprimentos.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['classe_abc', 'classe_xyz'], name='classificacao_classes_idx')],
+            },
+        ),
+    ]
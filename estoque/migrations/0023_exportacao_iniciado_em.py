@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0022_classificacao_produto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportacaoestoque',
+            name='iniciado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='exportacaoestoque',
+            name='tentativas',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
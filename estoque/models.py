@@ -1,16 +1,22 @@
-from suprimentos.models import Product, Funcionario, CentroCusto
+from suprimentos.models import Product, Funcionario, CentroCusto, Armazem
 from django.utils.timezone import now
 from django.utils import timezone
 from django.conf import settings
 from accounts.forms import User
 from django.db import models
+import uuid
 
 # Modelo de Estoque
 class Estoque(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
-    local = models.CharField(max_length=255)
+    local = models.ForeignKey(Armazem, on_delete=models.PROTECT)
     quantidade = models.PositiveIntegerField()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'local'], name='estoque_unico_produto_local'),
+        ]
+
     def __str__(self):
         return f"{self.product.product_name} - {self.local}"
 
@@ -22,7 +28,7 @@ class EntradaEstoque(models.Model):
     ]
 
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
-    local = models.CharField(max_length=255)
+    local = models.ForeignKey(Armazem, on_delete=models.PROTECT)
     quantidade = models.PositiveIntegerField()
     data_entrada = models.DateTimeField(auto_now_add=True)
     usuario_registrante = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -36,13 +42,18 @@ class EntradaEstoque(models.Model):
         blank=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['data_entrada', 'id'], name='entrada_data_idx'),
+        ]
+
     def __str__(self):
         return f"Entrada: {self.product.product_name} - {self.quantidade} ({self.tipo_entrada})"
 
 # Modelo de log de saidas no estoque
 class SaidaEstoque(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
-    local = models.CharField(max_length=255)
+    local = models.ForeignKey(Armazem, on_delete=models.PROTECT)
     quantidade = models.PositiveIntegerField()
     responsavel = models.ForeignKey(Funcionario, on_delete=models.SET_NULL, null=True)
     centro_custo = models.ForeignKey(CentroCusto, on_delete=models.SET_NULL, null=True)
@@ -50,20 +61,224 @@ class SaidaEstoque(models.Model):
     usuario_registrante = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     data_saida = models.DateTimeField(default=now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['data_saida', 'id'], name='saida_data_idx'),
+        ]
+
     def __str__(self):
         return f"Saída de {self.quantidade} {self.product.product_name} do local {self.local}"
 
 # Modelo de log de transferências entre locais
 class TransferenciaEstoque(models.Model):
     produto = models.ForeignKey('suprimentos.Product', on_delete=models.CASCADE)
-    local_saida = models.CharField(max_length=255)
-    local_entrada = models.CharField(max_length=255)
+    local_saida = models.ForeignKey(Armazem, on_delete=models.PROTECT, related_name='transferencias_saida')
+    local_entrada = models.ForeignKey(Armazem, on_delete=models.PROTECT, related_name='transferencias_entrada')
     quantidade = models.PositiveIntegerField()
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     responsavel = models.ForeignKey(Funcionario, on_delete=models.SET_NULL, null=True, blank=True)
     data_transferencia = models.DateTimeField(default=timezone.now)
     observacao = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['data_transferencia', 'id'], name='transferencia_data_idx'),
+        ]
+
     def __str__(self):
         return f"{self.quantidade} de {self.produto} transferido de {self.local_saida} para {self.local_entrada}"
 
+
+# Saldo consolidado por dia: uma linha por (produto, local) apenas nos dias em que o saldo mudou
+class SnapshotEstoque(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    local = models.ForeignKey(Armazem, on_delete=models.CASCADE)
+    data = models.DateField()
+    quantidade = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'local', 'data'], name='snapshot_unico_produto_local_data'),
+        ]
+        indexes = [
+            models.Index(fields=['data'], name='snapshot_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.product_name} - {self.local} em {self.data:%d/%m/%Y}: {self.quantidade}"
+
+
+def _caminho_exportacao(instance, filename):
+    # Nome aleatório: os arquivos só devem ser obtidos pela view de download
+    return f"exportacoes/{uuid.uuid4().hex}/{filename}"
+
+# Exportação de estoque processada em segundo plano (manage.py processar_exportacoes)
+class ExportacaoEstoque(models.Model):
+    FORMATO_CHOICES = [
+        ('EXCEL', 'Excel'),
+        ('PDF', 'PDF'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('PROCESSANDO', 'Processando'),
+        ('CONCLUIDA', 'Concluída'),
+        ('ERRO', 'Erro'),
+    ]
+
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='exportacoes_estoque')
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES)
+    filtros = models.JSONField(default=dict, blank=True)
+    # Hash dos filtros normalizados + versão do estoque lida antes de gerar o arquivo
+    chave = models.CharField(max_length=40, blank=True)
+    versao = models.PositiveBigIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='PENDENTE')
+    total = models.PositiveIntegerField(default=0)
+    processadas = models.PositiveIntegerField(default=0)
+    arquivo = models.FileField(upload_to=_caminho_exportacao, blank=True)
+    erro = models.TextField(blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    # Reserva pelo worker; jobs parados em PROCESSANDO há muito tempo são retomados
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+    expira_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='exportacao_status_idx'),
+            models.Index(fields=['formato', 'chave', 'versao'], name='exportacao_cache_idx'),
+        ]
+
+    @property
+    def progresso(self):
+        if self.status == 'CONCLUIDA':
+            return 100
+        return int(self.processadas * 100 / self.total) if self.total else 0
+
+    def __str__(self):
+        return f"Exportação {self.get_formato_display()} de {self.usuario} ({self.get_status_display()})"
+
+
+# Contador incrementado a cada alteração de estoque; invalida as exportações em cache
+class VersaoEstoque(models.Model):
+    chave = models.CharField(max_length=50, unique=True)
+    valor = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.chave}: {self.valor}"
+
+
+# Consumo mensal por centro de custo e produto, mantido pelas saídas (estoque/consumo.py)
+class ConsumoMensal(models.Model):
+    centro_custo = models.ForeignKey(CentroCusto, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    mes = models.DateField()  # Primeiro dia do mês
+    quantidade = models.PositiveBigIntegerField(default=0)
+    linhas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['centro_custo', 'product', 'mes'], name='consumo_unico_centro_produto_mes'),
+        ]
+        indexes = [
+            models.Index(fields=['mes', 'centro_custo'], name='consumo_mes_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.centro_custo} - {self.product.product_name} em {self.mes:%m/%Y}: {self.quantidade}"
+
+
+# Ponto de reposição por produto/local
+class ParametroEstoque(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    local = models.ForeignKey(Armazem, on_delete=models.CASCADE)
+    minimo = models.PositiveIntegerField(null=True, blank=True)
+    maximo = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'local'], name='parametro_unico_produto_local'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.product_name} - {self.local}: mín. {self.minimo}, máx. {self.maximo}"
+
+
+# Pares produto/local abaixo do mínimo, mantidos a cada movimentação (estoque/alertas.py)
+class AlertaEstoque(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    local = models.ForeignKey(Armazem, on_delete=models.CASCADE)
+    quantidade = models.IntegerField()
+    minimo = models.PositiveIntegerField()
+    maximo = models.PositiveIntegerField(null=True, blank=True)
+    desde = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'local'], name='alerta_unico_produto_local'),
+        ]
+        indexes = [
+            models.Index(fields=['local', 'product'], name='alerta_local_idx'),
+        ]
+
+    @property
+    def reposicao(self):
+        # Quanto falta para voltar ao máximo (ou ao mínimo, se não houver máximo)
+        return (self.maximo or self.minimo) - self.quantidade
+
+    def __str__(self):
+        return f"{self.product.product_name} - {self.local}: {self.quantidade} (mín. {self.minimo})"
+
+
+# Previsão de demanda por produto/local, recalculada em lote (estoque/previsao.py)
+class PrevisaoDemanda(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    local = models.ForeignKey(Armazem, on_delete=models.CASCADE)
+    media_4_semanas = models.FloatField()
+    media_12_semanas = models.FloatField()
+    previsao_semanal = models.FloatField()  # Suavização exponencial das semanas fechadas
+    demanda_diaria = models.FloatField()
+    saldo = models.IntegerField()
+    dias_cobertura = models.FloatField(null=True, blank=True)  # Vazio quando não há demanda
+    calculado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'local'], name='previsao_unica_produto_local'),
+        ]
+        indexes = [
+            models.Index(fields=['local', 'dias_cobertura'], name='previsao_cobertura_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.product_name} - {self.local}: {self.previsao_semanal:.1f}/semana"
+
+
+# Classe ABC (volume de saídas) e XYZ (variabilidade semanal) de cada produto,
+# recalculada todas as noites (estoque/classificacao.py)
+class ClassificacaoProduto(models.Model):
+    CLASSES_ABC = [
+        ('A', 'A - maior volume'),
+        ('B', 'B - volume intermediário'),
+        ('C', 'C - menor volume'),
+    ]
+    CLASSES_XYZ = [
+        ('X', 'X - demanda estável'),
+        ('Y', 'Y - demanda variável'),
+        ('Z', 'Z - demanda irregular'),
+    ]
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='classificacao')
+    classe_abc = models.CharField(max_length=1, choices=CLASSES_ABC)
+    classe_xyz = models.CharField(max_length=1, choices=CLASSES_XYZ)
+    total = models.PositiveBigIntegerField(default=0)  # Saídas no período analisado
+    coeficiente_variacao = models.FloatField(null=True, blank=True)  # Vazio quando não há saídas
+    calculado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['classe_abc', 'classe_xyz'], name='classificacao_classes_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.product_name}: {self.classe_abc}{self.classe_xyz}"
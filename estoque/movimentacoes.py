@@ -0,0 +1,100 @@
+from .models import EntradaEstoque, SaidaEstoque, TransferenciaEstoque
+from .historico import _filtrar_periodo
+from suprimentos.models import Funcionario
+from django.db.models import CharField, F, Q, Value
+from django.db import connection
+from datetime import datetime
+
+# Colunas comuns às três tabelas, na ordem do SELECT de cada ramo do UNION ALL
+COLUNAS = (
+    'tipo', 'mov_id', 'data', 'produto_id', 'produto', 'origem', 'destino',
+    'quantidade', 'usuario', 'funcionario', 'detalhe',
+)
+
+def _texto(valor=None):
+    return Value(valor, output_field=CharField())
+
+def _ramos():
+    # (tipo, queryset projetado, campo de data, campos de local, campo do usuário)
+    return [
+        ('ENTRADA', EntradaEstoque.objects.annotate(
+            tipo=_texto('ENTRADA'), mov_id=F('id'), data=F('data_entrada'),
+            produto_ref=F('product_id'), produto_nome=F('product__product_name'),
+            origem=_texto(), destino=F('local__name'), quantidade_mov=F('quantidade'),
+            usuario_nome=F('usuario_registrante__username'), funcionario_nome=F('funcionario'),
+            detalhe=F('tipo_entrada'),
+        ), 'data_entrada', ['local_id'], 'usuario_registrante_id'),
+        ('SAIDA', SaidaEstoque.objects.annotate(
+            tipo=_texto('SAIDA'), mov_id=F('id'), data=F('data_saida'),
+            produto_ref=F('product_id'), produto_nome=F('product__product_name'),
+            origem=F('local__name'), destino=_texto(), quantidade_mov=F('quantidade'),
+            usuario_nome=F('usuario_registrante__username'), funcionario_nome=F('responsavel__nome_completo'),
+            detalhe=F('observacao'),
+        ), 'data_saida', ['local_id'], 'usuario_registrante_id'),
+        ('TRANSFERENCIA', TransferenciaEstoque.objects.annotate(
+            tipo=_texto('TRANSFERENCIA'), mov_id=F('id'), data=F('data_transferencia'),
+            produto_ref=F('produto_id'), produto_nome=F('produto__product_name'),
+            origem=F('local_saida__name'), destino=F('local_entrada__name'), quantidade_mov=F('quantidade'),
+            usuario_nome=F('usuario__username'), funcionario_nome=F('responsavel__nome_completo'),
+            detalhe=F('observacao'),
+        ), 'data_transferencia', ['local_saida_id', 'local_entrada_id'], 'usuario_id'),
+    ]
+
+def codificar_cursor(movimento):
+    return f"{movimento['data'].isoformat()}|{movimento['tipo']}|{movimento['mov_id']}"
+
+def decodificar_cursor(cursor):
+    # Levanta ValueError para cursores malformados
+    data, tipo, mov_id = cursor.split('|')
+    return datetime.fromisoformat(data), tipo, int(mov_id)
+
+def _apos_cursor(queryset, campo_data, tipo, cursor):
+    # Condição de keyset (data, tipo, id) < cursor, especializada para o tipo fixo do ramo
+    data, tipo_cursor, mov_id = cursor
+    if tipo < tipo_cursor:
+        return queryset.filter(**{f'{campo_data}__lte': data})
+    if tipo > tipo_cursor:
+        return queryset.filter(**{f'{campo_data}__lt': data})
+    return queryset.filter(Q(**{f'{campo_data}__lt': data}) | Q(**{campo_data: data, 'id__lt': mov_id}))
+
+def listar(tamanho, cursor=None, produto_id=None, local_id=None, usuario_id=None, funcionario_id=None, desde=None, ate=None):
+    # Página de movimentações, da mais recente para a mais antiga. Retorna (itens, proximo_cursor).
+    nome_funcionario = None
+    if funcionario_id is not None:
+        nome_funcionario = Funcionario.objects.filter(pk=funcionario_id).values_list('nome_completo', flat=True).first()
+
+    consultas = []
+    for tipo, queryset, campo_data, campos_local, campo_usuario in _ramos():
+        queryset = _filtrar_periodo(queryset, campo_data, desde, ate)
+        if produto_id is not None:
+            queryset = queryset.filter(produto_ref=produto_id)
+        if local_id is not None:
+            filtro_local = Q()
+            for campo in campos_local:
+                filtro_local |= Q(**{campo: local_id})
+            queryset = queryset.filter(filtro_local)
+        if usuario_id is not None:
+            queryset = queryset.filter(**{campo_usuario: usuario_id})
+        if funcionario_id is not None:
+            # A entrada guarda o nome do funcionário; saída e transferência, a FK
+            if tipo == 'ENTRADA':
+                queryset = queryset.filter(funcionario=nome_funcionario) if nome_funcionario else queryset.none()
+            else:
+                queryset = queryset.filter(responsavel_id=funcionario_id)
+        if cursor is not None:
+            queryset = _apos_cursor(queryset, campo_data, tipo, cursor)
+
+        queryset = queryset.values_list(
+            'tipo', 'mov_id', 'data', 'produto_ref', 'produto_nome', 'origem', 'destino',
+            'quantidade_mov', 'usuario_nome', 'funcionario_nome', 'detalhe',
+        ).order_by()
+        if connection.features.supports_slicing_ordering_in_compound:
+            # Cada ramo lê no máximo uma página pelo índice (data, id) antes do UNION ALL
+            queryset = queryset.order_by(f'-{campo_data}', '-id')[:tamanho + 1]
+        consultas.append(queryset)
+
+    uniao = consultas[0].union(*consultas[1:], all=True).order_by('-data', '-tipo', '-mov_id')
+    itens = [dict(zip(COLUNAS, linha)) for linha in uniao[:tamanho + 1]]
+
+    proximo = codificar_cursor(itens[tamanho - 1]) if len(itens) > tamanho else None
+    return itens[:tamanho], proximo
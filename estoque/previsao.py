@@ -0,0 +1,126 @@
+from .models import Estoque, PrevisaoDemanda, SaidaEstoque
+from .historico import _inicio_do_dia
+from django.db.models import DateField, Sum
+from django.db.models.functions import TruncWeek
+from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
+import numpy as np
+
+# Previsão de demanda de todos os pares (produto, local) de uma vez. As saídas vêm
+# somadas por semana numa única consulta, lida em blocos de pares para que a memória
+# fique limitada a BLOCO_PARES x semanas, e as contas são feitas por matriz no NumPy.
+
+SEMANAS_PADRAO = 156  # Três anos
+ALFA_PADRAO = 0.3
+BLOCO_PARES = 2000
+TAMANHO_LOTE = 500
+
+def _chaves(produtos, locais):
+    return (np.asarray(produtos, dtype=np.int64) << 32) | np.asarray(locais, dtype=np.int64)
+
+def _saldos():
+    # Saldos atuais ordenados por chave, para busca com searchsorted
+    linhas = np.array(list(Estoque.objects.values_list('product_id', 'local_id', 'quantidade')), dtype=np.int64).reshape(-1, 3)
+    chaves = _chaves(linhas[:, 0], linhas[:, 1])
+    ordem = np.argsort(chaves)
+    return chaves[ordem], linhas[ordem, 2]
+
+def semanas_fechadas(semanas):
+    # (início, fim) das últimas `semanas` semanas completas (segunda a domingo, no fuso
+    # local); o fim é a segunda-feira da semana corrente, que fica de fora
+    hoje = timezone.localdate()
+    fim = hoje - timedelta(days=hoje.weekday())
+    return fim - timedelta(weeks=semanas), fim
+
+def _blocos(linhas, tamanho):
+    # Agrupa as linhas (já ordenadas por produto e local) em blocos de até `tamanho` pares
+    bloco, pares, ultimo = [], 0, None
+    for linha in linhas:
+        if linha[:2] != ultimo:
+            if pares == tamanho:
+                yield bloco
+                bloco, pares = [], 0
+            ultimo = linha[:2]
+            pares += 1
+        bloco.append(linha)
+    if bloco:
+        yield bloco
+
+def calcular(serie, saldo, alfa):
+    # serie: matriz pares x semanas (a última coluna é a semana fechada mais recente)
+    semanas = serie.shape[1]
+    media_4 = serie[:, -4:].mean(axis=1)
+    media_12 = serie[:, -12:].mean(axis=1)
+
+    # Suavização exponencial simples partindo da primeira semana, como um produto
+    # matriz-vetor: nível = alfa * sum((1 - alfa)^k * x[t-k]) + (1 - alfa)^(T-1) * x[0]
+    pesos = alfa * (1 - alfa) ** np.arange(semanas - 1, -1, -1, dtype=np.float64)
+    pesos[0] = (1 - alfa) ** (semanas - 1)
+    previsao = serie @ pesos
+
+    diaria = previsao / 7
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cobertura = np.where(diaria > 0, np.maximum(saldo, 0) / diaria, np.nan)
+    return media_4, media_12, previsao, diaria, cobertura
+
+def _processar(bloco, inicio, semanas, saldos, alfa, calculado_em):
+    produtos = np.fromiter((linha[0] for linha in bloco), dtype=np.int64, count=len(bloco))
+    locais = np.fromiter((linha[1] for linha in bloco), dtype=np.int64, count=len(bloco))
+    semana = (np.array([linha[2] for linha in bloco], dtype='datetime64[D]') - np.datetime64(inicio, 'D')).astype(np.int64) // 7
+    totais = np.fromiter((linha[3] for linha in bloco), dtype=np.float64, count=len(bloco))
+
+    # Índice do par em cada linha: as linhas chegam ordenadas, então basta marcar as trocas
+    troca = np.ones(len(bloco), dtype=bool)
+    troca[1:] = (produtos[1:] != produtos[:-1]) | (locais[1:] != locais[:-1])
+    par = np.cumsum(troca) - 1
+    produtos, locais = produtos[troca], locais[troca]
+
+    serie = np.zeros((len(produtos), semanas), dtype=np.float64)
+    serie[par, semana] = totais
+
+    chaves_saldo, quantidades = saldos
+    chaves = _chaves(produtos, locais)
+    posicao = np.clip(np.searchsorted(chaves_saldo, chaves), 0, max(len(chaves_saldo) - 1, 0))
+    if len(chaves_saldo):
+        saldo = np.where(chaves_saldo[posicao] == chaves, quantidades[posicao], 0)
+    else:
+        saldo = np.zeros(len(chaves), dtype=np.int64)
+
+    media_4, media_12, previsao, diaria, cobertura = calcular(serie, saldo, alfa)
+    PrevisaoDemanda.objects.bulk_create([
+        PrevisaoDemanda(
+            product_id=int(produtos[i]),
+            local_id=int(locais[i]),
+            media_4_semanas=float(media_4[i]),
+            media_12_semanas=float(media_12[i]),
+            previsao_semanal=float(previsao[i]),
+            demanda_diaria=float(diaria[i]),
+            saldo=int(saldo[i]),
+            dias_cobertura=None if np.isnan(cobertura[i]) else float(cobertura[i]),
+            calculado_em=calculado_em,
+        )
+        for i in range(len(produtos))
+    ], batch_size=TAMANHO_LOTE)
+    return len(produtos)
+
+@transaction.atomic
+def prever(semanas=SEMANAS_PADRAO, alfa=ALFA_PADRAO):
+    inicio, fim = semanas_fechadas(semanas)
+
+    linhas = (
+        SaidaEstoque.objects
+        .filter(data_saida__gte=_inicio_do_dia(inicio), data_saida__lt=_inicio_do_dia(fim))
+        .annotate(semana=TruncWeek('data_saida', output_field=DateField()))
+        .values_list('product_id', 'local_id', 'semana')
+        .annotate(total=Sum('quantidade'))
+        .order_by('product_id', 'local_id', 'semana')
+    )
+
+    PrevisaoDemanda.objects.all().delete()
+    saldos = _saldos()
+    calculado_em = timezone.now()
+    return sum(
+        _processar(bloco, inicio, semanas, saldos, alfa, calculado_em)
+        for bloco in _blocos(linhas.iterator(chunk_size=TAMANHO_LOTE * 10), BLOCO_PARES)
+    )
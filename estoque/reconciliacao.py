@@ -0,0 +1,89 @@
+from .models import Estoque
+from .historico import deltas_movimentos
+from .services import TAMANHO_LOTE, criar_linhas, travar_linhas
+from .versao import chave_local, incrementar_versao
+from .alertas import reavaliar_pares
+from suprimentos.referencias import invalidar
+from django.db.models import Case, IntegerField, Value, When
+from django.db import transaction
+
+def saldos_esperados():
+    # Saldo implícito nos registros de movimentação. A soma é agrupada no banco, então a
+    # memória usada cresce com o número de pares (produto, local), não com o de movimentos.
+    return deltas_movimentos()
+
+def divergencias():
+    # Compara Estoque com o saldo esperado. Retorna uma lista de
+    # {'estoque_id', 'product_id', 'local_id', 'registrado', 'esperado', 'diferenca'}
+    esperados = saldos_esperados()
+
+    resultado = []
+    linhas = Estoque.objects.order_by('local_id', 'product_id').values_list('id', 'product_id', 'local_id', 'quantidade')
+    for estoque_id, produto_id, local_id, quantidade in linhas.iterator(chunk_size=TAMANHO_LOTE):
+        esperado = esperados.pop((produto_id, local_id), 0)
+        if quantidade != esperado:
+            resultado.append({
+                'estoque_id': estoque_id,
+                'product_id': produto_id,
+                'local_id': local_id,
+                'registrado': quantidade,
+                'esperado': esperado,
+                'diferenca': esperado - quantidade,
+            })
+
+    # Movimentações de pares que nem têm linha em Estoque
+    for (produto_id, local_id), esperado in sorted(esperados.items(), key=lambda item: (item[0][1], item[0][0])):
+        resultado.append({
+            'estoque_id': None,
+            'product_id': produto_id,
+            'local_id': local_id,
+            'registrado': 0,
+            'esperado': esperado,
+            'diferenca': esperado,
+        })
+
+    return resultado
+
+@transaction.atomic
+def corrigir(itens):
+    # Trava os pares divergentes na mesma ordem (local, produto) das movimentações e só
+    # então recalcula o saldo esperado: uma movimentação confirmada entre divergencias() e
+    # a correção já entra nos dois lados da conta, e as novas esperam o commit. Sob a trava,
+    # o saldo esperado é gravado como valor absoluto. Esperados negativos não são corrigidos.
+    pares = {(item['product_id'], item['local_id']) for item in itens}
+    if not pares:
+        return 0
+
+    sem_linha = [(item['product_id'], item['local_id']) for item in itens if item['estoque_id'] is None and item['esperado'] > 0]
+    criar_linhas(sem_linha)
+    linhas = travar_linhas(pares)
+    esperados = deltas_movimentos(produtos={produto_id for produto_id, _ in pares})
+
+    ajustes = []
+    for chave in sorted(linhas, key=lambda chave: (chave[1], chave[0])):
+        estoque, esperado = linhas[chave], esperados.get(chave, 0)
+        if esperado >= 0 and esperado != estoque.quantidade:
+            ajustes.append((estoque, esperado))
+
+    for inicio in range(0, len(ajustes), TAMANHO_LOTE):
+        lote = ajustes[inicio:inicio + TAMANHO_LOTE]
+        Estoque.objects.filter(pk__in=[estoque.pk for estoque, _ in lote]).update(
+            quantidade=Case(
+                *[When(pk=estoque.pk, then=Value(esperado)) for estoque, esperado in lote],
+                output_field=IntegerField(),
+            )
+        )
+
+    if sem_linha:
+        # bulk_create não dispara post_save; linhas novas podem trazer locais/unidades às listas de filtro
+        invalidar('locais_com_estoque', 'locais_com_saldo', 'unidades_em_estoque')
+    elif any((estoque.quantidade > 0) != (esperado > 0) for estoque, esperado in ajustes):
+        # Ajustes que zeram um par ou tiram um par do zero mudam os locais com saldo
+        invalidar('locais_com_saldo')
+
+    if ajustes:
+        reavaliar_pares((estoque.product_id, estoque.local_id) for estoque, _ in ajustes)
+        for local_id in sorted({estoque.local_id for estoque, _ in ajustes}):
+            incrementar_versao(chave_local(local_id))
+        incrementar_versao()
+    return len(ajustes)
@@ -0,0 +1,49 @@
+from .models import Estoque
+from suprimentos.models import Product, Armazem
+from suprimentos.referencias import em_cache, invalidar, referencia
+from django.db.models import Exists, OuterRef
+
+# Listas de filtro derivadas do estoque, no mesmo cache das referências de suprimentos
+
+@referencia('locais_com_estoque', Estoque, Armazem)
+def locais_com_estoque():
+    # Armazéns com ao menos uma linha de estoque (EXISTS usa o índice de (produto, local))
+    return list(Armazem.objects.filter(
+        Exists(Estoque.objects.filter(local=OuterRef('pk')))
+    ).order_by('name').values('id', 'name'))
+
+@referencia('locais_com_saldo', Estoque, Armazem)
+def locais_com_saldo():
+    # Origem das saídas e transferências: armazéns com algum produto em quantidade > 0
+    return list(Armazem.objects.filter(
+        Exists(Estoque.objects.filter(local=OuterRef('pk'), quantidade__gt=0))
+    ).order_by('name').values('id', 'name'))
+
+@referencia('unidades_em_estoque', Estoque, Product)
+def unidades_em_estoque():
+    return list(
+        Estoque.objects.order_by('product__unidade_medida')
+        .values_list('product__unidade_medida', flat=True).distinct()
+    )
+
+def atualizar_referencias(variacoes, saldos, produtos):
+    # O bulk_create e o UPDATE dos serviços não disparam post_save: invalida só quando um
+    # par que recebeu produto traz um local ou unidade que a lista em cache ainda não tem,
+    # ou quando um par zerado pode tirar o local da lista de locais com saldo.
+    # saldos: {(produto_id, local_id): quantidade depois da movimentação}
+    recebidos = [(produtos[produto_id], local_id) for (produto_id, local_id), delta in variacoes.items() if delta > 0]
+    zerados = {local_id for (_, local_id), saldo in saldos.items() if saldo == 0}
+
+    locais = em_cache('locais_com_estoque')
+    if locais is not None and {local_id for _, local_id in recebidos} - {local['id'] for local in locais}:
+        invalidar('locais_com_estoque')
+
+    com_saldo = em_cache('locais_com_saldo')
+    if com_saldo is not None:
+        ids = {local['id'] for local in com_saldo}
+        if {local_id for _, local_id in recebidos} - ids or zerados & ids:
+            invalidar('locais_com_saldo')
+
+    unidades = em_cache('unidades_em_estoque')
+    if unidades is not None and {produto.unidade_medida for produto, _ in recebidos} - set(unidades):
+        invalidar('unidades_em_estoque')
@@ -0,0 +1,89 @@
+from reportlab.lib.utils import ImageReader
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from django.conf import settings
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+import os
+
+LOGO = os.path.join(settings.MEDIA_ROOT, 'icons', 'LOGO_ACT_LARANJA.png')
+EMPRESA = "ACT ENGENHARIA"
+RODAPE = "Empresa XYZ - Endereço: Rua Exemplo, 123 - Tel: (11) 9999-9999 - Email: contato@empresa.com"
+
+# Layout (em pontos)
+MARGEM_ESQUERDA = 30
+TOPO_TABELA = A4[1] - 170
+ESPACAMENTO_LINHA = 15
+LIMITE_INFERIOR = 60
+
+@lru_cache(maxsize=None)
+def _logo():
+    # Decodifica o papel timbrado uma única vez por processo
+    try:
+        return ImageReader(LOGO)
+    except OSError:
+        return None
+
+class RelatorioPDF:
+    # colunas: [(titulo, x, max_caracteres)]; as linhas são tuplas na mesma ordem
+    def __init__(self, titulo, colunas):
+        self.titulo = titulo
+        self.colunas = colunas
+        self.linhas_por_pagina = int((TOPO_TABELA - ESPACAMENTO_LINHA - LIMITE_INFERIOR) // ESPACAMENTO_LINHA) + 1
+
+    def _desenhar_cabecalho(self, p, data_geracao):
+        # Desenhado uma vez como form XObject e apenas referenciado em cada página
+        largura, altura = A4
+        p.beginForm('cabecalho')
+        logo = _logo()
+        if logo is not None:
+            p.drawImage(logo, MARGEM_ESQUERDA, altura - 100, width=100, height=50, mask='auto')
+
+        p.setFont("Helvetica-Bold", 14)
+        p.drawString(MARGEM_ESQUERDA + 120, altura - 80, f"{EMPRESA} - {self.titulo}")
+        p.setFont("Helvetica", 10)
+        p.drawString(MARGEM_ESQUERDA + 120, altura - 95, f"Data de geração: {data_geracao}")
+
+        p.setFont("Helvetica-Bold", 9)
+        for titulo, x, _ in self.colunas:
+            p.drawString(x, TOPO_TABELA, titulo)
+
+        p.setFont("Helvetica", 8)
+        p.drawString(MARGEM_ESQUERDA, 30, RODAPE)
+        p.endForm()
+
+    def gerar(self, linhas, destino):
+        # Monta o PDF em `destino` página a página, consumindo `linhas` em lotes do tamanho da página
+        data_geracao = datetime.now().strftime("%d/%m/%Y")
+        p = canvas.Canvas(destino, pagesize=A4, pageCompression=1)
+        self._desenhar_cabecalho(p, data_geracao)
+
+        linhas = iter(linhas)
+        pagina = 1
+        while True:
+            lote = list(islice(linhas, self.linhas_por_pagina))
+            if not lote and pagina > 1:
+                break
+
+            p.doForm('cabecalho')
+            texto = p.beginText()
+            texto.setFont("Helvetica", 9)
+            texto.setLeading(ESPACAMENTO_LINHA)
+            # Um único objeto de texto por página, escrito coluna a coluna
+            for indice, (_, x, max_caracteres) in enumerate(self.colunas):
+                texto.setTextOrigin(x, TOPO_TABELA - ESPACAMENTO_LINHA)
+                for linha in lote:
+                    valor = linha[indice]
+                    texto.textLine("" if valor is None else str(valor)[:max_caracteres])
+            p.drawText(texto)
+
+            p.setFont("Helvetica", 8)
+            p.drawRightString(A4[0] - MARGEM_ESQUERDA, 30, f"Página {pagina}")
+            p.showPage()
+
+            if len(lote) < self.linhas_por_pagina:
+                break
+            pagina += 1
+
+        p.save()
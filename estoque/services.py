@@ -0,0 +1,200 @@
+from .models import Estoque, EntradaEstoque, SaidaEstoque, TransferenciaEstoque
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from suprimentos.models import Product, Armazem
+from .versao import chave_local, incrementar_versao
+from .referencias import atualizar_referencias
+from .consumo import acumular as acumular_consumo
+from .alertas import reavaliar as reavaliar_alertas
+from django.db import transaction
+
+# Quantidade máxima de linhas por UPDATE/INSERT em lote
+TAMANHO_LOTE = 500
+
+class MovimentacaoError(Exception):
+    pass
+
+def normalizar_itens(produtos, quantidades):
+    # Converte as listas postadas pelo formulário em [(produto_id, quantidade)]
+    itens = []
+    for produto_id, quantidade in zip(produtos, quantidades):
+        try:
+            produto_id = int(produto_id)
+            quantidade = int(quantidade)
+        except (TypeError, ValueError):
+            raise MovimentacaoError("Produto ou quantidade inválidos.")
+
+        if quantidade <= 0:
+            raise MovimentacaoError("A quantidade deve ser maior que zero.")
+        itens.append((produto_id, quantidade))
+
+    if not itens:
+        raise MovimentacaoError("É necessário adicionar pelo menos um produto e quantidade.")
+    return itens
+
+def _carregar_produtos(itens):
+    # Valida todos os produtos do documento com uma única consulta
+    ids = {produto_id for produto_id, _ in itens}
+    produtos = Product.objects.in_bulk(ids)
+
+    faltando = sorted(ids - produtos.keys())
+    if faltando:
+        raise MovimentacaoError(f"Produto(s) não encontrado(s): {', '.join(map(str, faltando))}.")
+    return produtos
+
+def _em_ordem_de_trava(pares):
+    # (produto_id, local_id) na ordem das travas do estoque: local, depois produto
+    return sorted(set(pares), key=lambda par: (par[1], par[0]))
+
+def criar_linhas(pares):
+    # Garante a linha de saldo (quantidade 0) dos pares; a restrição única (produto, local)
+    # faz o INSERT concorrente ser ignorado em vez de duplicar. O INSERT também trava a
+    # entrada do índice único até o commit, então vai na mesma ordem das travas.
+    Estoque.objects.bulk_create([
+        Estoque(product_id=produto_id, local_id=local_id, quantidade=0)
+        for produto_id, local_id in _em_ordem_de_trava(pares)
+    ], batch_size=TAMANHO_LOTE, ignore_conflicts=True)
+
+def travar_linhas(pares):
+    # SELECT ... FOR UPDATE só dos pares informados (não de todas as combinações de
+    # locais x produtos), em ordem (local, produto). Retorna {(produto_id, local_id): Estoque}.
+    pares = _em_ordem_de_trava(pares)
+    linhas = {}
+    for inicio in range(0, len(pares), TAMANHO_LOTE):
+        por_local = {}
+        for produto_id, local_id in pares[inicio:inicio + TAMANHO_LOTE]:
+            por_local.setdefault(local_id, []).append(produto_id)
+        filtro = Q()
+        for local_id, produto_ids in por_local.items():
+            filtro |= Q(local_id=local_id, product_id__in=produto_ids)
+        linhas.update(
+            ((estoque.product_id, estoque.local_id), estoque)
+            for estoque in Estoque.objects.select_for_update().filter(filtro).order_by('local_id', 'product_id')
+        )
+    return linhas
+
+def _aplicar_variacoes(variacoes, produtos):
+    # variacoes: {(produto_id, local_id): delta}. Trava as linhas de estoque sempre na
+    # mesma ordem (local, produto) para que documentos concorrentes não entrem em deadlock.
+    variacoes = {chave: delta for chave, delta in variacoes.items() if delta}
+    if not variacoes:
+        return
+
+    locais = dict(Armazem.objects.filter(pk__in={local_id for _, local_id in variacoes}).values_list('id', 'name'))
+    faltando = sorted({local_id for _, local_id in variacoes} - locais.keys())
+    if faltando:
+        raise MovimentacaoError(f"Local(is) não encontrado(s): {', '.join(map(str, faltando))}.")
+
+    criar_linhas([chave for chave, delta in variacoes.items() if delta > 0])
+    linhas = travar_linhas(variacoes)
+
+    for (produto_id, local_id), delta in sorted(variacoes.items(), key=lambda item: (item[0][1], item[0][0])):
+        estoque = linhas.get((produto_id, local_id))
+        if delta >= 0:
+            continue
+
+        nome = produtos[produto_id].product_name
+        if estoque is None:
+            raise MovimentacaoError(f"O produto {nome} não existe no estoque do local {locais[local_id]}.")
+        if estoque.quantidade + delta < 0:
+            raise MovimentacaoError(f"Estoque insuficiente para {nome}. Disponível: {estoque.quantidade}")
+
+    # Um único UPDATE por lote: quantidade = quantidade + CASE id WHEN ... END
+    existentes = [(linhas[chave].pk, delta) for chave, delta in variacoes.items()]
+    for inicio in range(0, len(existentes), TAMANHO_LOTE):
+        lote = existentes[inicio:inicio + TAMANHO_LOTE]
+        Estoque.objects.filter(pk__in=[pk for pk, _ in lote]).update(
+            quantidade=F('quantidade') + Case(
+                *[When(pk=pk, then=Value(delta)) for pk, delta in lote],
+                output_field=IntegerField(),
+            )
+        )
+
+    # Saldos novos já conhecidos (linha travada + delta): só os pares tocados são reavaliados
+    saldos = {chave: linhas[chave].quantidade + delta for chave, delta in variacoes.items()}
+    atualizar_referencias(variacoes, saldos, produtos)
+    reavaliar_alertas(saldos)
+
+    # Em ordem de local, como as travas do estoque; a versão global só sobe após o commit
+    for local_id in sorted(locais):
+        incrementar_versao(chave_local(local_id))
+    incrementar_versao()
+
+def _somar(itens, local_id, sinal=1):
+    variacoes = {}
+    for produto_id, quantidade in itens:
+        chave = (produto_id, local_id)
+        variacoes[chave] = variacoes.get(chave, 0) + sinal * quantidade
+    return variacoes
+
+def registrar_entrada(usuario, local_id, itens, tipo_entrada, funcionario=None):
+    return registrar_entradas(usuario, [
+        (produto_id, local_id, quantidade, tipo_entrada, funcionario)
+        for produto_id, quantidade in itens
+    ])
+
+@transaction.atomic
+def registrar_entradas(usuario, linhas):
+    # linhas: [(produto_id, local_id, quantidade, tipo_entrada, funcionario)], podendo
+    # misturar vários locais no mesmo documento (ex.: importação de nota fiscal)
+    produtos = _carregar_produtos([(produto_id, quantidade) for produto_id, _, quantidade, _, _ in linhas])
+
+    variacoes = {}
+    for produto_id, local_id, quantidade, _, _ in linhas:
+        chave = (produto_id, local_id)
+        variacoes[chave] = variacoes.get(chave, 0) + quantidade
+    _aplicar_variacoes(variacoes, produtos)
+
+    return EntradaEstoque.objects.bulk_create([
+        EntradaEstoque(
+            product_id=produto_id,
+            local_id=local_id,
+            quantidade=quantidade,
+            usuario_registrante=usuario,
+            tipo_entrada=tipo_entrada,
+            funcionario=funcionario if tipo_entrada == 'DEVOLUCAO' else None
+        )
+        for produto_id, local_id, quantidade, tipo_entrada, funcionario in linhas
+    ], batch_size=TAMANHO_LOTE)
+
+@transaction.atomic
+def registrar_saida(usuario, local_id, itens, responsavel=None, centro_custo=None, observacao=None):
+    produtos = _carregar_produtos(itens)
+    _aplicar_variacoes(_somar(itens, local_id, sinal=-1), produtos)
+
+    saidas = SaidaEstoque.objects.bulk_create([
+        SaidaEstoque(
+            product_id=produto_id,
+            local_id=local_id,
+            quantidade=quantidade,
+            responsavel=responsavel,
+            centro_custo=centro_custo,
+            observacao=observacao,
+            usuario_registrante=usuario
+        )
+        for produto_id, quantidade in itens
+    ], batch_size=TAMANHO_LOTE)
+    acumular_consumo(saidas)
+    return saidas
+
+@transaction.atomic
+def registrar_transferencia(usuario, local_saida_id, local_entrada_id, itens, responsavel_id=None, observacao=None):
+    if local_saida_id == local_entrada_id:
+        raise MovimentacaoError("O local de entrada deve ser diferente do local de saída.")
+
+    produtos = _carregar_produtos(itens)
+    variacoes = _somar(itens, local_saida_id, sinal=-1)
+    variacoes.update(_somar(itens, local_entrada_id))
+    _aplicar_variacoes(variacoes, produtos)
+
+    return TransferenciaEstoque.objects.bulk_create([
+        TransferenciaEstoque(
+            produto_id=produto_id,
+            local_saida_id=local_saida_id,
+            local_entrada_id=local_entrada_id,
+            quantidade=quantidade,
+            usuario=usuario,
+            responsavel_id=responsavel_id or None,
+            observacao=observacao
+        )
+        for produto_id, quantidade in itens
+    ], batch_size=TAMANHO_LOTE)
@@ -0,0 +1,36 @@
+from .models import Estoque, AlertaEstoque
+from .alertas import reavaliar
+from .versao import VERSAO_PRODUTOS, chave_local, incrementar_versao
+from suprimentos.referencias import invalidar_modelo
+from . import referencias  # registra as listas derivadas do estoque
+from suprimentos.models import Product, Armazem
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+# Alterações feitas fora dos serviços de movimentação (admin, cadastro de produtos e
+# armazéns) também mudam o conteúdo das exportações
+@receiver([post_save, post_delete], sender=Estoque)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Armazem)
+def invalidar_exportacoes(sender, **kwargs):
+    incrementar_versao()
+
+@receiver([post_save, post_delete], sender=Estoque)
+def invalidar_referencias(sender, **kwargs):
+    invalidar_modelo(sender)
+
+@receiver([post_save, post_delete], sender=Estoque)
+def invalidar_local(sender, instance, **kwargs):
+    incrementar_versao(chave_local(instance.local_id))
+
+@receiver(post_save, sender=Estoque)
+def reavaliar_alerta(sender, instance, **kwargs):
+    reavaliar({(instance.product_id, instance.local_id): instance.quantidade})
+
+@receiver(post_delete, sender=Estoque)
+def remover_alerta(sender, instance, **kwargs):
+    AlertaEstoque.objects.filter(product_id=instance.product_id, local_id=instance.local_id).delete()
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidar_produtos(sender, **kwargs):
+    incrementar_versao(VERSAO_PRODUTOS)
@@ -1,3 +1,314 @@
-from django.test import TestCase
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.forms import User
+from suprimentos.models import Armazem, Product
+from estoque.models import EntradaEstoque, Estoque, ExportacaoEstoque, ParametroEstoque
+from estoque import importacao
+from estoque.exportacao import MAXIMO_TENTATIVAS, TEMPO_LIMITE_PROCESSAMENTO, processar, proxima_pendente, remover_expiradas
+from estoque.reconciliacao import corrigir, divergencias
+from estoque.versao import chave_local, versao_atual
+from estoque.services import registrar_entrada, registrar_saida, registrar_transferencia
+from suprimentos import referencias
+from estoque.views import ITENS_POR_PAGINA
+from datetime import timedelta
+from unittest import mock
+import tempfile
+
+
+class PaginacaoBuscaEstoqueTests(TestCase):
+    # Nomes iguais empatam na relevância da busca (Postgres); o cursor "relevância|id"
+    # precisa atravessar as páginas sem pular nem repetir itens empatados.
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username='estoquista', password='x')
+        local = Armazem.objects.create(name='Central', usuario_registrante=cls.usuario)
+        produtos = Product.objects.bulk_create([
+            Product(product_name='Luva Nitrílica', unidade_medida='par')
+            for _ in range(ITENS_POR_PAGINA * 2 + 7)
+        ])
+        Estoque.objects.bulk_create([Estoque(product=produto, local=local, quantidade=1) for produto in produtos])
+        cls.esperados = sorted(Estoque.objects.values_list('product_id', flat=True))
+
+    def test_empates_atravessam_paginas(self):
+        self.client.force_login(self.usuario)
+        vistos, apos, paginas = [], '', 0
+        while True:
+            resposta = self.client.get(
+                reverse('lista_estoque'), {'formato': 'json', 'search': 'luva', 'apos': apos},
+            )
+            dados = resposta.json()
+            vistos += [item['product_id'] for item in dados['itens']]
+            paginas += 1
+            if not dados['proximo']:
+                break
+            apos = dados['proximo']
+
+        self.assertEqual(paginas, 3)
+        self.assertEqual(len(vistos), len(set(vistos)))
+        self.assertEqual(sorted(vistos), self.esperados)
+
+
+class LocaisComSaldoTests(TestCase):
+    # Saídas e transferências só oferecem armazéns com quantidade > 0; a lista em cache
+    # precisa acompanhar os pares que zeram ou voltam a ter saldo.
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username='almoxarife', password='x')
+        cls.central = Armazem.objects.create(name='Central', usuario_registrante=cls.usuario)
+        cls.obra = Armazem.objects.create(name='Obra', usuario_registrante=cls.usuario)
+        cls.produto = Product.objects.create(product_name='Cabo', unidade_medida='m')
+
+    def setUp(self):
+        cache.clear()
+
+    def locais(self):
+        return [local['id'] for local in referencias.obter('locais_com_saldo')]
+
+    def test_saida_que_zera_tira_o_local(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_entrada(self.usuario, self.central.id, [(self.produto.id, 5)], 'compra')
+        self.assertEqual(self.locais(), [self.central.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_saida(self.usuario, self.central.id, [(self.produto.id, 5)])
+        self.assertEqual(self.locais(), [])
+        # A linha zerada continua no filtro da lista de estoque
+        self.assertEqual([local['id'] for local in referencias.obter('locais_com_estoque')], [self.central.id])
+
+    def test_transferencia_move_o_local(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_entrada(self.usuario, self.central.id, [(self.produto.id, 3)], 'compra')
+        self.assertEqual(self.locais(), [self.central.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_transferencia(self.usuario, self.central.id, self.obra.id, [(self.produto.id, 3)])
+        self.assertEqual(self.locais(), [self.obra.id])
+
+
+class FiltrosMovimentacoesTests(TestCase):
+    # Produtos e funcionários vêm do typeahead; a lista de usuários só traz quem movimentou
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.almoxarife = User.objects.create_user(username='almoxarife', password='x')
+        cls.visitante = User.objects.create_user(username='visitante', password='x')
+        cls.local = Armazem.objects.create(name='Central', usuario_registrante=cls.almoxarife)
+        cls.produto = Product.objects.create(product_name='Cabo Flexível', unidade_medida='m')
+        registrar_entrada(cls.almoxarife, cls.local.id, [(cls.produto.id, 2)], 'compra')
+
+    def test_filtros(self):
+        self.client.force_login(self.visitante)
+        resposta = self.client.get(reverse('movimentacoes_estoque'), {'produto': self.produto.id})
+        self.assertEqual(list(resposta.context['usuarios']), [self.almoxarife])
+        self.assertEqual(resposta.context['produto'], self.produto)
+        self.assertContains(resposta, 'value="Cabo Flexível"')
+        self.assertEqual(len(resposta.context['movimentacoes']), 1)
+
+
+class VersaoEstoqueTests(TestCase):
+    # A versão global não pode ficar travada durante a movimentação: sobe só no commit
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username='almoxarife', password='x')
+        cls.local = Armazem.objects.create(name='Central', usuario_registrante=cls.usuario)
+        cls.produto = Product.objects.create(product_name='Cabo', unidade_medida='m')
+
+    def test_global_sobe_apos_o_commit(self):
+        antes, local_antes = versao_atual(), versao_atual(chave_local(self.local.id))
+        with self.captureOnCommitCallbacks() as callbacks:
+            registrar_entrada(self.usuario, self.local.id, [(self.produto.id, 2)], 'compra')
+            self.assertEqual(versao_atual(), antes)
+        self.assertEqual(versao_atual(chave_local(self.local.id)), local_antes + 1)
+
+        for callback in callbacks:
+            callback()
+        self.assertGreater(versao_atual(), antes)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ExportacaoRepetidaTests(TestCase):
+    # Cliques repetidos antes do arquivo ficar pronto não podem gerar o mesmo arquivo de novo
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username='almoxarife', password='x')
+        cls.outro = User.objects.create_user(username='comprador', password='x')
+        local = Armazem.objects.create(name='Central', usuario_registrante=cls.usuario)
+        produto = Product.objects.create(product_name='Cabo', unidade_medida='m')
+        Estoque.objects.create(product=produto, local=local, quantidade=4)
+
+    def solicitar(self, usuario):
+        self.client.force_login(usuario)
+        return self.client.get(reverse('exportar_estoque_excel'), {'search': 'cabo'})
+
+    def test_cliques_repetidos_reaproveitam_o_job(self):
+        self.solicitar(self.usuario)
+        self.solicitar(self.usuario)
+        exportacao = ExportacaoEstoque.objects.get()
+        self.assertTrue(exportacao.chave)
+        self.assertIsNotNone(exportacao.versao)
+
+        processar(exportacao)
+        # Com o arquivo pronto, a mesma solicitação baixa direto
+        self.assertEqual(self.solicitar(self.usuario).status_code, 200)
+        self.assertEqual(ExportacaoEstoque.objects.count(), 1)
+
+    def test_job_na_fila_usa_o_arquivo_ja_gerado(self):
+        self.solicitar(self.usuario)
+        self.solicitar(self.outro)
+        primeira, segunda = ExportacaoEstoque.objects.order_by('id')
+        processar(primeira)
+        processar(segunda)
+        segunda.refresh_from_db()
+        self.assertEqual(segunda.status, 'CONCLUIDA')
+        self.assertEqual(segunda.arquivo.name, primeira.arquivo.name)
+
+        # O arquivo compartilhado só some quando nenhum job vigente aponta para ele
+        ExportacaoEstoque.objects.filter(pk=primeira.pk).update(expira_em=timezone.now() - timedelta(hours=1))
+        ExportacaoEstoque.objects.filter(pk=segunda.pk).update(expira_em=timezone.now() + timedelta(hours=1))
+        remover_expiradas()
+        self.assertTrue(segunda.arquivo.storage.exists(segunda.arquivo.name))
+
+
+class ReconciliacaoTests(TestCase):
+    # A correção recalcula o saldo esperado sob a trava das linhas
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username='almoxarife', password='x')
+        cls.local = Armazem.objects.create(name='Central', usuario_registrante=cls.usuario)
+        cls.produto = Product.objects.create(product_name='Cabo', unidade_medida='m')
+        cls.outro = Product.objects.create(product_name='Luva', unidade_medida='par')
+
+    def test_movimentacao_entre_o_calculo_e_a_correcao(self):
+        registrar_entrada(self.usuario, self.local.id, [(self.produto.id, 5), (self.outro.id, 3)], 'compra')
+        Estoque.objects.filter(product=self.produto).update(quantidade=40)
+        Estoque.objects.filter(product=self.outro).delete()
+
+        itens = divergencias()
+        self.assertEqual(len(itens), 2)
+        registrar_saida(self.usuario, self.local.id, [(self.produto.id, 2)])
+
+        self.assertEqual(corrigir(itens), 2)
+        saldos = dict(Estoque.objects.values_list('product_id', 'quantidade'))
+        self.assertEqual(saldos, {self.produto.id: 3, self.outro.id: 3})
+        self.assertEqual(divergencias(), [])
+
+
+class ExportacaoAbandonadaTests(TestCase):
+    # Worker morto entre a reserva e a conclusão não pode deixar o job em "Processando"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username='almoxarife', password='x')
+
+    def abandonar(self, tentativas):
+        return ExportacaoEstoque.objects.create(
+            usuario=self.usuario, formato='EXCEL', status='PROCESSANDO', tentativas=tentativas,
+            iniciado_em=timezone.now() - TEMPO_LIMITE_PROCESSAMENTO - timedelta(minutes=1),
+        )
+
+    def test_job_abandonado_volta_para_a_fila(self):
+        exportacao = self.abandonar(1)
+        self.assertEqual(proxima_pendente().pk, exportacao.pk)
+        exportacao.refresh_from_db()
+        self.assertEqual(exportacao.tentativas, 2)
+        self.assertGreater(exportacao.iniciado_em, timezone.now() - timedelta(minutes=1))
+
+    def test_tentativas_esgotadas_viram_erro(self):
+        exportacao = self.abandonar(MAXIMO_TENTATIVAS)
+        self.assertIsNone(proxima_pendente())
+        exportacao.refresh_from_db()
+        self.assertEqual(exportacao.status, 'ERRO')
+        self.assertIsNotNone(exportacao.expira_em)
+
+    def test_job_em_andamento_nao_e_retomado(self):
+        ExportacaoEstoque.objects.create(usuario=self.usuario, formato='EXCEL', status='PROCESSANDO', tentativas=1, iniciado_em=timezone.now())
+        self.assertIsNone(proxima_pendente())
+
+
+class KardexJanelaPadraoTests(TestCase):
+    # Sem período, o kardex mostra os últimos JANELA_PADRAO_DIAS com o saldo de abertura
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username='almoxarife', password='x')
+        cls.local = Armazem.objects.create(name='Central', usuario_registrante=cls.usuario)
+        cls.produto = Product.objects.create(product_name='Cabo', unidade_medida='m')
+        registrar_entrada(cls.usuario, cls.local.id, [(cls.produto.id, 10)], 'compra')
+        EntradaEstoque.objects.update(data_entrada=timezone.now() - timedelta(days=200))
+        registrar_saida(cls.usuario, cls.local.id, [(cls.produto.id, 4)])
+
+    def test_sem_desde(self):
+        self.client.force_login(self.usuario)
+        dados = self.client.get(reverse('kardex_produto', args=[self.produto.id]), {'formato': 'json'}).json()
+        local, = dados['locais']
+        self.assertEqual(local['saldo_inicial'], 10)
+        self.assertEqual([movimento['tipo'] for movimento in local['movimentos']], ['SAIDA'])
+        self.assertEqual(local['saldo_final'], 6)
+
+
+class ImportacaoEmLotesTests(TestCase):
+    # A validação anda pelo arquivo em lotes, sem carregar todas as linhas, e recusa
+    # arquivos acima de MAXIMO_LINHAS
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(username='almoxarife', password='x')
+        Armazem.objects.create(name='Central', usuario_registrante=cls.usuario)
+        cls.produto = Product.objects.create(product_name='Cabo', unidade_medida='m')
+
+    def arquivo(self, linhas):
+        corpo = ['produto;quantidade;local;tipo_entrada'] + [
+            f'{referencia};2;Central;Compra' for referencia in linhas
+        ]
+        return SimpleUploadedFile('entradas.csv', '\n'.join(corpo).encode())
+
+    @mock.patch.object(importacao, 'TAMANHO_LOTE', 2)
+    def test_lotes(self):
+        validas, erros = importacao.validar_arquivo(self.arquivo([self.produto.id, 'Cabo', 999, 'Cabo', 'Luva']))
+        self.assertEqual(len(validas), 3)
+        self.assertEqual([erro['linha'] for erro in erros], [4, 6])
+
+    @mock.patch.object(importacao, 'MAXIMO_LINHAS', 3)
+    def test_limite_de_linhas(self):
+        with self.assertRaises(importacao.ImportacaoError):
+            importacao.validar_arquivo(self.arquivo(['Cabo'] * 4))
+        validas, erros = importacao.validar_arquivo(self.arquivo(['Cabo'] * 3))
+        self.assertEqual((len(validas), erros), (3, []))
+
+
+class ParametrosEstoqueTests(TestCase):
+    # Mínimo/máximo só podem ser alterados pelo grupo admin
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.gestor = User.objects.create_user(username='gestor', password='x')
+        cls.gestor.groups.add(Group.objects.create(name='admin'))
+        cls.almoxarife = User.objects.create_user(username='almoxarife', password='x')
+        cls.local = Armazem.objects.create(name='Central', usuario_registrante=cls.gestor)
+        cls.produto = Product.objects.create(product_name='Cabo', unidade_medida='m')
+
+    def salvar(self, usuario):
+        self.client.force_login(usuario)
+        return self.client.post(reverse('parametros_estoque'), {
+            'local': self.local.id, 'produto[]': [self.produto.id], 'minimo[]': ['2'], 'maximo[]': ['8'],
+        })
+
+    def test_fora_do_grupo_admin_nao_altera(self):
+        self.assertRedirects(self.salvar(self.almoxarife), reverse('lista_estoque'), fetch_redirect_response=False)
+        self.assertFalse(ParametroEstoque.objects.exists())
+        self.assertRedirects(self.client.get(reverse('parametros_estoque')), reverse('lista_estoque'), fetch_redirect_response=False)
+
+    def test_admin_altera(self):
+        self.salvar(self.gestor)
+        parametro = ParametroEstoque.objects.get()
+        self.assertEqual((parametro.minimo, parametro.maximo), (2, 8))
@@ -3,10 +3,23 @@ from . import views
 
 urlpatterns = [
     path('entrada/', views.entrada_estoque, name='entrada_estoque'),
+    path('entrada/importar/', views.importar_entrada_estoque, name='importar_entrada_estoque'),
     path('saida/', views.saida_estoque, name='saida_estoque'),
     path('lista/', views.lista_estoque, name='lista_estoque'),
     path('exportar/excel/', views.exportar_estoque_excel, name='exportar_estoque_excel'),
     path('exportar/pdf/', views.exportar_estoque_pdf, name='exportar_estoque_pdf'),
+    path('exportacoes/', views.exportacoes_estoque, name='exportacoes_estoque'),
+    path('exportacoes/status/', views.status_exportacoes, name='status_exportacoes'),
+    path('exportacoes/<int:exportacao_id>/baixar/', views.baixar_exportacao, name='baixar_exportacao'),
     path('transferencia/', views.transferencia_view, name='transferencia_estoque'),
-    path('get_produtos_por_local/<str:local>/', views.get_produtos_por_local, name='get_produtos_por_local'),
+    path('movimentacoes/', views.movimentacoes_estoque, name='movimentacoes_estoque'),
+    path('kardex/<int:product_id>/', views.kardex_produto, name='kardex_produto'),
+    path('consumo/', views.consumo_centro_custo, name='consumo_centro_custo'),
+    path('alertas/', views.alertas_estoque, name='alertas_estoque'),
+    path('parametros/', views.parametros_estoque, name='parametros_estoque'),
+    path('historico/saldo/', views.historico_saldo, name='historico_saldo'),
+    path('historico/serie/', views.historico_serie, name='historico_serie'),
+    path('get_produtos_por_local/<int:local_id>/', views.get_produtos_por_local, name='get_produtos_por_local'),
+    path('catalogo/versao/', views.versao_catalogo, name='versao_catalogo'),
+    path('catalogo/<int:versao>/', views.catalogo_produtos, name='catalogo_produtos'),
 ]
\ No newline at end of file
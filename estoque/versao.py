@@ -0,0 +1,35 @@
+from .models import VersaoEstoque
+from django.db.models import F
+from django.db import transaction
+
+VERSAO_ESTOQUE = 'estoque'
+# Cadastro de produtos (nomes exibidos junto com os saldos)
+VERSAO_PRODUTOS = 'produtos'
+
+def chave_local(local_id):
+    # Versão do estoque de um único armazém (ETag de get_produtos_por_local)
+    return f'local:{local_id}'
+
+def versao_atual(chave=VERSAO_ESTOQUE):
+    return VersaoEstoque.objects.filter(chave=chave).values_list('valor', flat=True).first() or 0
+
+def versoes_atuais(*chaves):
+    # Várias versões com uma consulta, na ordem das chaves
+    valores = dict(VersaoEstoque.objects.filter(chave__in=chaves).values_list('chave', 'valor'))
+    return [valores.get(chave, 0) for chave in chaves]
+
+def _incrementar(chave):
+    if not VersaoEstoque.objects.filter(chave=chave).update(valor=F('valor') + 1):
+        versao, criada = VersaoEstoque.objects.get_or_create(chave=chave, defaults={'valor': 1})
+        if not criada:
+            VersaoEstoque.objects.filter(pk=versao.pk).update(valor=F('valor') + 1)
+
+def incrementar_versao(chave=VERSAO_ESTOQUE):
+    # Versões de local e de produtos: dentro da transação da movimentação, a nova versão só
+    # fica visível junto com ela. A versão global é tocada por toda movimentação; travá-la
+    # até o commit serializaria todas elas, então ela sobe só depois do commit. Quem lê a
+    # versão antes dos dados no máximo grava um arquivo mais novo que a versão que o nomeia.
+    if chave == VERSAO_ESTOQUE:
+        transaction.on_commit(lambda: _incrementar(chave))
+    else:
+        _incrementar(chave)
@@ -1,19 +1,39 @@
-from .models import Estoque, EntradaEstoque, SaidaEstoque, TransferenciaEstoque
+from .models import Estoque, EntradaEstoque, SaidaEstoque, TransferenciaEstoque, ExportacaoEstoque, ParametroEstoque, AlertaEstoque
 from suprimentos.models import Product, Armazem, Funcionario, CentroCusto
+from suprimentos.busca import filtro_nome, relevancia
+from suprimentos import referencias
+from accounts.forms import User
 from django.contrib.auth.decorators import login_required
-from .forms import EntradaEstoqueForm, SaidaEstoqueForm
-from django.http import HttpResponse, JsonResponse
-from django.shortcuts import render, redirect
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.pagesizes import A4
-from django.utils.timezone import now
-from reportlab.pdfgen import canvas
+from .services import MovimentacaoError, normalizar_itens, registrar_entrada, registrar_saida, registrar_transferencia
+from .forms import EntradaEstoqueForm, SaidaEstoqueForm, ImportacaoEntradaForm
+from .importacao import ImportacaoError, importar_entradas
+from .historico import saldo_em, serie_diaria
+from .exportacao import FILTROS_ESTOQUE, chave_filtros, exportacao_em_andamento, exportacao_em_cache, filtrar_estoque
+from .movimentacoes import decodificar_cursor, listar as listar_movimentacoes
+from .versao import VERSAO_PRODUTOS, chave_local, versao_atual, versoes_atuais
+from .catalogo import catalogo_comprimido
+from .consumo import consultar as consultar_consumo
+from .alertas import reavaliar_pares
+from .kardex import kardex, periodo as periodo_kardex, gerar_excel as gerar_kardex_excel, gerar_pdf as gerar_kardex_pdf
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
+import gzip
+from django.utils.timezone import localdate, now
 from django.contrib import messages
+from django.db.models import Exists, F, OuterRef, Q
 from django.db import transaction
-from django.db.models import Q
-from datetime import datetime
-from io import BytesIO
-import pandas as pd
+from datetime import date, timedelta
+import tempfile
+
+# Linhas por página da lista de estoque e das movimentações
+ITENS_POR_PAGINA = 50
+
+# Segundos que a lista de produtos de um local fica no cache (a chave já inclui a versão)
+CACHE_PRODUTOS_POR_LOCAL = 5 * 60
 
 @login_required
 def entrada_estoque(request):
@@ -29,45 +49,49 @@ def entrada_estoque(request):
             if tipo_entrada == 'DEVOLUCAO':  # Só preenche o funcionário se for devolução
                 funcionario_id = request.POST.get('funcionario')
                 if funcionario_id:
-                    funcionario = Funcionario.objects.get(id=funcionario_id)
-
-            for i in range(len(request.POST.getlist('produto'))):
-                produto_id = request.POST.getlist('produto')[i]
-                produto = Product.objects.get(id=produto_id)
-                quantidade = int(request.POST.getlist('quantidade')[i])
-
-                # Atualiza ou cria o estoque
-                estoque, created = Estoque.objects.get_or_create(
-                    product=produto, local=local, defaults={'quantidade': 0}
-                )
-                estoque.quantidade += quantidade
-                estoque.save()
-
-                # Registra a entrada no log
-                EntradaEstoque.objects.create(
-                    product=produto,
-                    local=local,
-                    quantidade=quantidade,
-                    usuario_registrante=usuario,
-                    tipo_entrada=tipo_entrada,
-                    funcionario=funcionario if tipo_entrada == 'DEVOLUCAO' else None  # Preenche o funcionário apenas para devoluções
-                )
+                    funcionario = Funcionario.objects.get(id=funcionario_id).nome_completo
+
+            try:
+                itens = normalizar_itens(request.POST.getlist('produto'), request.POST.getlist('quantidade'))
+                registrar_entrada(usuario, local.pk, itens, tipo_entrada, funcionario)
+            except MovimentacaoError as e:
+                messages.error(request, str(e))
+                return redirect('entrada_estoque')
 
             return redirect('lista_estoque')
 
     else:
         form = EntradaEstoqueForm()
 
-    # Buscar apenas os nomes dos armazéns
-    locais_entrada = Armazem.objects.filter(status=1).values_list('name', flat=True)
-    
-    # Buscar apenas os funcionários ativos (status=True)
-    funcionarios = Funcionario.objects.filter(status=True)
+    # Armazéns ativos vêm do cache de referências; produtos e funcionários, do typeahead
+    locais_entrada = referencias.obter('armazens_ativos')
 
     return render(request, 'estoque/forms/entrada_estoque.html', {
         'form': form,
         'locais_entrada': locais_entrada,
-        'funcionarios': funcionarios  # Passa a lista de funcionários ativos para o template
+    })
+
+@login_required
+def importar_entrada_estoque(request):
+    erros = []
+    if request.method == 'POST':
+        form = ImportacaoEntradaForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                total, erros = importar_entradas(form.cleaned_data['arquivo'], request.user)
+            except ImportacaoError as e:
+                messages.error(request, str(e))
+            else:
+                if not erros:
+                    messages.success(request, f"{total} entrada(s) importada(s) com sucesso.")
+                    return redirect('lista_estoque')
+                messages.error(request, "O arquivo possui erros. Nenhuma entrada foi registrada.")
+    else:
+        form = ImportacaoEntradaForm()
+
+    return render(request, 'estoque/forms/importar_entrada.html', {
+        'form': form,
+        'erros': erros,
     })
 
 @login_required
@@ -79,49 +103,18 @@ def saida_estoque(request):
             responsavel = form.cleaned_data['responsavel']
             centro_custo = form.cleaned_data['centro_custo']
             observacao = form.cleaned_data['observacao']
-            produtos = request.POST.getlist('produto[]')  # Captura os produtos dinâmicos
-            quantidades = request.POST.getlist('quantidade[]')  # Captura as quantidades dinâmicas
-
-            if not produtos or not quantidades:
-                messages.error(request, "É necessário adicionar pelo menos um produto e quantidade.")
-                return redirect('saida_estoque')
-
             try:
-                with transaction.atomic():
-                    for i in range(len(produtos)):
-                        produto_id = produtos[i]
-                        quantidade = int(quantidades[i])
-                        produto = Product.objects.get(id=produto_id)
-
-                        # Verifica se o produto existe no estoque
-                        estoque = Estoque.objects.get(product=produto, local=local)
-                        if estoque.quantidade < quantidade:
-                            messages.error(request, f"Estoque insuficiente para {produto.product_name}. Disponível: {estoque.quantidade}")
-                            return redirect('saida_estoque')
-
-                        # Atualiza o estoque
-                        estoque.quantidade -= quantidade
-                        estoque.save()
-
-                        # Registra a saída com o usuário logado (usuario_registrante)
-                        SaidaEstoque.objects.create(
-                            product=produto,
-                            local=local,
-                            quantidade=quantidade,
-                            responsavel=responsavel,
-                            centro_custo=centro_custo,
-                            observacao=observacao,
-                            usuario_registrante=request.user  # Aqui você adiciona o usuário logado
-                        )
-
-                    messages.success(request, "Saída registrada com sucesso.")
-                    return redirect('lista_estoque')
-            except Estoque.DoesNotExist:
-                messages.error(request, "O local ou produto especificado não existe no estoque.")
+                itens = normalizar_itens(request.POST.getlist('produto[]'), request.POST.getlist('quantidade[]'))
+                registrar_saida(request.user, local.pk, itens, responsavel, centro_custo, observacao)
+            except MovimentacaoError as e:
+                messages.error(request, str(e))
                 return redirect('saida_estoque')
             except Exception as e:
                 messages.error(request, f"Erro ao registrar a saída: {e}")
                 return redirect('saida_estoque')
+
+            messages.success(request, "Saída registrada com sucesso.")
+            return redirect('lista_estoque')
         else:
             # Exibe os erros do formulário
             for field, errors in form.errors.items():
@@ -130,342 +123,586 @@ def saida_estoque(request):
         form = SaidaEstoqueForm()
 
     # Filtragem dos locais que possuem produtos com quantidade > 0
-    locais_estoque_validos = Estoque.objects.filter(quantidade__gt=0).values_list('local', flat=True).distinct()
-
-    # Passa os dados necessários para o template
-    funcionarios = Funcionario.objects.filter(status=True)
-    centros_custo = CentroCusto.objects.all()
+    locais_estoque_validos = referencias.obter('locais_com_saldo')
 
+    # Responsável e centro de custo são escolhidos pelo typeahead
     return render(request, 'estoque/forms/saida_estoque.html', {
         'form': form,
         'locais_estoque': locais_estoque_validos,  # Passando apenas locais válidos
-        'funcionarios': funcionarios,
-        'centros_custo': centros_custo,
     })
 
 @login_required
-def get_produtos_por_local(request, local):
-    produtos = Estoque.objects.filter(local=local, quantidade__gt=0)
-    produtos_info = []
-
-    for estoque in produtos:
-        produtos_info.append({
-            'id': estoque.product_id,
-            'quantidade': estoque.quantidade,
-            'product': {
-                'product_name': estoque.product.product_name
-            }
-        })
+def get_produtos_por_local(request, local_id):
+    # Chamado a cada troca de local nos formulários de saída e transferência. A ETag vem das
+    # versões do estoque do local e do cadastro de produtos: sem movimentação o navegador
+    # recebe 304, e a lista montada fica no cache sob a mesma versão.
+    versao_local, versao_produtos = versoes_atuais(chave_local(local_id), VERSAO_PRODUTOS)
+    etag = quote_etag(f'{local_id}-{versao_local}-{versao_produtos}')
+
+    resposta = get_conditional_response(request, etag=etag)
+    if resposta is None:
+        chave = f'produtos_por_local:{local_id}:{versao_local}:{versao_produtos}'
+        produtos_info = cache.get(chave)
+        if produtos_info is None:
+            linhas = (
+                Estoque.objects.filter(local_id=local_id, quantidade__gt=0)
+                .order_by('product__product_name')
+                .values_list('product_id', 'quantidade', 'product__product_name')
+            )
+            produtos_info = [
+                {'id': produto_id, 'quantidade': quantidade, 'product': {'product_name': nome}}
+                for produto_id, quantidade, nome in linhas
+            ]
+            cache.set(chave, produtos_info, CACHE_PRODUTOS_POR_LOCAL)
+        resposta = JsonResponse({'produtos': produtos_info})
+
+    resposta['ETag'] = etag
+    patch_cache_control(resposta, private=True, no_cache=True)
+    return resposta
 
-    return JsonResponse({'produtos': produtos_info})
+@login_required
+def versao_catalogo(request):
+    # Consulta leve: o cliente só baixa o catálogo de novo quando a versão muda
+    versao = versao_atual(VERSAO_PRODUTOS)
+    resposta = JsonResponse({'versao': versao, 'url': reverse('catalogo_produtos', args=[versao])})
+    patch_cache_control(resposta, private=True, no_cache=True)
+    return resposta
+
+@login_required
+def catalogo_produtos(request, versao):
+    # Conteúdo imutável por versão; versões antigas redirecionam para a atual
+    atual = versao_atual(VERSAO_PRODUTOS)
+    if versao != atual:
+        resposta = redirect('catalogo_produtos', versao=atual)
+        patch_cache_control(resposta, private=True, no_cache=True)
+        return resposta
+
+    conteudo = catalogo_comprimido(versao)
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        resposta = HttpResponse(conteudo, content_type='application/json')
+        resposta['Content-Encoding'] = 'gzip'
+    else:
+        resposta = HttpResponse(gzip.decompress(conteudo), content_type='application/json')
+    patch_vary_headers(resposta, ['Accept-Encoding'])
+    resposta['ETag'] = quote_etag(f'catalogo-{versao}')
+    patch_cache_control(resposta, private=True, max_age=365 * 24 * 60 * 60, immutable=True)
+    return resposta
+
+def _pagina_estoque(request):
+    # Paginação por cursor: "apos" é o último id da página anterior, então cada página
+    # custa o mesmo (WHERE id > cursor ... LIMIT) em qualquer profundidade
+    estoque = filtrar_estoque(request.GET).annotate(
+        classe_abc=F('product__classificacao__classe_abc'),
+        classe_xyz=F('product__classificacao__classe_xyz'),
+    )
+    apos = request.GET.get('apos', '')
+
+    expressao = relevancia('product__product_name', request.GET.get('search', '')) if request.GET.get('search') else None
+    if expressao is None:
+        estoque = estoque.order_by('id')
+        if apos.isdigit():
+            estoque = estoque.filter(id__gt=apos)
+    else:
+        # Com busca no Postgres, os mais parecidos primeiro; o cursor passa a ser "relevância|id"
+        estoque = estoque.annotate(relevancia=expressao).order_by('-relevancia', 'id')
+        try:
+            valor, ultimo_id = apos.split('|')
+            valor, ultimo_id = float(valor), int(ultimo_id)
+        except ValueError:
+            pass
+        else:
+            estoque = estoque.filter(Q(relevancia__lt=valor) | Q(relevancia=valor, id__gt=ultimo_id))
+
+    itens = list(estoque[:ITENS_POR_PAGINA + 1])
+    proximo = None
+    if len(itens) > ITENS_POR_PAGINA:
+        ultimo = itens[ITENS_POR_PAGINA - 1]
+        proximo = ultimo.id if expressao is None else f"{ultimo.relevancia!r}|{ultimo.id}"
+    return itens[:ITENS_POR_PAGINA], proximo
 
 @login_required
 def lista_estoque(request):
-    estoque = Estoque.objects.select_related('product')
-
-    search = request.GET.get('search', '')
-    local = request.GET.get('local', '')
-    unidade = request.GET.get('unidade', '')
-    categoria = request.GET.get('categoria', '')
-    quantidade = request.GET.get('quantidade', '')  # Get the quantidade filter
-
-    # Apply filters based on the received parameters
-    if search:
-        estoque = estoque.filter(
-            Q(product__product_name__icontains=search) |
-            Q(local__icontains=search)
-        )
-    if local:
-        estoque = estoque.filter(local=local)
-    if unidade:
-        estoque = estoque.filter(product__unidade_medida=unidade)
-    if categoria:
-        estoque = estoque.filter(product__categoria=categoria)
-    if quantidade:
-        estoque = estoque.filter(quantidade=quantidade)  # Filter by quantity
+    itens, proximo = _pagina_estoque(request)
+
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({
+            'itens': [
+                {
+                    'product_id': item.product_id,
+                    'produto': item.product.product_name,
+                    'local': item.local.name,
+                    'quantidade': item.quantidade,
+                    'unidade': item.product.unidade_medida,
+                    'categoria': item.product.categoria,
+                    'classe': f"{item.classe_abc}{item.classe_xyz}" if item.classe_abc else None,
+                }
+                for item in itens
+            ],
+            'proximo': proximo,
+        })
 
     # Obtaining unique values for available locations and units
-    locais_disponiveis = Estoque.objects.values_list('local', flat=True).distinct()
-    unidades_disponiveis = Estoque.objects.values_list('product__unidade_medida', flat=True).distinct()
+    locais_disponiveis = referencias.obter('locais_com_estoque')
+    unidades_disponiveis = referencias.obter('unidades_em_estoque')
+
+    # Querystring dos filtros atuais, usada para buscar as próximas páginas
+    filtros = request.GET.copy()
+    filtros.pop('apos', None)
+    filtros.pop('formato', None)
 
     context = {
-        'estoque': estoque,
+        'estoque': itens,
+        'proximo': proximo,
+        'filtros': filtros.urlencode(),
         'locais_disponiveis': locais_disponiveis,
         'unidades_disponiveis': unidades_disponiveis,
     }
 
     return render(request, 'estoque/lista_estoque.html', context)
 
+def _solicitar_exportacao(request, formato):
+    # A exportação é gerada pelo worker (manage.py processar_exportacoes); aqui só entra na fila
+    filtros = {chave: valor for chave, valor in request.GET.items() if chave in FILTROS_ESTOQUE}
+
+    chave, versao = chave_filtros(filtros), versao_atual()
+
+    # Mesmos filtros e nenhuma movimentação desde a última geração: envia o arquivo pronto
+    pronta = exportacao_em_cache(formato, chave, versao)
+    if pronta is not None:
+        return FileResponse(pronta.arquivo.open('rb'), as_attachment=True, filename=pronta.arquivo.name.rsplit('/', 1)[-1])
+
+    # Cliques repetidos antes de o arquivo ficar pronto reaproveitam o job que já está na fila
+    if exportacao_em_andamento(request.user, formato, chave, versao) is not None:
+        messages.info(request, "Esta exportação já está na fila. O arquivo ficará disponível abaixo assim que for gerado.")
+        return redirect('exportacoes_estoque')
+
+    ExportacaoEstoque.objects.create(usuario=request.user, formato=formato, filtros=filtros, chave=chave, versao=versao)
+    messages.success(request, "Exportação solicitada. O arquivo ficará disponível abaixo assim que for gerado.")
+    return redirect('exportacoes_estoque')
+
 @login_required
 def exportar_estoque_excel(request):
-    estoque = Estoque.objects.select_related('product')
-
-    search = request.GET.get('search', '')
-    local = request.GET.get('local', '')
-    unidade = request.GET.get('unidade', '')
-    categoria = request.GET.get('categoria', '')
-
-    # Aplicando os filtros conforme os parâmetros recebidos
-    if search:
-        estoque = estoque.filter(
-            Q(product__product_name__icontains=search) |
-            Q(local__icontains=search)
-        )
-    if local:
-        estoque = estoque.filter(local=local)
-    if unidade:
-        estoque = estoque.filter(product__unidade_medida=unidade)
-    if categoria:
-        estoque = estoque.filter(product__categoria=categoria)
-
-    # Criando um DataFrame com os dados filtrados
-    data = []
-    for item in estoque:
-        data.append([
-            item.product.product_name,
-            item.quantidade,  # Quantidade agora vem logo após o nome do produto
-            item.product.unidade_medida,
-            "Uso único" if item.product.categoria == "unico" else "Reutilizável",
-            "Ativo" if item.product.status else "Inativo",
-            item.local
-        ])
-
-    df = pd.DataFrame(data, columns=[
-        "Nome do Produto", "Quantidade", "Unidade de Medida", "Categoria", "Status", "Local"
-    ])
-
-    # Criando um arquivo Excel na memória
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=estoque.xlsx'
-
-    with pd.ExcelWriter(response, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name="Estoque")
-
-    return response
+    return _solicitar_exportacao(request, 'EXCEL')
 
 @login_required
 def exportar_estoque_pdf(request):
-    estoque = Estoque.objects.select_related('product')
-
-    search = request.GET.get('search', '')
-    local = request.GET.get('local', '')
-    unidade = request.GET.get('unidade', '')
-    categoria = request.GET.get('categoria', '')
-
-    # Aplicando filtros conforme os parâmetros recebidos
-    if search:
-        estoque = estoque.filter(
-            Q(product__product_name__icontains=search) |
-            Q(local__icontains=search)
-        )
-    if local:
-        estoque = estoque.filter(local=local)
-    if unidade:
-        estoque = estoque.filter(product__unidade_medida=unidade)
-    if categoria:
-        estoque = estoque.filter(product__categoria=categoria)
-
-    # Criando o arquivo PDF em memória
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    # 📌 Definições de layout
-    margem_esquerda = 30
-    margem_topo = height - 50
-    espacamento_linha = 15
-    espacamento_titulo = 30
-    rodape_altura = 40
-
-    # 📌 Obtendo a data atual formatada
-    data_atual = datetime.now().strftime("%d/%m/%Y")
-
-    # 🖼️ Adicionando papel timbrado (imagem do logotipo)
-    try:
-        logo_path = "media/icons/LOGO_ACT_LARANJA.png"  # Altere para o caminho correto
-        logo = ImageReader(logo_path)
-        p.drawImage(logo, margem_esquerda, height - 100, width=100, height=50, mask='auto')
-    except:
-        print("⚠️ Logo não encontrado. Verifique o caminho!")
-
-    # 📝 Adicionando cabeçalho estilizado
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(margem_esquerda + 120, height - 80, "ACT ENGENHARIA - Relatório de Estoque")
-
-    # 📆 Adicionando data do relatório
-    p.setFont("Helvetica", 10)
-    p.drawString(margem_esquerda + 120, height - 95, f"Data de geração: {data_atual}")
-
-    # 📌 Criando cabeçalho da tabela
-    p.setFont("Helvetica-Bold", 9)
-    y_position = margem_topo - 120  # Ajustado para não sobrepor o cabeçalho
-    colunas = [
-        ("Produto", margem_esquerda),
-        ("Qtd", 180),
-        ("Unidade", 230),
-        ("Categoria", 300),
-        ("Status", 370),
-        ("Local", 450),
-    ]
-    for titulo, x in colunas:
-        p.drawString(x, y_position, titulo)
-
-    # 📝 Adicionando os dados do estoque
-    p.setFont("Helvetica", 9)
-    y_position -= espacamento_linha
-    for item in estoque:
-        p.drawString(margem_esquerda, y_position, item.product.product_name[:20])  # Nome limitado
-        p.drawString(180, y_position, str(item.quantidade))
-        p.drawString(230, y_position, item.product.unidade_medida)
-        p.drawString(300, y_position, item.product.categoria)
-        p.drawString(370, y_position, "Ativo" if item.product.status else "Inativo")
-        p.drawString(450, y_position, item.local[:20])  # Local limitado
-
-        y_position -= espacamento_linha
-        if y_position < rodape_altura + 20:  # Criar nova página se atingir limite
-            p.showPage()
-
-            # Reaplica o cabeçalho na nova página
-            try:
-                p.drawImage(logo, margem_esquerda, height - 100, width=100, height=50, mask='auto')
-            except:
-                pass
-            p.setFont("Helvetica-Bold", 14)
-            p.drawString(margem_esquerda + 120, height - 80, "Empresa XYZ - Relatório de Estoque")
-            p.setFont("Helvetica", 10)
-            p.drawString(margem_esquerda + 120, height - 95, f"Data de geração: {data_atual}")
-
-            # Reaplica cabeçalho da tabela
-            p.setFont("Helvetica-Bold", 9)
-            y_position = margem_topo - 120
-            for titulo, x in colunas:
-                p.drawString(x, y_position, titulo)
-            y_position -= espacamento_linha
-            p.setFont("Helvetica", 9)
-
-    # ✏️ Adicionando rodapé fixo
-    p.setFont("Helvetica", 8)
-    p.drawString(margem_esquerda, 30, "Empresa XYZ - Endereço: Rua Exemplo, 123 - Tel: (11) 9999-9999 - Email: contato@empresa.com")
-
-    # 🏁 Finalizando o PDF
-    p.showPage()
-    p.save()
-
-    # 📄 Enviando o arquivo PDF como resposta HTTP
-    buffer.seek(0)
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename=estoque_{data_atual.replace("/", "-")}.pdf'
-    response.write(buffer.getvalue())
-    return response
+    return _solicitar_exportacao(request, 'PDF')
+
+def _exportacoes_do_usuario(request):
+    return ExportacaoEstoque.objects.filter(usuario=request.user).exclude(expira_em__lt=now()).order_by('-id')
 
 @login_required
-def transferencia_produto(usuario, produto_id, local_saida, local_entrada, quantidade):
-    # Verificar se o produto existe
-    try:
-        produto = Product.objects.get(id=produto_id)
-    except Product.DoesNotExist:
-        raise Exception("Produto não encontrado.")
-    
-    # Verificar se o produto existe no local de saída
-    try:
-        estoque_saida = Estoque.objects.get(produto=produto, local=local_saida)
-    except Estoque.DoesNotExist:
-        raise Exception(f"Produto não encontrado no local de saída: {local_saida}.")
-    
-    # Verificar se o produto existe no local de entrada
-    try:
-        estoque_entrada = Estoque.objects.get(produto=produto, local=local_entrada)
-    except Estoque.DoesNotExist:
-        raise Exception(f"Produto não encontrado no local de entrada: {local_entrada}.")
-    
-    # Verificar se a quantidade no local de saída é suficiente
-    if estoque_saida.quantidade < quantidade:
-        raise Exception(f"Quantidade insuficiente no local de saída: {local_saida}.")
-    
-    # Iniciar uma transação para garantir que tudo seja feito
-    with transaction.atomic():
-        # Subtrair a quantidade do local de saída
-        estoque_saida.quantidade -= quantidade
-        estoque_saida.save()
-        
-        # Adicionar a quantidade ao local de entrada
-        estoque_entrada.quantidade += quantidade
-        estoque_entrada.save()
-        
-        # Criar um log de transferência
-        log_transferencia = TransferenciaEstoque(
-            produto=produto,
-            local_saida=local_saida,
-            local_entrada=local_entrada,
-            quantidade=quantidade,
-            usuario=usuario,
-            data_transferencia=now()
-        )
-        log_transferencia.save()
-    
-    return f"Transferência de {quantidade} unidades de {produto.nome} realizada com sucesso!"
+def exportacoes_estoque(request):
+    return render(request, 'estoque/exportacoes.html', {
+        'exportacoes': _exportacoes_do_usuario(request),
+    })
+
+@login_required
+def status_exportacoes(request):
+    # Consultado periodicamente pela caixa de exportações para atualizar o progresso
+    return JsonResponse({
+        'exportacoes': [
+            {
+                'id': exportacao.id,
+                'status': exportacao.status,
+                'status_display': exportacao.get_status_display(),
+                'progresso': exportacao.progresso,
+            }
+            for exportacao in _exportacoes_do_usuario(request)
+        ]
+    })
+
+@login_required
+def baixar_exportacao(request, exportacao_id):
+    exportacao = get_object_or_404(
+        _exportacoes_do_usuario(request), pk=exportacao_id, status='CONCLUIDA'
+    )
+    return FileResponse(exportacao.arquivo.open('rb'), as_attachment=True, filename=exportacao.arquivo.name.rsplit('/', 1)[-1])
 
 @login_required
 def transferencia_view(request):
     if request.method == 'POST':
-        local_saida = request.POST.get('local_saida')
-        local_entrada = request.POST.get('local_entrada')
+        local_saida = request.POST.get('local_saida', '')
+        local_entrada = request.POST.get('local_entrada', '')
         responsavel_id = request.POST.get('responsavel')
         observacao = request.POST.get('observacao')  # Captura o campo de observação
         usuario = request.user
-        produtos = request.POST.getlist('produto[]')
-        quantidades = request.POST.getlist('quantidade[]')
 
         try:
-            with transaction.atomic():
-                for i in range(len(produtos)):
-                    produto_id = produtos[i]
-                    quantidade = int(quantidades[i])
-                    produto = Product.objects.get(id=produto_id)
-                    estoque_saida = Estoque.objects.get(product=produto, local=local_saida)
-
-                    if estoque_saida.quantidade < quantidade:
-                        messages.error(request, f"Estoque insuficiente para {produto.product_name}.")
-                        return redirect('transferencia_estoque')
-
-                    estoque_saida.quantidade -= quantidade
-                    estoque_saida.save()
-
-                    estoque_entrada, created = Estoque.objects.get_or_create(
-                        product=produto,
-                        local=local_entrada,
-                        defaults={'quantidade': 0}
-                    )
-                    estoque_entrada.quantidade += quantidade
-                    estoque_entrada.save()
-
-                    TransferenciaEstoque.objects.create(
-                        produto=produto,
-                        local_saida=local_saida,
-                        local_entrada=local_entrada,
-                        quantidade=quantidade,
-                        usuario=usuario,
-                        responsavel_id=responsavel_id,
-                        observacao=observacao  # Salva a observação
-                    )
-
+            if not (local_saida.isdigit() and local_entrada.isdigit()):
+                raise MovimentacaoError("Selecione os locais de saída e de entrada.")
+            itens = normalizar_itens(request.POST.getlist('produto[]'), request.POST.getlist('quantidade[]'))
+            registrar_transferencia(usuario, int(local_saida), int(local_entrada), itens, responsavel_id, observacao)
             messages.success(request, "Transferência realizada com sucesso.")
             return redirect('lista_estoque')
+        except MovimentacaoError as e:
+            messages.error(request, str(e))
+            return redirect('transferencia_estoque')
         except Exception as e:
             messages.error(request, f"Ocorreu um erro: {e}")
             return redirect('transferencia_estoque')
 
     # Filtragem de armazéns com status=1
-    locais_entrada_ativos = Armazem.objects.filter(status=1)
+    locais_entrada_ativos = referencias.obter('armazens_ativos')
 
     # Filtragem dos locais de saída com produtos em estoque (quantidade > 0)
-    locais_saida_com_produtos = Estoque.objects.filter(quantidade__gt=0).values_list('local', flat=True).distinct()
+    locais_saida_com_produtos = referencias.obter('locais_com_saldo')
 
     return render(request, 'estoque/forms/transferencia_estoque.html', {
         'locais_saida': locais_saida_com_produtos,  # Passando os locais de saída com produtos > 0
         'locais_entrada': locais_entrada_ativos,  # Passando os armazéns com status 1
-        'funcionarios': Funcionario.objects.filter(status=True),
     })
 
+def _data_parametro(request, nome, padrao=None):
+    valor = request.GET.get(nome)
+    if not valor:
+        return padrao
+    return date.fromisoformat(valor)
+
+@login_required
+def historico_saldo(request):
+    # Saldo por produto/local ao final de uma data qualquer
+    try:
+        dia = _data_parametro(request, 'data', localdate())
+        produto_id = int(request.GET['produto']) if request.GET.get('produto') else None
+        local_id = int(request.GET['local']) if request.GET.get('local') else None
+    except ValueError:
+        return JsonResponse({'error': 'Parâmetros inválidos. Use datas no formato AAAA-MM-DD.'}, status=400)
+
+    saldos = saldo_em(dia, produto_id, local_id)
+    nomes = Product.objects.in_bulk({produto for produto, _ in saldos})
+    locais = dict(Armazem.objects.filter(pk__in={loc for _, loc in saldos}).values_list('id', 'name'))
+
+    return JsonResponse({
+        'data': dia.isoformat(),
+        'saldos': [
+            {
+                'produto_id': produto,
+                'produto': nomes[produto].product_name if produto in nomes else None,
+                'local_id': local,
+                'local': locais.get(local),
+                'quantidade': quantidade,
+            }
+            for (produto, local), quantidade in sorted(saldos.items(), key=lambda item: (item[0][1], item[0][0]))
+        ],
+    })
+
+@login_required
+def historico_serie(request):
+    # Série diária de saldos por local, para os gráficos de tendência
+    try:
+        fim = _data_parametro(request, 'fim', localdate())
+        inicio = _data_parametro(request, 'inicio', fim - timedelta(days=29))
+        produto_id = int(request.GET['produto']) if request.GET.get('produto') else None
+        local_id = int(request.GET['local']) if request.GET.get('local') else None
+    except ValueError:
+        return JsonResponse({'error': 'Parâmetros inválidos. Use datas no formato AAAA-MM-DD.'}, status=400)
+
+    if inicio > fim or (fim - inicio).days > 730:
+        return JsonResponse({'error': 'Período inválido (máximo de 2 anos).'}, status=400)
+
+    serie = serie_diaria(inicio, fim, produto_id, local_id)
+    locais = dict(Armazem.objects.filter(pk__in=serie['series'].keys()).values_list('id', 'name'))
+    return JsonResponse({
+        'datas': [dia.isoformat() for dia in serie['datas']],
+        'series': [
+            {'local_id': loc, 'local': locais.get(loc), 'valores': valores}
+            for loc, valores in sorted(serie['series'].items(), key=lambda item: locais.get(item[0], ''))
+        ],
+    })
+
+def _id_parametro(request, nome):
+    valor = request.GET.get(nome, '')
+    return int(valor) if valor.isdigit() else None
+
+@login_required
+def movimentacoes_estoque(request):
+    # Entradas, saídas e transferências em uma única lista, da mais recente para a mais antiga
+    try:
+        desde = _data_parametro(request, 'desde')
+        ate = _data_parametro(request, 'ate')
+    except ValueError:
+        messages.error(request, "Datas inválidas. Use o formato AAAA-MM-DD.")
+        desde = ate = None
+
+    try:
+        cursor = decodificar_cursor(request.GET['apos']) if request.GET.get('apos') else None
+    except ValueError:
+        cursor = None
+
+    produto_id = _id_parametro(request, 'produto')
+    funcionario_id = _id_parametro(request, 'funcionario')
+    itens, proximo = listar_movimentacoes(
+        ITENS_POR_PAGINA,
+        cursor=cursor,
+        produto_id=produto_id,
+        local_id=_id_parametro(request, 'local'),
+        usuario_id=_id_parametro(request, 'usuario'),
+        funcionario_id=funcionario_id,
+        desde=desde,
+        ate=ate,
+    )
+
+    filtros = request.GET.copy()
+    filtros.pop('apos', None)
+
+    # Produto e funcionário são escolhidos pelo typeahead; só o selecionado vem do banco.
+    # Usuários: apenas quem já registrou alguma movimentação.
+    usuarios = User.objects.filter(
+        Exists(EntradaEstoque.objects.filter(usuario_registrante=OuterRef('pk')))
+        | Exists(SaidaEstoque.objects.filter(usuario_registrante=OuterRef('pk')))
+        | Exists(TransferenciaEstoque.objects.filter(usuario=OuterRef('pk')))
+    ).only('id', 'username').order_by('username')
+
+    return render(request, 'estoque/movimentacoes.html', {
+        'movimentacoes': itens,
+        'proximo': proximo,
+        'filtros': filtros.urlencode(),
+        'produto': Product.objects.filter(pk=produto_id).only('id', 'product_name').first() if produto_id else None,
+        'locais': referencias.obter('armazens'),
+        'usuarios': usuarios,
+        'funcionario': Funcionario.objects.filter(pk=funcionario_id).only('id', 'nome_completo').first() if funcionario_id else None,
+    })
+
+@login_required
+def kardex_produto(request, product_id):
+    produto = get_object_or_404(Product, pk=product_id)
+    formato = request.GET.get('formato', '')
+    try:
+        desde = _data_parametro(request, 'desde')
+        ate = _data_parametro(request, 'ate')
+    except ValueError:
+        if formato == 'json':
+            return JsonResponse({'error': 'Parâmetros inválidos. Use datas no formato AAAA-MM-DD.'}, status=400)
+        messages.error(request, "Datas inválidas. Use o formato AAAA-MM-DD.")
+        desde = ate = None
+
+    desde, ate = periodo_kardex(desde, ate)
+    resultado = kardex(product_id, desde, ate, _id_parametro(request, 'local'))
+
+    if formato == 'json':
+        return JsonResponse({
+            'produto_id': produto.id,
+            'produto': produto.product_name,
+            'desde': desde,
+            'ate': ate,
+            'locais': resultado,
+        })
+
+    if formato in ('excel', 'pdf'):
+        arquivo = tempfile.TemporaryFile()
+        if formato == 'excel':
+            gerar_kardex_excel(resultado, arquivo)
+            nome = f'kardex_{produto.id}.xlsx'
+        else:
+            gerar_kardex_pdf(resultado, produto, arquivo)
+            nome = f'kardex_{produto.id}.pdf'
+        arquivo.seek(0)
+        return FileResponse(arquivo, as_attachment=True, filename=nome)
+
+    filtros = request.GET.copy()
+    filtros.pop('formato', None)
+
+    return render(request, 'estoque/kardex.html', {
+        'produto': produto,
+        'locais_kardex': resultado,
+        'desde': desde,
+        'filtros': filtros.urlencode(),
+        'locais': referencias.obter('armazens'),
+    })
+
+def _mes_parametro(request, nome, padrao):
+    # "AAAA-MM" (input type="month") -> primeiro dia do mês
+    valor = request.GET.get(nome)
+    if not valor:
+        return padrao
+    return date.fromisoformat(f'{valor}-01')
 
+@login_required
+def consumo_centro_custo(request):
+    # Consumo por centro de custo e produto (ou categoria), lido da tabela ConsumoMensal
+    formato = request.GET.get('formato', '')
+    mes_atual = localdate().replace(day=1)
+    try:
+        inicio = _mes_parametro(request, 'de', mes_atual)
+        fim = _mes_parametro(request, 'ate', inicio)
+    except ValueError:
+        if formato == 'json':
+            return JsonResponse({'error': 'Parâmetros inválidos. Use meses no formato AAAA-MM.'}, status=400)
+        messages.error(request, "Meses inválidos. Use o formato AAAA-MM.")
+        inicio = fim = mes_atual
+
+    centro_custo_id = _id_parametro(request, 'centro_custo')
+    agrupar = 'categoria' if request.GET.get('agrupar') == 'categoria' else 'produto'
+    linhas = consultar_consumo(inicio, fim, centro_custo_id, agrupar)
+
+    categorias = dict(Product.CATEGORIA_CHOICES)
+    consumo = []
+    for linha in linhas:
+        item = {'centro_custo_id': linha['centro_custo_id'], 'centro_custo': linha['centro_custo__name']}
+        if agrupar == 'categoria':
+            item['categoria'] = categorias.get(linha['product__categoria'], linha['product__categoria'])
+        else:
+            item['produto_id'] = linha['product_id']
+            item['produto'] = linha['product__product_name']
+            item['unidade'] = linha['product__unidade_medida']
+        item['quantidade'] = linha['total_quantidade']
+        item['linhas'] = linha['total_linhas']
+        consumo.append(item)
+
+    if formato == 'json':
+        return JsonResponse({
+            'de': inicio.isoformat(),
+            'ate': fim.isoformat(),
+            'agrupar': agrupar,
+            'consumo': consumo,
+        })
 
+    centro_custo = None
+    if centro_custo_id is not None:
+        centro_custo = CentroCusto.objects.filter(pk=centro_custo_id).only('id', 'name').first()
+
+    return render(request, 'estoque/consumo.html', {
+        'consumo': consumo,
+        'agrupar': agrupar,
+        'de': inicio,
+        'ate': fim,
+        'centro_custo': centro_custo,
+    })
+
+@login_required
+def alertas_estoque(request):
+    # Pares produto/local abaixo do mínimo, em ordem do índice (local, produto)
+    alertas = AlertaEstoque.objects.select_related('product', 'local').order_by('local_id', 'product_id')
+    local_id = _id_parametro(request, 'local')
+    if local_id is not None:
+        alertas = alertas.filter(local_id=local_id)
+
+    apos = request.GET.get('apos', '')
+    try:
+        ultimo_local, ultimo_produto = map(int, apos.split('|'))
+    except ValueError:
+        pass
+    else:
+        alertas = alertas.filter(Q(local_id__gt=ultimo_local) | Q(local_id=ultimo_local, product_id__gt=ultimo_produto))
+
+    itens = list(alertas[:ITENS_POR_PAGINA + 1])
+    proximo = None
+    if len(itens) > ITENS_POR_PAGINA:
+        ultimo = itens[ITENS_POR_PAGINA - 1]
+        proximo = f"{ultimo.local_id}|{ultimo.product_id}"
+    itens = itens[:ITENS_POR_PAGINA]
+
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({
+            'alertas': [
+                {
+                    'produto_id': alerta.product_id,
+                    'produto': alerta.product.product_name,
+                    'local_id': alerta.local_id,
+                    'local': alerta.local.name,
+                    'quantidade': alerta.quantidade,
+                    'minimo': alerta.minimo,
+                    'maximo': alerta.maximo,
+                    'reposicao': alerta.reposicao,
+                    'desde': alerta.desde.isoformat(),
+                }
+                for alerta in itens
+            ],
+            'proximo': proximo,
+        })
+
+    filtros = request.GET.copy()
+    filtros.pop('apos', None)
+
+    return render(request, 'estoque/alertas.html', {
+        'alertas': itens,
+        'proximo': proximo,
+        'filtros': filtros.urlencode(),
+        'locais': referencias.obter('armazens'),
+    })
+
+def _inteiro_opcional(valor):
+    valor = (valor or '').strip()
+    if not valor:
+        return None
+    if not valor.isdigit():
+        raise ValueError(valor)
+    return int(valor)
+
+@login_required
+def parametros_estoque(request):
+    # Edição em lote de mínimo/máximo dos produtos ativos em um armazém
+    # Os parâmetros disparam os alertas de todos os usuários: só o grupo admin (o mesmo da transição em lote)
+    if not request.user.groups.filter(name='admin').exists():
+        messages.error(request, "Sem permissão para alterar os parâmetros de estoque.")
+        return redirect('lista_estoque')
+
+    if request.method == 'POST':
+        local_id = request.POST.get('local', '')
+        if not local_id.isdigit():
+            messages.error(request, "Selecione o armazém.")
+            return redirect('parametros_estoque')
+        local_id = int(local_id)
+
+        try:
+            linhas = []
+            for produto_id, minimo, maximo in zip(request.POST.getlist('produto[]'), request.POST.getlist('minimo[]'), request.POST.getlist('maximo[]')):
+                linha = (int(produto_id), _inteiro_opcional(minimo), _inteiro_opcional(maximo))
+                if linha[1] is not None and linha[2] is not None and linha[2] < linha[1]:
+                    raise ValueError(produto_id)
+                linhas.append(linha)
+        except ValueError:
+            messages.error(request, "Use números inteiros, com o máximo maior ou igual ao mínimo.")
+            return redirect(request.get_full_path())
+
+        with transaction.atomic():
+            vazios = [produto_id for produto_id, minimo, maximo in linhas if minimo is None and maximo is None]
+            ParametroEstoque.objects.filter(local_id=local_id, product_id__in=vazios).delete()
+            ParametroEstoque.objects.bulk_create([
+                ParametroEstoque(product_id=produto_id, local_id=local_id, minimo=minimo, maximo=maximo)
+                for produto_id, minimo, maximo in linhas if minimo is not None or maximo is not None
+            ], update_conflicts=True, unique_fields=['product', 'local'], update_fields=['minimo', 'maximo'])
+            reavaliar_pares((produto_id, local_id) for produto_id, _, _ in linhas)
+
+        messages.success(request, "Parâmetros salvos.")
+        return redirect(request.get_full_path())
+
+    local_id = _id_parametro(request, 'local')
+    itens, proximo = [], None
+    if local_id is not None:
+        # Página de produtos ativos (cursor por id), com saldo e parâmetros do armazém
+        produtos = Product.objects.filter(status=True).only('id', 'product_name', 'unidade_medida').order_by('id')
+        if request.GET.get('search'):
+            produtos = produtos.filter(filtro_nome('product_name', request.GET['search']))
+        apos = request.GET.get('apos', '')
+        if apos.isdigit():
+            produtos = produtos.filter(id__gt=apos)
+
+        itens = list(produtos[:ITENS_POR_PAGINA + 1])
+        if len(itens) > ITENS_POR_PAGINA:
+            proximo = itens[ITENS_POR_PAGINA - 1].id
+            itens = itens[:ITENS_POR_PAGINA]
+
+        ids = [produto.id for produto in itens]
+        saldos = dict(Estoque.objects.filter(local_id=local_id, product_id__in=ids).values_list('product_id', 'quantidade'))
+        parametros = {
+            parametro.product_id: parametro
+            for parametro in ParametroEstoque.objects.filter(local_id=local_id, product_id__in=ids)
+        }
+        for produto in itens:
+            parametro = parametros.get(produto.id)
+            produto.saldo = saldos.get(produto.id, 0)
+            produto.minimo = parametro.minimo if parametro else None
+            produto.maximo = parametro.maximo if parametro else None
+
+    filtros = request.GET.copy()
+    filtros.pop('apos', None)
+
+    return render(request, 'estoque/parametros.html', {
+        'produtos': itens,
+        'proximo': proximo,
+        'filtros': filtros.urlencode(),
+        'local_id': local_id,
+        'locais': referencias.obter('armazens_ativos'),
+    })
@@ -1,6 +1,7 @@
 from django.contrib.messages import constants as messages
 from pathlib import Path
 import os
+import tempfile
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -119,3 +120,15 @@ MESSAGE_TAGS = {
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+# Cache em arquivo: compartilhado entre os workers do mesmo servidor, então a
+# invalidação feita por um deles vale para todos (listas de referência)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'almoxarifado-cache'),
+    }
+}
+
+# Horas que um arquivo de exportação de estoque fica disponível para download
+EXPORTACAO_RETENCAO_HORAS = 24
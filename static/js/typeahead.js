@@ -0,0 +1,138 @@
+// Campos de busca (typeahead) ligados a /sugestoes/<fonte>/.
+//
+// Marcação esperada:
+//   <div class="typeahead" data-url="{% url 'sugestoes' 'produtos' %}">
+//     <input type="text" class="form-control typeahead-busca" autocomplete="off" required>
+//     <input type="hidden" name="produto" class="typeahead-valor">
+//     <div class="typeahead-lista list-group"></div>
+//   </div>
+//
+// Os eventos são delegados ao document, então linhas clonadas ou criadas depois do
+// carregamento da página funcionam sem inicialização. Ao escolher um item, o input
+// escondido recebe o id e dispara "change".
+(function () {
+    const ESPERA_MS = 250;
+
+    function listar(container, apos) {
+        const busca = container.querySelector('.typeahead-busca');
+        const lista = container.querySelector('.typeahead-lista');
+        const params = new URLSearchParams({ q: busca.value });
+        if (apos) {
+            params.set('apos', apos);
+        }
+
+        // Descarta respostas de consultas que já foram substituídas por outra tecla
+        const consulta = String(Number(container.dataset.consulta || 0) + 1);
+        container.dataset.consulta = consulta;
+
+        fetch(`${container.dataset.url}?${params}`)
+            .then(response => response.json())
+            .then(data => {
+                if (container.dataset.consulta !== consulta) {
+                    return;
+                }
+                if (!apos) {
+                    lista.innerHTML = '';
+                }
+                const anterior = lista.querySelector('.typeahead-mais');
+                if (anterior) {
+                    anterior.remove();
+                }
+
+                data.itens.forEach(item => {
+                    const opcao = document.createElement('button');
+                    opcao.type = 'button';
+                    opcao.className = 'list-group-item list-group-item-action typeahead-opcao';
+                    opcao.dataset.id = item.id;
+                    opcao.textContent = item.nome;
+                    lista.appendChild(opcao);
+                });
+
+                if (data.proximo) {
+                    const mais = document.createElement('button');
+                    mais.type = 'button';
+                    mais.className = 'list-group-item list-group-item-action text-muted typeahead-mais';
+                    mais.dataset.apos = data.proximo;
+                    mais.textContent = 'Carregar mais...';
+                    lista.appendChild(mais);
+                } else if (!lista.children.length) {
+                    lista.innerHTML = '<span class="list-group-item text-muted">Nenhum resultado.</span>';
+                }
+                lista.style.display = 'block';
+            })
+            .catch(error => console.error('Erro ao buscar sugestões:', error));
+    }
+
+    function fecharListas(exceto) {
+        document.querySelectorAll('.typeahead-lista').forEach(lista => {
+            if (lista.parentElement !== exceto) {
+                lista.style.display = 'none';
+            }
+        });
+    }
+
+    // Limpa os campos de um trecho clonado (ex.: "+ Adicionar Produto")
+    window.limparTypeahead = function (elemento) {
+        elemento.querySelectorAll('.typeahead').forEach(container => {
+            container.querySelector('.typeahead-busca').value = '';
+            container.querySelector('.typeahead-busca').setCustomValidity('');
+            container.querySelector('.typeahead-valor').value = '';
+            container.querySelector('.typeahead-lista').innerHTML = '';
+            container.querySelector('.typeahead-lista').style.display = 'none';
+        });
+    };
+
+    document.addEventListener('input', function (event) {
+        if (!event.target.classList.contains('typeahead-busca')) {
+            return;
+        }
+        const container = event.target.closest('.typeahead');
+        const valor = container.querySelector('.typeahead-valor');
+        if (valor.value) {
+            valor.value = '';
+            valor.dispatchEvent(new Event('change', { bubbles: true }));
+        }
+        event.target.setCustomValidity(event.target.required || event.target.value ? 'Selecione um item da lista.' : '');
+
+        clearTimeout(container.espera);
+        container.espera = setTimeout(() => listar(container), ESPERA_MS);
+    });
+
+    document.addEventListener('focusin', function (event) {
+        if (!event.target.classList.contains('typeahead-busca')) {
+            return;
+        }
+        const container = event.target.closest('.typeahead');
+        fecharListas(container);
+        if (!container.querySelector('.typeahead-lista').children.length) {
+            listar(container);
+        } else {
+            container.querySelector('.typeahead-lista').style.display = 'block';
+        }
+    });
+
+    document.addEventListener('click', function (event) {
+        const container = event.target.closest('.typeahead');
+        fecharListas(container);
+        if (!container) {
+            return;
+        }
+
+        const mais = event.target.closest('.typeahead-mais');
+        if (mais) {
+            listar(container, mais.dataset.apos);
+            return;
+        }
+
+        const opcao = event.target.closest('.typeahead-opcao');
+        if (opcao) {
+            const busca = container.querySelector('.typeahead-busca');
+            const valor = container.querySelector('.typeahead-valor');
+            busca.value = opcao.textContent;
+            busca.setCustomValidity('');
+            valor.value = opcao.dataset.id;
+            valor.dispatchEvent(new Event('change', { bubbles: true }));
+            container.querySelector('.typeahead-lista').style.display = 'none';
+        }
+    });
+})();
@@ -27,6 +27,10 @@ class RequestAdmin(admin.ModelAdmin):
     readonly_fields = ('status',)
     inlines = [RequestProductInline]
 
+    def get_queryset(self, request):
+        # O admin também mostra as solicitações excluídas
+        return Request.todas.all()
+
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
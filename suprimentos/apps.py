@@ -4,3 +4,6 @@ class suprimentosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'suprimentos'
     verbose_name = 'Enquetes'
+
+    def ready(self):
+        from . import signals
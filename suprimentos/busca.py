@@ -0,0 +1,50 @@
+from django.db.models import BooleanField, CharField, FloatField, Func, Q, Value
+from django.db.models.lookups import Contains
+from django.db import connection
+import unicodedata
+
+# No Postgres a busca por nome usa pg_trgm sobre f_unaccent(lower(nome)), coberta pelos
+# índices GIN criados na migração 0022_busca_trigramas. Nos demais bancos (SQLite dos
+# testes) continua sendo um icontains simples.
+
+def usa_trigramas():
+    return connection.vendor == 'postgresql'
+
+def normalizar(texto):
+    # "Luva Nitrílica " -> "luva nitrilica" (mesma regra do f_unaccent(lower()) do banco)
+    texto = unicodedata.normalize('NFKD', texto.strip().lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+class NomeNormalizado(Func):
+    # Precisa ser idêntica à expressão dos índices para que o planner os use
+    template = 'f_unaccent(lower(%(expressions)s))'
+    output_field = CharField()
+
+class Semelhante(Func):
+    # termo <% nome: word_similarity acima de pg_trgm.word_similarity_threshold (tolera erros de digitação)
+    template = '%(expressions)s'
+    arg_joiner = ' <%% '
+    output_field = BooleanField()
+
+class Similaridade(Func):
+    # word_similarity devolve real (float4); o cursor "relevância|id" volta como parâmetro
+    # float8 e a igualdade com o float4 falharia nos empates. Em double precision, o valor
+    # lido e o comparado na página seguinte são o mesmo.
+    function = 'word_similarity'
+    template = '%(function)s(%(expressions)s)::double precision'
+    output_field = FloatField()
+
+def filtro_nome(campo, termo):
+    # Q que casa `campo` com o termo buscado ignorando acentos, caixa e pequenos erros
+    if not usa_trigramas():
+        return Q(**{f'{campo}__icontains': termo})
+
+    normalizado = normalizar(termo)
+    expressao = NomeNormalizado(campo)
+    return Q(Contains(expressao, normalizado)) | Q(Semelhante(Value(normalizado), expressao))
+
+def relevancia(campo, termo):
+    # Expressão para ordenar os resultados pela semelhança com o termo (None fora do Postgres)
+    if not usa_trigramas():
+        return None
+    return Similaridade(Value(normalizar(termo)), NomeNormalizado(campo))
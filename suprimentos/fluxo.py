@@ -0,0 +1,59 @@
+from .models import Request, StatusSolicitacao
+from django.db import transaction
+
+# Fluxo das solicitações de compra: cada ação leva de um conjunto de status de origem a
+# um status de destino. Views individuais e em lote passam por `transicionar`, que move
+# só as solicitações cujo status atual permite a ação, num único UPDATE.
+
+# ação: (status de origem permitidos, status de destino, campos limpos na transição)
+TRANSICOES = {
+    'publicar': ({StatusSolicitacao.CRIADA, StatusSolicitacao.REVISAO_SOLICITADA}, StatusSolicitacao.ESPERANDO_COTACAO, {}),
+    'excluir': ({StatusSolicitacao.CRIADA, StatusSolicitacao.REVISAO_SOLICITADA}, StatusSolicitacao.EXCLUIDA, {}),
+    'revisar': ({StatusSolicitacao.ESPERANDO_COTACAO}, StatusSolicitacao.REVISAO_SOLICITADA, {}),
+    'avaliar': ({StatusSolicitacao.ESPERANDO_COTACAO}, StatusSolicitacao.AGUARDANDO_AVALIACAO, {'comment': None}),
+    'aprovar': ({StatusSolicitacao.AGUARDANDO_AVALIACAO, StatusSolicitacao.STANDBY}, StatusSolicitacao.APROVADA, {}),
+    'desaprovar': ({StatusSolicitacao.AGUARDANDO_AVALIACAO, StatusSolicitacao.STANDBY}, StatusSolicitacao.DESAPROVADA, {}),
+    'standby': ({StatusSolicitacao.AGUARDANDO_AVALIACAO}, StatusSolicitacao.STANDBY, {}),
+}
+
+class TransicaoInvalida(ValueError):
+    pass
+
+def status_de(valor):
+    # Aceita o código ("5") ou o nome ("Aprovada", sem diferenciar maiúsculas)
+    valor = (valor or '').strip()
+    if valor.isdigit() and int(valor) in StatusSolicitacao.values:
+        return StatusSolicitacao(int(valor))
+    for status in StatusSolicitacao:
+        if status.label.casefold() == valor.casefold():
+            return status
+    raise TransicaoInvalida(valor)
+
+def acao_para(status):
+    # Ação que leva ao status informado (para quem recebe o status de destino)
+    for acao, (_, destino, _) in TRANSICOES.items():
+        if destino == status:
+            return acao
+    raise TransicaoInvalida(status)
+
+@transaction.atomic
+def transicionar(acao, ids, **campos):
+    # Devolve (movidas, rejeitadas). Rejeitadas são as que não existem ou cujo status
+    # atual não permite a ação; `campos` são gravados junto (ex.: comentário da revisão).
+    if acao not in TRANSICOES:
+        raise TransicaoInvalida(acao)
+    origens, destino, limpar = TRANSICOES[acao]
+
+    ids = sorted(set(ids))
+    # Trava as linhas elegíveis para que uma ação concorrente não as mova no meio do caminho
+    movidas = list(
+        Request.objects.select_for_update()
+        .filter(id__in=ids, status__in=origens)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+    if movidas:
+        Request.objects.filter(id__in=movidas, status__in=origens).update(status=destino, **{**limpar, **campos})
+
+    elegiveis = set(movidas)
+    return movidas, [pk for pk in ids if pk not in elegiveis]
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from suprimentos.referencias import aquecer
+
+class Command(BaseCommand):
+    help = "Carrega no cache as listas de referência (armazéns, funcionários, unidades). Rodar após o deploy."
+
+    def handle(self, *args, **options):
+        nomes = aquecer()
+        self.stdout.write(self.style.SUCCESS(f"{len(nomes)} lista(s) carregada(s): {', '.join(nomes)}."))
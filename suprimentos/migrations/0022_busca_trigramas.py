@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-18 21:05
+
+from django.db import migrations
+
+
+# f_unaccent: unaccent() é STABLE e não pode ser usado em índice; o wrapper IMMUTABLE pode
+CRIAR = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent', $1) $$
+    """,
+    "CREATE INDEX IF NOT EXISTS product_nome_trgm_idx ON suprimentos_product USING gin (f_unaccent(lower(product_name)) gin_trgm_ops)",
+]
+
+REMOVER = [
+    "DROP INDEX IF EXISTS product_nome_trgm_idx",
+    "DROP FUNCTION IF EXISTS f_unaccent(text)",
+]
+
+
+def criar_indices(apps, schema_editor):
+    # Só no Postgres; no SQLite a busca continua com icontains
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in CRIAR:
+        schema_editor.execute(sql)
+
+
+def remover_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in REMOVER:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suprimentos', '0021_alter_request_created_by'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indices, remover_indices),
+    ]
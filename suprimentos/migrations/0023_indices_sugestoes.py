@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-18 22:10
+
+from django.db import migrations
+
+
+# Trigramas para a busca do typeahead e btree (nome, id) para a listagem alfabética
+# paginada por cursor quando nada foi digitado. f_unaccent vem da 0022.
+CRIAR = [
+    "CREATE INDEX IF NOT EXISTS funcionario_nome_trgm_idx ON suprimentos_funcionario USING gin (f_unaccent(lower(nome_completo)) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS centrocusto_nome_trgm_idx ON suprimentos_centrocusto USING gin (f_unaccent(lower(name)) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS product_nome_ativo_idx ON suprimentos_product (product_name, id) WHERE status",
+    "CREATE INDEX IF NOT EXISTS funcionario_nome_ativo_idx ON suprimentos_funcionario (nome_completo, id) WHERE status",
+    "CREATE INDEX IF NOT EXISTS centrocusto_nome_ativo_idx ON suprimentos_centrocusto (name, id) WHERE status",
+]
+
+REMOVER = [
+    "DROP INDEX IF EXISTS funcionario_nome_trgm_idx",
+    "DROP INDEX IF EXISTS centrocusto_nome_trgm_idx",
+    "DROP INDEX IF EXISTS product_nome_ativo_idx",
+    "DROP INDEX IF EXISTS funcionario_nome_ativo_idx",
+    "DROP INDEX IF EXISTS centrocusto_nome_ativo_idx",
+]
+
+
+def criar_indices(apps, schema_editor):
+    # Só no Postgres, como na 0022
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in CRIAR:
+        schema_editor.execute(sql)
+
+
+def remover_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in REMOVER:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suprimentos', '0022_busca_trigramas'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indices, remover_indices),
+    ]
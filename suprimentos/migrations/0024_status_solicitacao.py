@@ -0,0 +1,84 @@
+# Generated by Django 5.2 on 2026-10-19 01:05
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Grafias encontradas em Request.status (sem acento, minúsculas) -> código novo
+CODIGOS = {
+    'criada': 1,
+    'revisao solicitada': 2,
+    'revisao': 2,
+    'esperando cotacao': 3,
+    'aguardando avaliacao': 4,
+    'aguardando aprovacao': 4,
+    'aprovada': 5,
+    'desaprovada': 6,
+    'standby': 7,
+    'em standby': 7,
+    'excluida': 8,
+}
+
+# Código -> texto gravado pelo código anterior, para desfazer a migração
+TEXTOS = {
+    1: 'Criada',
+    2: 'Revisão Solicitada',
+    3: 'esperando cotação',
+    4: 'Aguardando avaliação',
+    5: 'Aprovada',
+    6: 'Desaprovada',
+    7: 'Standby',
+    8: 'excluida',
+}
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return ' '.join(texto.casefold().split())
+
+
+def converter_status(apps, schema_editor):
+    # Um UPDATE por grafia distinta; grafias desconhecidas voltam para "Criada" (1)
+    Request = apps.get_model('suprimentos', 'Request')
+    for texto in Request.objects.values_list('status', flat=True).distinct():
+        Request.objects.filter(status=texto).update(status_codigo=CODIGOS.get(_normalizar(texto), 1))
+
+
+def restaurar_status(apps, schema_editor):
+    Request = apps.get_model('suprimentos', 'Request')
+    for codigo, texto in TEXTOS.items():
+        Request.objects.filter(status_codigo=codigo).update(status=texto)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suprimentos', '0023_indices_sugestoes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='request',
+            name='status_codigo',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Criada'), (2, 'Revisão Solicitada'), (3, 'Esperando cotação'), (4, 'Aguardando avaliação'), (5, 'Aprovada'), (6, 'Desaprovada'), (7, 'Standby'), (8, 'Excluída')], default=1),
+        ),
+        migrations.RunPython(converter_status, restaurar_status),
+        migrations.RemoveField(
+            model_name='request',
+            name='status',
+        ),
+        migrations.RenameField(
+            model_name='request',
+            old_name='status_codigo',
+            new_name='status',
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(condition=models.Q(('status', 8), _negated=True), fields=['status', 'id'], name='request_ativa_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(condition=models.Q(('status', 8), _negated=True), fields=['created_by', 'id'], name='request_ativa_autor_idx'),
+        ),
+    ]
@@ -31,13 +31,30 @@ class Product(models.Model):
         return self.product_name  # Apenas o nome do produto
 
 
+# Status das solicitações de compra (transições em suprimentos/fluxo.py)
+class StatusSolicitacao(models.IntegerChoices):
+    CRIADA = 1, 'Criada'
+    REVISAO_SOLICITADA = 2, 'Revisão Solicitada'
+    ESPERANDO_COTACAO = 3, 'Esperando cotação'
+    AGUARDANDO_AVALIACAO = 4, 'Aguardando avaliação'
+    APROVADA = 5, 'Aprovada'
+    DESAPROVADA = 6, 'Desaprovada'
+    STANDBY = 7, 'Standby'
+    EXCLUIDA = 8, 'Excluída'
+
+# Gerenciador padrão: deixa de fora as solicitações excluídas (exclusão lógica), com o
+# mesmo predicado dos índices parciais de Request
+class SolicitacaoManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().exclude(status=StatusSolicitacao.EXCLUIDA)
+
 # Modelo de Solicitação (Request)
 class Request(models.Model):
     id = models.AutoField(primary_key=True)
     request_text = models.TextField()
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, default=User.objects.first)
     pub_date = models.DateTimeField(default=now)
-    status = models.CharField(max_length=50, default="Criada")
+    status = models.PositiveSmallIntegerField(choices=StatusSolicitacao.choices, default=StatusSolicitacao.CRIADA)
     comment = models.TextField(blank=True, null=True)
     
     company = models.CharField(max_length=255, blank=True, null=True)
@@ -45,8 +62,18 @@ class Request(models.Model):
     cost_center = models.CharField(max_length=255, blank=True, null=True)
     financial_plan = models.CharField(max_length=255, blank=True, null=True)
 
+    objects = SolicitacaoManager()
+    todas = models.Manager()  # Inclui as excluídas (admin)
+
+    class Meta:
+        indexes = [
+            # Listas por status (compras, gestor) e por solicitante, sem as excluídas
+            models.Index(fields=['status', 'id'], condition=~models.Q(status=StatusSolicitacao.EXCLUIDA), name='request_ativa_status_idx'),
+            models.Index(fields=['created_by', 'id'], condition=~models.Q(status=StatusSolicitacao.EXCLUIDA), name='request_ativa_autor_idx'),
+        ]
+
     def __str__(self):
-        return f"Request {self.id} - {self.status}"
+        return f"Request {self.id} - {self.get_status_display()}"
 
 # Modelo que liga a solicitação ao produto
 class RequestProduct(models.Model):
@@ -0,0 +1,57 @@
+from .models import Product, Armazem
+from django.core.cache import cache
+from django.db import transaction
+
+# Listas de cadastro que mudam pouco e aparecem em quase toda página (armazéns,
+# unidades de medida). Ficam no cache do Django e são invalidadas pelos sinais de
+# post_save/post_delete dos modelos de origem (suprimentos/signals.py); TEMPO_CACHE é
+# só uma rede de segurança. Funcionários, produtos e centros de custo não entram aqui:
+# são escolhidos pelo typeahead (sugestoes.py).
+
+PREFIXO = 'referencias:'
+TEMPO_CACHE = 60 * 60
+
+# nome -> (função que carrega a lista, modelos que a invalidam)
+REFERENCIAS = {}
+
+def referencia(nome, *modelos):
+    def registrar(carregar):
+        REFERENCIAS[nome] = (carregar, modelos)
+        return carregar
+    return registrar
+
+@referencia('armazens', Armazem)
+def _armazens():
+    return list(Armazem.objects.order_by('name').values('id', 'name'))
+
+@referencia('armazens_ativos', Armazem)
+def _armazens_ativos():
+    return list(Armazem.objects.filter(status=True).order_by('name').values('id', 'name'))
+
+@referencia('unidades_medida', Product)
+def _unidades_medida():
+    return list(Product.objects.order_by('unidade_medida').values_list('unidade_medida', flat=True).distinct())
+
+def obter(nome):
+    carregar, _ = REFERENCIAS[nome]
+    return cache.get_or_set(PREFIXO + nome, carregar, TEMPO_CACHE)
+
+def em_cache(nome):
+    # Valor atual sem carregar do banco (None quando não está no cache)
+    return cache.get(PREFIXO + nome)
+
+def invalidar(*nomes):
+    # Só depois do commit: antes disso outra requisição recarregaria os dados antigos
+    chaves = [PREFIXO + nome for nome in nomes]
+    transaction.on_commit(lambda: cache.delete_many(chaves))
+
+def invalidar_modelo(modelo):
+    nomes = [nome for nome, (_, modelos) in REFERENCIAS.items() if modelo in modelos]
+    if nomes:
+        invalidar(*nomes)
+
+def aquecer():
+    # Recarrega todas as listas (manage.py aquecer_referencias, após o deploy)
+    for nome, (carregar, _) in REFERENCIAS.items():
+        cache.set(PREFIXO + nome, carregar(), TEMPO_CACHE)
+    return list(REFERENCIAS)
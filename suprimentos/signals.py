@@ -0,0 +1,11 @@
+from .models import Product, Armazem
+from .referencias import invalidar_modelo
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+# Cadastros alterados (inclusive pelos toggle_*_status, que salvam o objeto) tiram do
+# cache as listas de referência montadas a partir deles
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Armazem)
+def invalidar_referencias(sender, **kwargs):
+    invalidar_modelo(sender)
@@ -0,0 +1,72 @@
+from .models import Product, Request, RequestProduct, StatusSolicitacao
+from django.db import transaction
+from django.utils import timezone
+import re
+
+# Criação de solicitações de compra com todas as linhas de uma vez. Os pares
+# product_N/quantity_N do POST são lidos numa única passada, os produtos validados com
+# um único in_bulk e as linhas gravadas com um bulk_create junto da solicitação, numa
+# transação: três consultas, qualquer que seja o número de linhas.
+
+CAMPO_LINHA = re.compile(r'^(product|quantity)_(\d+)$')
+
+class LinhasInvalidas(ValueError):
+    # `erros`: lista de {'linha', 'campo', 'erro'}, na ordem das linhas do formulário
+    def __init__(self, erros):
+        super().__init__(erros)
+        self.erros = erros
+
+def ler_linhas(dados):
+    # [(número da linha, produto, quantidade)] ordenado pelo número; as linhas são
+    # numeradas pelo formulário, então pode haver buracos e a contagem de campos não serve
+    linhas = {}
+    for chave, valor in dados.items():
+        campo = CAMPO_LINHA.match(chave)
+        if campo:
+            linhas.setdefault(int(campo.group(2)), {})[campo.group(1)] = (valor or '').strip()
+    return [
+        (numero, linhas[numero].get('product', ''), linhas[numero].get('quantity', ''))
+        for numero in sorted(linhas)
+    ]
+
+def validar_linhas(linhas):
+    # Devolve [(linha, product_id, quantidade)] ou levanta LinhasInvalidas com todos os erros
+    erros, itens = [], []
+    for numero, produto, quantidade in linhas:
+        if not produto and not quantidade:
+            continue  # Linha adicionada e deixada em branco
+        erros_antes = len(erros)
+        if not produto.isdigit():
+            erros.append({'linha': numero, 'campo': 'product', 'erro': 'Selecione um produto da lista.' if not produto else 'Produto inválido.'})
+        if not quantidade.isdigit() or int(quantidade) < 1:
+            erros.append({'linha': numero, 'campo': 'quantity', 'erro': 'A quantidade deve ser um número inteiro maior que zero.'})
+        if len(erros) == erros_antes:
+            itens.append((numero, int(produto), int(quantidade)))
+
+    if not itens and not erros:
+        raise LinhasInvalidas([{'linha': None, 'campo': 'product', 'erro': 'Adicione pelo menos um produto.'}])
+
+    existentes = Product.objects.only('id').in_bulk({produto for _, produto, _ in itens})
+    erros.extend(
+        {'linha': numero, 'campo': 'product', 'erro': f'Produto com ID {produto} não encontrado.'}
+        for numero, produto, _ in itens if produto not in existentes
+    )
+    if erros:
+        raise LinhasInvalidas(sorted(erros, key=lambda erro: erro['linha']))
+    return itens
+
+def criar_solicitacao(usuario, dados, **campos):
+    # `dados`: o POST do formulário; `campos`: demais campos da solicitação (texto, empresa...)
+    itens = validar_linhas(ler_linhas(dados))
+    with transaction.atomic():
+        solicitacao = Request.objects.create(
+            created_by=usuario,
+            pub_date=timezone.now(),
+            status=StatusSolicitacao.CRIADA,
+            **campos,
+        )
+        RequestProduct.objects.bulk_create([
+            RequestProduct(request=solicitacao, product_id=produto, quantity=quantidade)
+            for _, produto, quantidade in itens
+        ])
+    return solicitacao
@@ -0,0 +1,57 @@
+from .models import Product, Funcionario, CentroCusto
+from .busca import filtro_nome, relevancia
+from django.db.models import F, Q
+
+# Sugestões para os campos de busca (typeahead) dos formulários: em vez de trazer a
+# tabela inteira para a página, cada tecla consulta no máximo uma página de resultados.
+
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 50
+
+# fonte -> (queryset dos ativos, campo do nome, campos extras devolvidos)
+FONTES = {
+    'produtos': (lambda: Product.objects.filter(status=True), 'product_name', ('unidade_medida',)),
+    'funcionarios': (lambda: Funcionario.objects.filter(status=True), 'nome_completo', ('cargo',)),
+    'centros-custo': (lambda: CentroCusto.objects.filter(status=True), 'name', ()),
+}
+
+def sugerir(fonte, termo='', apos='', limite=LIMITE_PADRAO):
+    # Retorna (itens, proximo_cursor). Sem termo, ordem alfabética com cursor "nome|id";
+    # com termo no Postgres, os mais parecidos primeiro com cursor "relevância|id".
+    consulta, campo, extras = FONTES[fonte]
+    queryset = consulta().annotate(nome=F(campo))
+    termo = termo.strip()
+
+    expressao = None
+    if termo:
+        queryset = queryset.filter(filtro_nome(campo, termo))
+        expressao = relevancia(campo, termo)
+
+    try:
+        valor, ultimo_id = apos.rsplit('|', 1)
+        ultimo_id = int(ultimo_id)
+        if expressao is not None:
+            valor = float(valor)
+    except ValueError:
+        valor = None
+
+    if expressao is None:
+        queryset = queryset.order_by(campo, 'id')
+        if valor is not None:
+            queryset = queryset.filter(Q(**{f'{campo}__gt': valor}) | Q(**{campo: valor, 'id__gt': ultimo_id}))
+    else:
+        queryset = queryset.annotate(relevancia=expressao).order_by('-relevancia', 'id')
+        if valor is not None:
+            queryset = queryset.filter(Q(relevancia__lt=valor) | Q(relevancia=valor, id__gt=ultimo_id))
+
+    colunas = ['id', 'nome', *extras] + (['relevancia'] if expressao is not None else [])
+    itens = list(queryset.values(*colunas)[:limite + 1])
+
+    proximo = None
+    if len(itens) > limite:
+        ultimo = itens[limite - 1]
+        proximo = f"{ultimo['nome']}|{ultimo['id']}" if expressao is None else f"{ultimo['relevancia']!r}|{ultimo['id']}"
+    itens = itens[:limite]
+    for item in itens:
+        item.pop('relevancia', None)
+    return itens, proximo
@@ -1,3 +1,69 @@
+from django.contrib.auth.models import Group
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.forms import User
+from suprimentos.models import Product, Request, StatusSolicitacao
+from suprimentos.sugestoes import sugerir
+
+
+class PaginacaoSugestoesTests(TestCase):
+    # Nomes iguais empatam tanto na ordem alfabética quanto na relevância (Postgres);
+    # o "carregar mais" do typeahead não pode pular nem repetir sugestões empatadas.
+
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create([
+            Product(product_name='Luva Nitrílica', unidade_medida='par')
+            for _ in range(47)
+        ])
+        cls.esperados = sorted(Product.objects.values_list('id', flat=True))
+
+    def paginar(self, termo):
+        vistos, apos, paginas = [], '', 0
+        while True:
+            itens, apos = sugerir('produtos', termo, apos or '', limite=20)
+            vistos += [item['id'] for item in itens]
+            paginas += 1
+            if not apos:
+                return vistos, paginas
+
+    def test_empates_com_termo(self):
+        vistos, paginas = self.paginar('luva')
+        self.assertEqual(paginas, 3)
+        self.assertEqual(len(vistos), len(set(vistos)))
+        self.assertEqual(sorted(vistos), self.esperados)
+
+    def test_empates_sem_termo(self):
+        vistos, paginas = self.paginar('')
+        self.assertEqual(paginas, 3)
+        self.assertEqual(vistos, self.esperados)
+
+
+class TransicaoEmLoteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.gestor = User.objects.create_user(username='gestor', password='x')
+        cls.gestor.groups.add(Group.objects.create(name='admin'))
+        cls.comprador = User.objects.create_user(username='comprador', password='x')
+        cls.ids = [
+            Request.objects.create(request_text=f'Pedido {i}', created_by=cls.comprador, status=StatusSolicitacao.AGUARDANDO_AVALIACAO).id
+            for i in range(3)
+        ]
+
+    def transicionar(self, usuario):
+        self.client.force_login(usuario)
+        return self.client.post(
+            reverse('transicao_solicitacoes') + '?formato=json', {'acao': 'aprovar', 'ids[]': self.ids},
+        )
+
+    def test_fora_do_grupo_admin_nao_altera(self):
+        resposta = self.transicionar(self.comprador)
+        self.assertEqual(resposta.status_code, 403)
+        self.assertFalse(Request.objects.filter(status=StatusSolicitacao.APROVADA).exists())
+
+    def test_admin_altera_todas(self):
+        resposta = self.transicionar(self.gestor)
+        self.assertEqual(resposta.json()['movidas'], self.ids)
+        self.assertEqual(Request.objects.filter(status=StatusSolicitacao.APROVADA).count(), 3)
@@ -16,8 +16,8 @@ urlpatterns = [
     path('get_request_products/<int:request_id>/', views.get_request_products, name='get_request_products'),
     path('products/edit/<int:product_id>/', views.edit_product, name='edit_product'),
     path('produto/criar/', views.ProductCreateView.as_view(), name='produto_criar'),
-    path('get-products/', views.get_products, name='get_products'),
     path('products/', views.product_list, name='product_list'),
+    path('sugestoes/<str:fonte>/', views.sugestoes, name='sugestoes'),
 
     # Solicitações
     path('update-request-status/', views.update_request_status, name='update_request_status'),
@@ -31,6 +31,7 @@ urlpatterns = [
     path("request/approve/<int:request_id>/", views.request_approve, name="request_approve"),
     path("request/standby/<int:request_id>/", views.request_standby, name="request_standby"),
     path('request/delete/<int:request_id>/', views.request_delete, name='request_delete'),
+    path('request/transicao/', views.transicao_solicitacoes, name='transicao_solicitacoes'),
 
     # Cotações
     path('get_quotations/<int:request_id>/', views.get_quotations, name='get_quotations'),
@@ -1,12 +1,16 @@
-from .models import Request, Product, RequestProduct, RequestFile, Quotation, CentroCusto, PlanoFinanceiro, Armazem, Funcionario
+from .models import Request, StatusSolicitacao, Product, RequestProduct, RequestFile, Quotation, CentroCusto, PlanoFinanceiro, Armazem, Funcionario
 from .forms import RequestForm, ProductForm, CentroCustoForm, PlanoFinanceiroForm, ArmazemForm, FuncionarioForm
+from .sugestoes import FONTES, LIMITE_MAXIMO, LIMITE_PADRAO, sugerir
+from .solicitacoes import LinhasInvalidas, criar_solicitacao
+from . import fluxo, referencias
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic.edit import CreateView, UpdateView
-from django.db.models import Exists, OuterRef, Prefetch, Q
+from django.db.models import Count, Exists, F, OuterRef, Prefetch
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
+from django.db import transaction
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.utils import timezone
@@ -20,31 +24,17 @@ class RequestCreateView(LoginRequiredMixin, CreateView):
     template_name = 'suprimentos/forms/request_form.html'
 
     def form_valid(self, form):
-        form.instance.created_by = self.request.user
-        form.instance.status = 'Criada'
-        response = super().form_valid(form)
-
-        num_products = int(self.request.POST.get('num_products', 0))
-        for i in range(1, num_products + 1):
-            product_id = self.request.POST.get(f'product_{i}')
-            quantity = self.request.POST.get(f'quantity_{i}')
-
-            if product_id and quantity:
-                try:
-                    product = Product.objects.get(id=product_id)
-                    quantity = int(quantity)
-
-                    RequestProduct.objects.create(
-                        request=form.instance,
-                        product=product,
-                        quantity=quantity
-                    )
-                except Product.DoesNotExist:
-                    messages.error(self.request, f"Produto com ID {product_id} não encontrado.")
-                    return redirect('request_create')
+        try:
+            self.object = criar_solicitacao(
+                self.request.user, self.request.POST, request_text=form.cleaned_data['request_text'],
+            )
+        except LinhasInvalidas as e:
+            for erro in e.erros:
+                messages.error(self.request, f"Linha {erro['linha']}: {erro['erro']}" if erro['linha'] else erro['erro'])
+            return self.form_invalid(form)
 
         messages.success(self.request, 'Solicitação criada com sucesso!')
-        return response
+        return redirect(self.get_success_url())
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -73,7 +63,7 @@ class RequestUpdateView(LoginRequiredMixin, UpdateView):
 
     def dispatch(self, request, *args, **kwargs):
         request_obj = self.get_object()
-        if request_obj.status == 'esperando cotação':
+        if request_obj.status == StatusSolicitacao.ESPERANDO_COTACAO:
             messages.error(request, 'Solicitação não pode ser editada após estar esperando cotação.')
             return redirect('solicitante')
         return super().dispatch(request, *args, **kwargs)
@@ -96,65 +86,112 @@ class ProductCreateView(LoginRequiredMixin, CreateView):
         context['form_title'] = 'Criando um produto'
         return context
 
-@login_required
-def all_requests(request):
-    user_groups = request.user.groups.values_list('name', flat=True)
+# Listas de solicitações: página por cursor de id, como as listas do estoque
+ITENS_POR_PAGINA = 50
+ORDENS_SOLICITACOES = {'recentes': '-id', 'antigas': 'id'}
+
+# Status exibidos em cada lista (as abas aparecem nesta ordem)
+STATUS_COMPRAS = [
+    StatusSolicitacao.ESPERANDO_COTACAO,
+    StatusSolicitacao.AGUARDANDO_AVALIACAO,
+    StatusSolicitacao.APROVADA,
+    StatusSolicitacao.DESAPROVADA,
+    StatusSolicitacao.STANDBY,
+]
+STATUS_GESTOR = [
+    StatusSolicitacao.AGUARDANDO_AVALIACAO,
+    StatusSolicitacao.STANDBY,
+    StatusSolicitacao.APROVADA,
+    StatusSolicitacao.DESAPROVADA,
+]
+
+def _pagina_solicitacoes(request, solicitacoes, status_das_abas):
+    # Busca, aba de status, ordem e cursor comuns às três listas. As contagens das abas
+    # vêm de uma única consulta (GROUP BY status) sobre a lista já filtrada pela busca.
+    search = request.GET.get('search', '').strip()
+    if search:
+        solicitacoes = solicitacoes.filter(request_text__icontains=search)
+
+    totais = dict(solicitacoes.order_by().values_list('status').annotate(total=Count('id')))
+    abas = [{'status': status, 'nome': status.label, 'total': totais.get(status, 0)} for status in status_das_abas]
+
+    status = request.GET.get('status', '')
+    if status.isdigit():
+        solicitacoes = solicitacoes.filter(status=status)
+
+    ordem = request.GET.get('ordem', '')
+    if ordem not in ORDENS_SOLICITACOES:
+        ordem = 'recentes'
+    apos = request.GET.get('apos', '')
+    if apos.isdigit():
+        solicitacoes = solicitacoes.filter(**{'id__lt' if ordem == 'recentes' else 'id__gt': apos})
+
+    itens = list(solicitacoes.select_related('created_by').order_by(ORDENS_SOLICITACOES[ordem])[:ITENS_POR_PAGINA + 1])
+    proximo = itens[ITENS_POR_PAGINA - 1].id if len(itens) > ITENS_POR_PAGINA else None
+
+    filtros = request.GET.copy()
+    filtros.pop('apos', None)
+    filtros_abas = filtros.copy()
+    filtros_abas.pop('status', None)
+
+    return {
+        'all_requests': itens[:ITENS_POR_PAGINA],
+        'proximo': proximo,
+        'abas': abas,
+        'total_abas': sum(aba['total'] for aba in abas),
+        'status_atual': int(status) if status.isdigit() else None,
+        'ordem': ordem,
+        'filtros': filtros.urlencode(),
+        'filtros_abas': filtros_abas.urlencode(),
+        'status': StatusSolicitacao,
+    }
 
-    # Obtendo todas as requests com status específico
-    requests = Request.objects.filter(
-        Q(status="esperando cotação") | 
-        Q(status="Standby") | 
-        Q(status="Desaprovada") | 
-        Q(status="Aprovada") | 
-        Q(status="Aguardando avaliação")
-    ).annotate(
+def _com_cotacoes(solicitacoes):
+    return solicitacoes.annotate(
         has_quotation=Exists(Quotation.objects.filter(request_id=OuterRef('id')))
     ).prefetch_related(
         Prefetch('quotation_set', queryset=Quotation.objects.all(), to_attr='quotations')
     )
 
+@login_required
+def all_requests(request):
+    user_groups = request.user.groups.values_list('name', flat=True)
+
+    # Solicitações em cotação ou já avaliadas
+    requests = _com_cotacoes(Request.objects.filter(status__in=STATUS_COMPRAS))
+
     return render(request, 'suprimentos/all_requests.html', {
-        'all_requests': requests, 
+        **_pagina_solicitacoes(request, requests, STATUS_COMPRAS),
         'titulo': "Todas as Solicitações",
         'user_groups': user_groups,
     })
 
 @login_required
 def admin_requests(request):
-    user_groups = request.user.groups.values_list('name', flat=True)
+    user_groups = list(request.user.groups.values_list('name', flat=True))
 
-    # Verificar se o usuário tem o grupo 'admin' para acessar as cotações
-    is_admin = 'admin' in user_groups
+    # Só o grupo 'admin' vê esta página: para os demais nada é consultado
+    if 'admin' not in user_groups:
+        return render(request, 'suprimentos/admin_requests.html', {'user_groups': user_groups})
 
-    # Filtrando as solicitações com base no parâmetro 'titulo'
-    if request.GET.get('titulo') == "Todas as Compras":
-        requests = Request.objects.filter(status="esperando cotação")
-    else:
-        requests = Request.objects.all()
-
-    # Caso o usuário seja um admin, incluir as cotações
-    if is_admin:
-        requests = requests.annotate(
-            has_quotation=Exists(Quotation.objects.filter(request_id=OuterRef('id')))
-        ).prefetch_related(
-            Prefetch('quotation_set', queryset=Quotation.objects.all(), to_attr='quotations')
-        )
+    # Solicitações enviadas para avaliação do gestor (e as já avaliadas), com as cotações
+    requests = _com_cotacoes(Request.objects.filter(status__in=STATUS_GESTOR))
 
     return render(request, 'suprimentos/admin_requests.html', {
-        'all_requests': requests, 
+        **_pagina_solicitacoes(request, requests, STATUS_GESTOR),
         'titulo': "Admin", 
         'user_groups': user_groups,
     })
 
 @login_required
 def solicitante(request):
-    # Filtra as solicitações feitas pelo usuário logado
+    # Filtra as solicitações feitas pelo usuário logado (as excluídas ficam de fora)
     requests = Request.objects.filter(created_by=request.user)
     
     # Contexto para o template
     context = {
-        'all_requests': requests, 
-        'titulo': 'Minhas Solicitações'
+        **_pagina_solicitacoes(request, requests, [status for status in StatusSolicitacao if status != StatusSolicitacao.EXCLUIDA]),
+        'titulo': 'Minhas Solicitações',
     }
     
     # Renderiza a página com as solicitações filtradas
@@ -163,11 +200,9 @@ def solicitante(request):
 @login_required
 def request_create(request):
     if request.method == "GET":
-        # Buscar centros de custo para preencher o select no formulário
-        centros = CentroCusto.objects.all()
+        # Centros de custo e produtos são buscados pelo typeahead do formulário
         context = {
             "form_title": 'Solicitação de Compra',
-            "centros": centros  # Enviando os centros para o template
         }
         return render(request, "suprimentos/forms/request_form.html", context)
 
@@ -183,31 +218,17 @@ def request_create(request):
         except CentroCusto.DoesNotExist:
             return JsonResponse({"error": "Centro de custo inválido"}, status=400)
 
-        # Criação da nova solicitação
-        new_request = Request.objects.create(
-            request_text=request_text,
-            created_by=request.user,
-            pub_date=timezone.now(),
-            status='Criada',
-            cost_center=centro_custo,  # Salva o centro de custo
-            company=company  # Salva o valor do campo 'company'
-        )
-
-        # Inserção dos produtos associados à solicitação
-        for i in range(1, len(request.POST) // 2 + 1):
-            product_id = request.POST.get(f'product_{i}')
-            quantity = request.POST.get(f'quantity_{i}')
-
-            if product_id and quantity:
-                try:
-                    product = Product.objects.get(id=product_id)
-                    RequestProduct.objects.create(
-                        request=new_request,
-                        product=product,
-                        quantity=quantity
-                    )
-                except Product.DoesNotExist:
-                    continue  # Caso o produto não exista, simplesmente ignora
+        # Solicitação e linhas gravadas de uma vez; linhas inválidas voltam todas na resposta
+        try:
+            criar_solicitacao(
+                request.user,
+                request.POST,
+                request_text=request_text,
+                cost_center=centro_custo,  # Salva o centro de custo
+                company=company,  # Salva o valor do campo 'company'
+            )
+        except LinhasInvalidas as e:
+            return JsonResponse({"error": "Produtos inválidos na solicitação", "erros": e.erros}, status=400)
 
         return redirect('solicitante')  # Redireciona para a página de solicitações
 
@@ -225,121 +246,118 @@ def update_request_status(request):
     if not request_id or not new_status:
         return JsonResponse({"error": "ID da solicitação e novo status são obrigatórios"}, status=400)
 
+    # Só aceita status alcançáveis pelo fluxo (suprimentos/fluxo.py), pelo código ou pelo nome
     try:
-        request_obj = get_object_or_404(Request, id=request_id)
-        request_obj.status = new_status
-        request_obj.save()
+        novo = fluxo.status_de(new_status)
+        movidas, _ = fluxo.transicionar(fluxo.acao_para(novo), [int(request_id)])
+    except (fluxo.TransicaoInvalida, ValueError):
+        return JsonResponse({"error": f"Status inválido: {new_status}"}, status=400)
+    if not movidas:
+        return JsonResponse({"error": f"A solicitação {request_id} não pode passar para {novo.label}"}, status=400)
 
-        return JsonResponse({"message": f"Status da solicitação {request_id} atualizado para {new_status}"})
-    except Exception as e:
-        return JsonResponse({"error": str(e)}, status=500)
+    return JsonResponse({"message": f"Status da solicitação {request_id} atualizado para {novo.label}"})
+
+def _transicao_individual(request, acao, request_id, sucesso=None, **campos):
+    # Botões de uma solicitação só: mesma validação das ações em lote
+    movidas, _ = fluxo.transicionar(acao, [request_id], **campos)
+    if not movidas:
+        messages.error(request, 'A solicitação não pode ser alterada no status atual.')
+    elif sucesso:
+        messages.success(request, sucesso)
 
 @login_required
 def request_publish(request, request_id):
-    # Recupera a solicitação com o id fornecido
-    request_obj = get_object_or_404(Request, id=request_id)
-    
-    # Altera o status para "Esperando Cotação"
-    request_obj.status = "esperando cotação"
-    request_obj.save()
-
-    # Adiciona a mensagem de sucesso
-    messages.success(request, 'Solicitação enviada para cotação')
-    
-    # Redireciona para a página com todas as solicitações
+    # Envia para cotação ("Esperando cotação")
+    _transicao_individual(request, 'publicar', request_id, 'Solicitação enviada para cotação')
     return redirect('solicitante')
 
 @login_required
 def request_delete(request, request_id):
-    # Recupera a solicitação com o id fornecido
-    request_obj = get_object_or_404(Request, id=request_id)
-    
-    # Altera o status para "Excluída"
-    request_obj.status = "excluida"
-    request_obj.save()
-
-    # Adiciona a mensagem de sucesso
-    messages.success(request, 'Solicitação excluída com sucesso.')
-
-    # Redireciona para a página com todas as solicitações
+    # Exclusão lógica: o status passa a "Excluída"
+    _transicao_individual(request, 'excluir', request_id, 'Solicitação excluída com sucesso.')
     return redirect('solicitante')
 
 @login_required
 def request_approve(request, request_id):
-    # Obtém o objeto de solicitação com base no ID
-    request_obj = get_object_or_404(Request, id=request_id)
-
-    # Atualiza o status para 'Aprovada'
-    request_obj.status = 'Aprovada'  # Substitua 'Aprovada' pelo status que sua aplicação usa
-    request_obj.save()
-
-    # Redireciona para a página
+    _transicao_individual(request, 'aprovar', request_id)
     return redirect('admin_requests')
 
 @login_required
 def request_disapprove(request, request_id):
-    # Obtém o objeto de solicitação com base no ID
-    request_obj = get_object_or_404(Request, id=request_id)
-
-    # Atualiza o status para 'Desaprovada'
-    request_obj.status = 'Desaprovada'  # Substitua 'Desaprovada' pelo status que sua aplicação usa
-    request_obj.save()
-
-    # Redireciona para a página
+    _transicao_individual(request, 'desaprovar', request_id)
     return redirect('admin_requests')
 
 @login_required
 def request_standby(request, request_id):
-    # Obtém o objeto de solicitação com base no ID
-    request_obj = get_object_or_404(Request, id=request_id)
-
-    # Atualiza o status para 'Em Standby'
-    request_obj.status = 'Standby'  # Substitua 'Standby' pelo status que sua aplicação usa
-    request_obj.save()
-
-    # Redireciona para a página 
+    _transicao_individual(request, 'standby', request_id)
     return redirect('admin_requests')
 
 @login_required
 def request_to_evaluate(request, request_id):
-    # Recupera a solicitação com o ID fornecido
-    request_obj = get_object_or_404(Request, id=request_id)
+    # Envia para avaliação do gestor, limpando o comentário da última revisão
+    _transicao_individual(request, 'avaliar', request_id, 'Solicitação enviada para avaliação do gestor.')
+    return redirect('all_requests')
 
-    request_obj.status = "Aguardando avaliação"
-    request_obj.comment = None
-    request_obj.save()
+@login_required
+def transicao_solicitacoes(request):
+    # Ação em lote (ids[] + acao) num único UPDATE; responde JSON com ?formato=json
+    if request.method != 'POST':
+        return JsonResponse({"error": "Método inválido"}, status=405)
 
-    # Adiciona uma mensagem de sucesso
-    messages.success(request, 'Solicitação enviada para avaliação do gestor.')
+    # Uma chamada pode mover muitas solicitações: só o grupo admin (o mesmo da página de gestão)
+    if not request.user.groups.filter(name='admin').exists():
+        if request.GET.get('formato') == 'json':
+            return JsonResponse({"error": "Sem permissão para alterar solicitações em lote."}, status=403)
+        messages.error(request, "Sem permissão para alterar solicitações em lote.")
+        return redirect('admin_requests')
 
-    # Redireciona para a página das solicitações
-    return redirect('all_requests')
+    acao = request.POST.get('acao', '')
+    try:
+        ids = [int(request_id) for request_id in request.POST.getlist('ids[]')]
+        if not ids:
+            raise ValueError
+        movidas, rejeitadas = fluxo.transicionar(acao, ids)
+    except fluxo.TransicaoInvalida:
+        movidas = None
+        erro = f"Ação inválida: {acao}"
+    except ValueError:
+        movidas = None
+        erro = "Selecione ao menos uma solicitação."
+
+    if request.GET.get('formato') == 'json':
+        if movidas is None:
+            return JsonResponse({"error": erro}, status=400)
+        return JsonResponse({
+            'acao': acao,
+            'status': fluxo.TRANSICOES[acao][1].label,
+            'movidas': movidas,
+            'rejeitadas': rejeitadas,
+        })
+
+    if movidas is None:
+        messages.error(request, erro)
+    else:
+        if movidas:
+            messages.success(request, f"{len(movidas)} solicitação(ões) alterada(s) para {fluxo.TRANSICOES[acao][1].label}.")
+        if rejeitadas:
+            messages.error(request, f"{len(rejeitadas)} solicitação(ões) não puderam ser alteradas no status atual: {', '.join(map(str, rejeitadas))}.")
+    return redirect('admin_requests')
 
 @login_required
 def request_list(request):
-    all_requests = Request.objects.exclude(status="excluida")
-    print("🔍 QuerySet:", all_requests)
-    print("🔍 Total de registros:", all_requests.count())
+    all_requests = Request.objects.all()
     return render(request, 'sua_template.html', {'all_requests': all_requests})
 
 @login_required
 def request_revision(request, request_id):
     if request.method == 'POST':
-        # Obtém a instância do objeto Request com o ID fornecido
-        request_obj = get_object_or_404(Request, id=request_id)
-
         # Pega o comentário enviado no formulário (do modal)
         comentario = request.POST.get('comment', '')  # 'comment' é o nome do campo do modal
 
-        # Atualiza o status para "revisão"
-        request_obj.status = 'Revisão Solicitada'
-
-        # Adiciona o comentário, se houver
-        if comentario:
-            request_obj.comment = comentario  # Substitui pelo campo 'comment'
-
-        # Salva as mudanças no banco de dados
-        request_obj.save()
+        # Atualiza o status para "revisão", com o comentário, se houver
+        campos = {'comment': comentario} if comentario else {}
+        if not fluxo.transicionar('revisar', [request_id], **campos)[0]:
+            return JsonResponse({'status': 'error', 'message': 'A solicitação não pode ser revisada no status atual.'}, status=400)
 
         # Adiciona a mensagem de sucesso
         messages.success(request, 'Solicitação enviada para revisão com sucesso!')
@@ -366,7 +384,7 @@ def handle_request_creation(request):
             request_text=request_text,
             created_by=user,
             pub_date=timezone.now(),
-            status="Criada"
+            status=StatusSolicitacao.CRIADA
         )
 
         for key in product_fields:
@@ -412,21 +430,23 @@ def upload_request_files(request):
 
     try:
         request_obj = Request.objects.get(id=request_id)
-        
-        # Processando os arquivos enviados
-        for file in request.FILES.getlist('files'):
-            RequestFile.objects.create(
-                request=request_obj,
-                file=file
-            )
-        
-        # Atualizando o status para 'aguardando aprovação'
-        request_obj.status = 'aguardando aprovação'
-        request_obj.save()
-        
+
+        with transaction.atomic():
+            # Mesma transição do botão "Enviar para avaliação": só sai de "Esperando cotação"
+            movidas, _ = fluxo.transicionar('avaliar', [request_obj.id])
+            if not movidas:
+                return JsonResponse({"error": "A solicitação não pode ser enviada para avaliação no status atual."}, status=400)
+
+            # Processando os arquivos enviados
+            for file in request.FILES.getlist('files'):
+                RequestFile.objects.create(
+                    request=request_obj,
+                    file=file
+                )
+
         return JsonResponse({
             "message": "Arquivos enviados e status atualizado com sucesso",
-            "new_status": request_obj.status,
+            "new_status": fluxo.TRANSICOES['avaliar'][1].label,
             "file_count": len(request.FILES.getlist('files'))
         })
     except Request.DoesNotExist:
@@ -518,23 +538,34 @@ def get_quotations(request, request_id):
 # produtos
 
 @login_required
-def get_products(request):
-    products = Product.objects.all().values('id', 'product_name', 'unidade_medida', 'status')
-    product_list = list(products)
-    return JsonResponse({'products': product_list})
+def sugestoes(request, fonte):
+    # Typeahead de produtos, funcionários e centros de custo: ?q=termo&apos=cursor&limite=n
+    if fonte not in FONTES:
+        return JsonResponse({'error': 'Fonte de sugestões inválida.'}, status=404)
+
+    limite = request.GET.get('limite', '')
+    limite = min(int(limite), LIMITE_MAXIMO) if limite.isdigit() and int(limite) > 0 else LIMITE_PADRAO
+    itens, proximo = sugerir(fonte, request.GET.get('q', ''), request.GET.get('apos', ''), limite)
+    return JsonResponse({'itens': itens, 'proximo': proximo})
 
 @login_required
 def product_list(request):
     # Recupera as unidades de medida distintas
-    unidades = Product.objects.values_list('unidade_medida', flat=True).distinct()
+    unidades = referencias.obter('unidades_medida')
 
     # Filtra e ordena os produtos com base nos parâmetros da URL
     filter_by = request.GET.get('filter_by', '')
     status_filter = request.GET.get('status_filter', '')  # Filtro de status
+    abc_filter = request.GET.get('abc_filter', '')  # Classe ABC (volume de saídas)
+    xyz_filter = request.GET.get('xyz_filter', '')  # Classe XYZ (variabilidade da demanda)
     order_by = request.GET.get('order_by', '')
     order_direction = request.GET.get('order_direction', 'asc')
 
-    products = Product.objects.all()
+    # A classificação é mantida pelo job noturno do estoque (manage.py classificar_produtos)
+    products = Product.objects.annotate(
+        classe_abc=F('classificacao__classe_abc'),
+        classe_xyz=F('classificacao__classe_xyz'),
+    )
 
     # Aplicar filtro por unidade de medida, se fornecido
     if filter_by:
@@ -547,6 +578,12 @@ def product_list(request):
         elif status_filter == 'inativo':
             products = products.filter(status=False)
 
+    # Aplicar filtro por classe ABC/XYZ, se fornecido
+    if abc_filter:
+        products = products.filter(classificacao__classe_abc=abc_filter)
+    if xyz_filter:
+        products = products.filter(classificacao__classe_xyz=xyz_filter)
+
     # Aplicar ordenação
     if order_by:
         if order_direction == 'desc':